@@ -1,12 +1,18 @@
 """The ViCare integration."""
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
+from datetime import timedelta
 import logging
 from typing import Callable
 
-from PyViCare.PyViCare import PyViCare
 from PyViCare.PyViCareDevice import Device
+from PyViCare.PyViCareFuelCell import FuelCell
+from PyViCare.PyViCareGazBoiler import GazBoiler
+from PyViCare.PyViCareHeatPump import HeatPump
+from PyViCare.PyViCareOilBoiler import OilBoiler
+from PyViCare.PyViCarePelletsBoiler import PelletsBoiler
 import voluptuous as vol
 
 from homeassistant.config_entries import SOURCE_IMPORT, ConfigEntry
@@ -17,21 +23,46 @@ from homeassistant.const import (
     CONF_SCAN_INTERVAL,
     CONF_USERNAME,
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import device_registry
 import homeassistant.helpers.config_validation as cv
-from homeassistant.helpers.storage import STORAGE_DIR
 
+from .capabilities import ViCareCapabilities, async_load_capability_store
+from .commands import ViCareCommandQueue
 from .const import (
     CONF_HEATING_TYPE,
+    CONF_MAX_SCAN_INTERVAL,
+    CONF_MAX_STALENESS,
+    CONF_MIN_SCAN_INTERVAL,
+    CONF_RECORD_TRAFFIC,
+    CONF_REPLAY,
+    CONF_TRACE,
     DEFAULT_HEATING_TYPE,
+    DEFAULT_MAX_SCAN_INTERVAL,
+    DEFAULT_MAX_STALENESS,
     DOMAIN,
+    MAX_PARALLEL_FETCHES,
     PLATFORMS,
     VICARE_API,
-    VICARE_CIRCUITS,
+    VICARE_CAPABILITIES,
+    VICARE_CAPABILITY_STORE,
+    VICARE_COMMANDS,
+    VICARE_COORDINATOR,
     VICARE_DEVICE_CONFIG,
+    VICARE_DEVICE_LIST,
     VICARE_NAME,
+    VICARE_SESSION,
     HeatingType,
 )
+from .coordinator import ViCareDataUpdateCoordinator
+from .polling import ViCarePollScheduler
+from .profiling import async_register_services
+from .recording import ViCareRecorder, recording_file_name
+from .service import ViCareSnapshotService
+from .session import ViCareSession, async_get_session_registry
+from .snapshot import ViCareSnapshotStore
+from .statistics import ViCareStatisticsImporter
+from .trace import trace_file_name
 
 
 @dataclass()
@@ -41,8 +72,24 @@ class ViCareRequiredKeysMixin:
     value_getter: Callable[[Device], bool]
 
 
+def get_device_serial(device_config) -> str:
+    """Return the identifier of a device below its gateway."""
+    accessor = device_config.getConfig()
+    if accessor.device_id == "0":
+        # Keep the identifiers of single device installations stable
+        return accessor.serial
+    return f"{accessor.serial}-{accessor.device_id}"
+
+
 _LOGGER = logging.getLogger(__name__)
 
+DEVICE_HEATING_TYPES = (
+    (GazBoiler, HeatingType.gas),
+    (FuelCell, HeatingType.fuelcell),
+    (HeatPump, HeatingType.heatpump),
+    (OilBoiler, HeatingType.oil),
+    (PelletsBoiler, HeatingType.pellets),
+)
 
 CONFIG_SCHEMA = vol.Schema(
     {
@@ -58,6 +105,8 @@ CONFIG_SCHEMA = vol.Schema(
                 vol.Optional(CONF_HEATING_TYPE, default=DEFAULT_HEATING_TYPE): cv.enum(
                     HeatingType
                 ),
+                # Recorded API traffic to replay instead of the ViCare cloud
+                vol.Optional(CONF_REPLAY): cv.isfile,
             }
         )
     },
@@ -67,6 +116,9 @@ CONFIG_SCHEMA = vol.Schema(
 
 async def async_setup(hass: HomeAssistant, config) -> bool:
     """Set up the ViCare component from yaml."""
+    hass.data[VICARE_CAPABILITY_STORE] = await async_load_capability_store(hass)
+    async_register_services(hass)
+
     if DOMAIN not in config:
         # Setup via UI. No need to continue yaml-based setup
         return True
@@ -86,8 +138,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up from config entry."""
     _LOGGER.debug("Setting up ViCare component")
 
-    hass.data[DOMAIN] = {}
-
+    hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = {}
     hass.data[DOMAIN][entry.entry_id][VICARE_NAME] = entry.data[CONF_NAME]
 
@@ -104,44 +155,156 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             entry, unique_id=entry.data[CONF_USERNAME]
         )
 
-    await hass.async_add_executor_job(
-        setup_vicare_api, hass, entry.data, hass.data[DOMAIN][entry.entry_id]
+    registry = async_get_session_registry(hass)
+    if entry.options.get(CONF_TRACE):
+        # Started before the session, so a login is traced as well
+        tracer = registry.get_tracer(entry.data)
+        await tracer.async_start(hass.config.path(trace_file_name(entry.data)))
+        entry.async_on_unload(tracer.async_stop)
+    session = await registry.async_get(entry.data)
+    if session.token_manager is not None:
+        # The session outlives the entry, its token is renewed while loaded
+        entry.async_on_unload(session.token_manager.async_shutdown)
+    hass.data[DOMAIN][entry.entry_id][VICARE_SESSION] = session
+    setup_vicare_api(hass, session, hass.data[DOMAIN][entry.entry_id])
+
+    if entry.options.get(CONF_RECORD_TRAFFIC) and CONF_REPLAY not in entry.data:
+        path = hass.config.path(recording_file_name(entry.data))
+        recorder = ViCareRecorder(hass, path)
+        recorder.async_start(session.client.devices)
+        session.transport.recorder = recorder
+
+        @callback
+        def _async_stop_recording() -> None:
+            session.transport.recorder = None
+
+        entry.async_on_unload(_async_stop_recording)
+
+    devices = hass.data[DOMAIN][entry.entry_id][VICARE_DEVICE_LIST]
+    # Every device polls on its own, all of them within the account quota
+    session.governor.pollers = len(devices)
+    min_interval = timedelta(
+        seconds=entry.options.get(
+            CONF_MIN_SCAN_INTERVAL, entry.data[CONF_SCAN_INTERVAL]
+        )
     )
+    max_interval = timedelta(
+        seconds=entry.options.get(CONF_MAX_SCAN_INTERVAL, DEFAULT_MAX_SCAN_INTERVAL)
+    )
+
+    max_staleness = timedelta(
+        seconds=entry.options.get(CONF_MAX_STALENESS, DEFAULT_MAX_STALENESS)
+    )
+
+    # Snapshots too old to be served are replaced by a first refresh
+    snapshot_stores = [
+        ViCareSnapshotStore(hass, get_device_serial(device[VICARE_DEVICE_CONFIG]))
+        for device in devices
+    ]
+    stored_snapshots = await asyncio.gather(
+        *(
+            snapshot_store.async_load(max_staleness)
+            for snapshot_store in snapshot_stores
+        )
+    )
+
+    # Every device of every account polls in its own slot of the interval
+    entries = hass.config_entries.async_entries(DOMAIN)
+    slot = entries.index(entry)
+
+    # All devices of the entry share one limit for concurrent fetches
+    fetch_semaphore = asyncio.Semaphore(MAX_PARALLEL_FETCHES)
+    first_refreshes = []
+    for index, (device, snapshot_store, features) in enumerate(
+        zip(devices, snapshot_stores, stored_snapshots)
+    ):
+        coordinator = ViCareDataUpdateCoordinator(
+            hass,
+            device[VICARE_DEVICE_CONFIG],
+            get_device_serial(device[VICARE_DEVICE_CONFIG]),
+            device[VICARE_API],
+            device[VICARE_DEVICE_CONFIG].service,
+            device[VICARE_CAPABILITIES],
+            snapshot_store,
+            ViCarePollScheduler(min_interval, max_interval),
+            fetch_semaphore,
+            session.governor,
+            session.metrics,
+            session.tracer,
+            min_interval * (slot + index / len(devices)) / len(entries),
+            max_staleness,
+        )
+        device[VICARE_COORDINATOR] = coordinator
+        entry.async_on_unload(coordinator.async_shutdown)
+        device[VICARE_COMMANDS] = ViCareCommandQueue(hass, coordinator)
+        entry.async_on_unload(device[VICARE_COMMANDS].async_shutdown)
+        if features is None:
+            first_refreshes.append(coordinator.async_config_entry_first_refresh())
+        else:
+            # Entities start from the stored snapshot until the regular
+            # schedule fetches a live one
+            coordinator.async_restore(features, snapshot_store.fetched)
+
+    await asyncio.gather(*first_refreshes)
+
+    if "recorder" in hass.config.components:
+        for device in devices:
+            importer = ViCareStatisticsImporter(
+                hass,
+                device[VICARE_COORDINATOR],
+                device[VICARE_API],
+                get_device_serial(device[VICARE_DEVICE_CONFIG]),
+                entry.data[CONF_NAME],
+            )
+            entry.async_on_unload(
+                device[VICARE_COORDINATOR].async_add_refresh_callback(
+                    importer.async_schedule_import
+                )
+            )
 
     hass.config_entries.async_setup_platforms(entry, PLATFORMS)
 
-    return True
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
 
+    return True
 
-def vicare_login(hass, conf):
-    """Login via PyVicare API."""
-    vicare_api = PyViCare()
-    vicare_api.setCacheDuration(conf[CONF_SCAN_INTERVAL])
-    vicare_api.initWithCredentials(
-        conf[CONF_USERNAME],
-        conf[CONF_PASSWORD],
-        conf[CONF_CLIENT_ID],
-        hass.config.path(STORAGE_DIR, "vicare_token.save"),
-    )
 
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the entry to apply new poll intervals."""
+    await hass.config_entries.async_reload(entry.entry_id)
 
-def setup_vicare_api(hass, conf, entity_data):
-    """Set up PyVicare API."""
-    vicare_api = PyViCare()
-    vicare_api.setCacheDuration(conf[CONF_SCAN_INTERVAL])
-    vicare_api.initWithCredentials(
-        conf[CONF_USERNAME],
-        conf[CONF_PASSWORD],
-        conf[CONF_CLIENT_ID],
-        hass.config.path(STORAGE_DIR, "vicare_token.save"),
-    )
 
-    device = vicare_api.devices[0]
-    for device in vicare_api.devices:
+def setup_vicare_api(hass, session: ViCareSession, entity_data):
+    """Set up PyVicare API for every device of an authenticated session."""
+    entity_data[VICARE_DEVICE_LIST] = []
+    for device in session.client.devices:
         _LOGGER.info(
             "Found device: %s (online: %s)", device.getModel(), str(device.isOnline())
         )
-    entity_data[VICARE_DEVICE_CONFIG] = device
+        # Every getter of the device reads from the snapshot of its coordinator,
+        # requests go through the session and its circuit breaker
+        device.service = ViCareSnapshotService(
+            session, device.service.accessor, session.metrics
+        )
+        capabilities = hass.data[VICARE_CAPABILITY_STORE].get(
+            get_device_serial(device)
+        )
+        entity_data[VICARE_DEVICE_LIST].append(
+            {
+                VICARE_DEVICE_CONFIG: device,
+                VICARE_API: _create_device_api(
+                    device, entity_data[CONF_HEATING_TYPE], capabilities
+                ),
+                VICARE_CAPABILITIES: capabilities,
+            }
+        )
+
+
+def _create_device_api(device, heating_type, capabilities: ViCareCapabilities):
+    """Create the PyViCare API object for the configured heating type."""
+    if heating_type == HeatingType.auto and capabilities.heating_type is not None:
+        # Reuse the heating type detected during an earlier setup
+        heating_type = HeatingType(capabilities.heating_type)
 
     device_types = [
         (device.asAutoDetectDevice, HeatingType.auto),
@@ -152,12 +315,21 @@ def setup_vicare_api(hass, conf, entity_data):
         (device.asPelletsBoiler, HeatingType.pellets),
     ]
 
-    for (creator_method, heating_type) in device_types:
-        if heating_type == entity_data[CONF_HEATING_TYPE]:
+    for (creator_method, device_heating_type) in device_types:
+        if device_heating_type == heating_type:
             _LOGGER.info("Using creator_method %s", creator_method.__name__)
-            entity_data[VICARE_API] = creator_method()
+            api = creator_method()
+            capabilities.set_heating_type(_detected_heating_type(api).value)
+            return api
+    return None
 
-    entity_data[VICARE_CIRCUITS] = entity_data[VICARE_API].circuits
+
+def _detected_heating_type(api) -> HeatingType:
+    """Return the heating type matching the class of a PyViCare API object."""
+    for (device_class, heating_type) in DEVICE_HEATING_TYPES:
+        if type(api) is device_class:
+            return heating_type
+    return HeatingType.auto
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -167,3 +339,17 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         hass.data[DOMAIN].pop(entry.entry_id)
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Drop the session and capability manifests of a removed ViCare config entry."""
+    async_get_session_registry(hass).async_remove(entry.data)
+    if (store := hass.data.get(VICARE_CAPABILITY_STORE)) is None:
+        return
+    registry = device_registry.async_get(hass)
+    for device in device_registry.async_entries_for_config_entry(
+        registry, entry.entry_id
+    ):
+        for domain, serial in device.identifiers:
+            if domain == DOMAIN:
+                store.async_remove(serial)
@@ -0,0 +1,256 @@
+"""OAuth token management of ViCare accounts."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+import logging
+import re
+import time
+
+import aiohttp
+import async_timeout
+import pkce
+from PyViCare import PyViCareOAuthManager as vicare_oauth
+from PyViCare.PyViCareAbstractOAuthManager import AbstractViCareOAuthManager
+from PyViCare.PyViCareUtils import PyViCareInvalidCredentialsError
+from requests_oauthlib import OAuth2Session
+
+from homeassistant.const import CONF_CLIENT_ID, CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.helpers.storage import Store
+from homeassistant.util import slugify
+import homeassistant.util.dt as dt_util
+
+from .const import DOMAIN
+from .metrics import ViCareMetrics
+from .quota import ViCareQuotaGovernor
+from .trace import ViCareTracer
+from .transport import (
+    ACCEPT_ENCODING,
+    API_TIMEOUT,
+    ViCareTransportStats,
+    async_read_json,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+
+ATTR_ACCESS_TOKEN = "access_token"
+ATTR_EXPIRES_AT = "expires_at"
+
+# Lifetime assumed when the token endpoint does not report one
+DEFAULT_TOKEN_LIFETIME = timedelta(hours=1)
+# Tokens are renewed this long before they expire
+REFRESH_MARGIN = timedelta(minutes=5)
+
+REDIRECT_LOCATION = re.compile(r"(?P<uri>.+?)\?code=(?P<code>.+)&state=(?P<state>.+)")
+
+
+class ViCareTokenManager(AbstractViCareOAuthManager):
+    """Keep the access token of a ViCare account valid.
+
+    The token is kept under .storage and renewed in the background shortly
+    before it expires. Requests that still find it expired ask for a
+    renewal, all of them wait for the same login. PyViCare uses the manager
+    as its OAuth manager, so its own requests share the token too. Every
+    request sent for a login or by PyViCare counts against the quota.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        conf,
+        websession: aiohttp.ClientSession,
+        stats: ViCareTransportStats,
+        governor: ViCareQuotaGovernor,
+        metrics: ViCareMetrics,
+        tracer: ViCareTracer,
+    ) -> None:
+        """Initialize the manager without a token."""
+        super().__init__(OAuth2Session(conf[CONF_CLIENT_ID]))
+        self.hass = hass
+        self.username = conf[CONF_USERNAME]
+        self.password = conf[CONF_PASSWORD]
+        self.client_id = conf[CONF_CLIENT_ID]
+        self.expires_at: datetime | None = None
+        self._websession = websession
+        self._stats = stats
+        self._governor = governor
+        self._metrics = metrics
+        self._tracer = tracer
+        self._store = Store(
+            hass,
+            STORAGE_VERSION,
+            f"{DOMAIN}.token.{slugify(self.username)}",
+            private=True,
+        )
+        self._refresh_task: asyncio.Task | None = None
+        self._cancel_refresh: CALLBACK_TYPE | None = None
+
+    @property
+    def access_token(self) -> str | None:
+        """Return the current access token."""
+        return self.oauth_session.token.get(ATTR_ACCESS_TOKEN)
+
+    async def async_load(self) -> None:
+        """Restore the stored token if it is still valid."""
+        data = await self._store.async_load()
+        if not data:
+            return
+        expires_at = dt_util.parse_datetime(data[ATTR_EXPIRES_AT])
+        if expires_at is None or expires_at <= dt_util.utcnow():
+            return
+        self._async_set_token(data[ATTR_ACCESS_TOKEN], expires_at)
+
+    async def async_refresh(self, expired_token: str | None = None) -> None:
+        """Renew the token, joining a renewal that is already running.
+
+        With `expired_token` given, nothing happens if the token was already
+        replaced since the caller read it.
+        """
+        if expired_token is not None and expired_token != self.access_token:
+            return
+        if self._refresh_task is None:
+            self._refresh_task = self.hass.async_create_task(self._async_refresh())
+        await asyncio.shield(self._refresh_task)
+
+    def get(self, url):
+        """Send a GET request of PyViCare from the executor."""
+        self.hass.loop.call_soon_threadsafe(self._governor.record_call)
+        return super().get(url)
+
+    def post(self, url, data):
+        """Send a POST request of PyViCare from the executor."""
+        self.hass.loop.call_soon_threadsafe(self._governor.record_call)
+        return super().post(url, data)
+
+    def renewToken(self):  # pylint: disable=invalid-name
+        """Renew the token for PyViCare requests sent from the executor."""
+        asyncio.run_coroutine_threadsafe(
+            self.async_refresh(self.access_token), self.hass.loop
+        ).result()
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop renewing the token in the background."""
+        if self._cancel_refresh is not None:
+            self._cancel_refresh()
+            self._cancel_refresh = None
+
+    async def _async_refresh(self) -> None:
+        try:
+            _LOGGER.debug("Renewing access token of %s", self.username)
+            start = time.monotonic()
+            with self._tracer.span("token_refresh"):
+                access_token, lifetime = await self._async_login()
+            self._metrics.token_latency.record(time.monotonic() - start)
+            self._async_set_token(access_token, dt_util.utcnow() + lifetime)
+            await self._store.async_save(
+                {
+                    ATTR_ACCESS_TOKEN: access_token,
+                    ATTR_EXPIRES_AT: self.expires_at.isoformat(),
+                }
+            )
+        finally:
+            self._refresh_task = None
+
+    @callback
+    def _async_set_token(self, access_token: str, expires_at: datetime) -> None:
+        """Use a token and schedule its renewal."""
+        self.replace_session(
+            OAuth2Session(
+                client_id=self.client_id,
+                token={ATTR_ACCESS_TOKEN: access_token, "token_type": "bearer"},
+            )
+        )
+        self.expires_at = expires_at
+        self.async_schedule_refresh()
+
+    @callback
+    def async_schedule_refresh(self) -> None:
+        """Renew the current token in the background shortly before it expires."""
+        self.async_shutdown()
+        if self.expires_at is None:
+            return
+        self._cancel_refresh = async_track_point_in_utc_time(
+            self.hass, self._async_scheduled_refresh, self.expires_at - REFRESH_MARGIN
+        )
+
+    @callback
+    def _async_scheduled_refresh(self, _now) -> None:
+        self._cancel_refresh = None
+        self.hass.async_create_task(self._async_background_refresh())
+
+    async def _async_background_refresh(self) -> None:
+        try:
+            await self.async_refresh()
+        except (
+            aiohttp.ClientError,
+            asyncio.TimeoutError,
+            PyViCareInvalidCredentialsError,
+            ValueError,
+        ) as err:
+            # The next request finding the token expired tries again
+            _LOGGER.warning("Unable to renew the ViCare access token: %s", err)
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Unexpected error renewing the ViCare access token")
+
+    async def _async_login(self) -> tuple[str, timedelta]:
+        """Run the PKCE login of PyViCare without blocking the event loop."""
+        oauth_session = OAuth2Session(
+            self.client_id,
+            redirect_uri=vicare_oauth.REDIRECT_URI,
+            scope=vicare_oauth.VIESSMANN_SCOPE,
+        )
+        authorization_url, state = oauth_session.authorization_url(
+            vicare_oauth.AUTHORIZE_URL
+        )
+        code_verifier, code_challenge = pkce.generate_pkce_pair()
+
+        self._governor.record_call()
+        async with async_timeout.timeout(API_TIMEOUT):
+            async with self._websession.post(
+                f"{authorization_url}&code_challenge={code_challenge}"
+                "&code_challenge_method=S256",
+                headers={
+                    "Content-Type": "application/x-www-form-urlencoded",
+                    "Accept-Encoding": ACCEPT_ENCODING,
+                },
+                auth=aiohttp.BasicAuth(self.username, self.password),
+                allow_redirects=False,
+            ) as response:
+                location = response.headers.get("Location")
+
+        match = REDIRECT_LOCATION.match(location or "")
+        if (
+            match is None
+            or match["uri"] != vicare_oauth.REDIRECT_URI
+            or match["state"] != state
+        ):
+            raise PyViCareInvalidCredentialsError()
+
+        self._governor.record_call()
+        async with async_timeout.timeout(API_TIMEOUT):
+            result = await async_read_json(
+                self._websession.post(
+                    vicare_oauth.TOKEN_URL,
+                    headers={"Accept-Encoding": ACCEPT_ENCODING},
+                    data={
+                        "grant_type": "authorization_code",
+                        "client_id": self.client_id,
+                        "redirect_uri": vicare_oauth.REDIRECT_URI,
+                        "code": match["code"],
+                        "code_verifier": code_verifier,
+                    },
+                ),
+                self._stats,
+            )
+
+        if ATTR_ACCESS_TOKEN not in result:
+            raise PyViCareInvalidCredentialsError()
+        lifetime = DEFAULT_TOKEN_LIFETIME
+        if result.get("expires_in"):
+            lifetime = timedelta(seconds=result["expires_in"])
+        return result[ATTR_ACCESS_TOKEN], lifetime
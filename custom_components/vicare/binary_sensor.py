@@ -3,23 +3,30 @@ from __future__ import annotations
 
 from contextlib import suppress
 from dataclasses import dataclass
+from functools import partial
 import logging
 
 from PyViCare.PyViCareUtils import (
     PyViCareInvalidDataError,
     PyViCareNotSupportedFeatureError,
-    PyViCareRateLimitError,
 )
-import requests
 
 from homeassistant.components.binary_sensor import (
     DEVICE_CLASS_POWER,
     BinarySensorEntity,
     BinarySensorEntityDescription,
 )
+from homeassistant.core import callback
 
 from . import ViCareRequiredKeysMixin
-from .const import DOMAIN, VICARE_API, VICARE_DEVICE_CONFIG, VICARE_NAME
+from .capabilities import capability_key
+from .const import (
+    DOMAIN,
+    VICARE_COORDINATOR,
+    VICARE_DEVICE_LIST,
+    VICARE_NAME,
+)
+from .entity import ViCareEntity
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -63,133 +70,87 @@ COMPRESSOR_SENSORS: tuple[ViCareBinarySensorEntityDescription, ...] = (
 )
 
 
-def _build_entity(name, vicare_api, device_config, sensor):
-    try:
-        sensor.value_getter(vicare_api)
-        _LOGGER.debug("Found entity %s", name)
-        return ViCareBinarySensor(
-            name,
-            vicare_api,
-            device_config,
-            sensor,
-        )
-    except PyViCareNotSupportedFeatureError:
+def _build_entity(coordinator, name, vicare_api, sensor):
+    if not coordinator.capabilities.supports(
+        capability_key(sensor.key, vicare_api),
+        lambda: sensor.value_getter(vicare_api),
+    ):
         _LOGGER.info("Feature not supported %s", name)
         return None
-    except AttributeError:
-        _LOGGER.debug("Attribute Error %s", name)
-        return None
+
+    _LOGGER.debug("Found entity %s", name)
+    return ViCareBinarySensor(
+        coordinator,
+        name,
+        vicare_api,
+        sensor,
+    )
+
+
+def _build_device_entities(name, device):
+    """Create the ViCare binary sensor entities of a single device."""
+    coordinator = device[VICARE_COORDINATOR]
+    return coordinator.topology.build_entities(
+        name,
+        partial(_build_entity, coordinator),
+        circuits=CIRCUIT_SENSORS,
+        burners=BURNER_SENSORS,
+        compressors=COMPRESSOR_SENSORS,
+    )
 
 
 async def async_setup_entry(hass, config_entry, async_add_devices):
     """Create the ViCare binary sensor devices."""
     name = hass.data[DOMAIN][config_entry.entry_id][VICARE_NAME]
-    api = hass.data[DOMAIN][config_entry.entry_id][VICARE_API]
 
     all_devices = []
-
-    for description in CIRCUIT_SENSORS:
-        for circuit in api.circuits:
-            suffix = ""
-            if len(api.circuits) > 1:
-                suffix = f" {circuit.id}"
-            entity = _build_entity(
-                f"{name} {description.name}{suffix}",
-                circuit,
-                hass.data[DOMAIN][config_entry.entry_id][VICARE_DEVICE_CONFIG],
-                description,
-            )
-            if entity is not None:
-                all_devices.append(entity)
-
-    try:
-        for description in BURNER_SENSORS:
-            for burner in api.burners:
-                suffix = ""
-                if len(api.burners) > 1:
-                    suffix = f" {burner.id}"
-                entity = _build_entity(
-                    f"{name} {description.name}{suffix}",
-                    burner,
-                    hass.data[DOMAIN][config_entry.entry_id][VICARE_DEVICE_CONFIG],
-                    description,
-                )
-                if entity is not None:
-                    all_devices.append(entity)
-    except PyViCareNotSupportedFeatureError:
-        _LOGGER.info("No burners found")
-
-    try:
-        for description in COMPRESSOR_SENSORS:
-            for compressor in api.compressors:
-                suffix = ""
-                if len(api.compressors) > 1:
-                    suffix = f" {compressor.id}"
-                entity = _build_entity(
-                    f"{name} {description.name}{suffix}",
-                    compressor,
-                    hass.data[DOMAIN][config_entry.entry_id][VICARE_DEVICE_CONFIG],
-                    description,
-                )
-                if entity is not None:
-                    all_devices.append(entity)
-    except PyViCareNotSupportedFeatureError:
-        _LOGGER.info("No compressors found")
+    for device in hass.data[DOMAIN][config_entry.entry_id][VICARE_DEVICE_LIST]:
+        all_devices.extend(_build_device_entities(name, device))
 
     async_add_devices(all_devices)
 
 
-class ViCareBinarySensor(BinarySensorEntity):
+class ViCareBinarySensor(ViCareEntity, BinarySensorEntity):
     """Representation of a ViCare sensor."""
 
     entity_description: ViCareBinarySensorEntityDescription
 
+    __slots__ = ("_state",)
+
     def __init__(
-        self, name, api, device_config, description: ViCareBinarySensorEntityDescription
+        self,
+        coordinator,
+        name,
+        api,
+        description: ViCareBinarySensorEntityDescription,
     ):
         """Initialize the sensor."""
+        super().__init__(coordinator, name, api)
         self.entity_description = description
-        self._attr_name = name
-        self._api = api
-        self.entity_description = description
-        self._device_config = device_config
         self._state = None
 
-    @property
-    def device_info(self):
-        """Return device info for this device."""
-        return {
-            "identifiers": {(DOMAIN, self._device_config.getConfig().serial)},
-            "name": self._device_config.getModel(),
-            "manufacturer": "Viessmann",
-            "model": (DOMAIN, self._device_config.getModel()),
-        }
-
     @property
     def available(self):
         """Return True if entity is available."""
-        return self._state is not None
-
-    @property
-    def unique_id(self):
-        """Return unique ID for this device."""
-        return f"{self._device_config.getConfig().serial}-{self._attr_name}"
+        return super().available and self._state is not None
 
     @property
     def is_on(self):
         """Return the state of the sensor."""
         return self._state
 
-    def update(self):
-        """Update state of sensor."""
+    @callback
+    def _handle_coordinator_update(self):
+        """Read the state from the new snapshot and write it."""
+        self._update_state()
+        super()._handle_coordinator_update()
+
+    def _update_state(self):
+        """Update state of sensor from the device snapshot."""
         try:
             with suppress(PyViCareNotSupportedFeatureError):
                 self._state = self.entity_description.value_getter(self._api)
-        except requests.exceptions.ConnectionError:
-            _LOGGER.error("Unable to retrieve data from ViCare server")
         except ValueError:
             _LOGGER.error("Unable to decode data from ViCare server")
-        except PyViCareRateLimitError as limit_exception:
-            _LOGGER.error("Vicare API rate limit exceeded: %s", limit_exception)
         except PyViCareInvalidDataError as invalid_data_exception:
             _LOGGER.error("Invalid data from Vicare server: %s", invalid_data_exception)
@@ -0,0 +1,141 @@
+"""Circuit breaker of the ViCare API requests of an account."""
+from __future__ import annotations
+
+import asyncio
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import enum
+import logging
+import random
+from typing import Any, Iterator
+
+import aiohttp
+from PyViCare.PyViCareUtils import PyViCareInternalServerError
+
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.util.dt as dt_util
+
+_LOGGER = logging.getLogger(__name__)
+
+# Failed requests in a row that open the breaker
+FAILURE_THRESHOLD = 3
+BASE_DELAY = timedelta(seconds=30)
+MAX_DELAY = timedelta(minutes=30)
+# Share of the delay added or taken away at random
+JITTER = 0.2
+
+# Errors telling that the ViCare cloud is unreachable or broken
+OUTAGE_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, PyViCareInternalServerError)
+
+
+class BreakerState(enum.Enum):
+    """States of the circuit breaker."""
+
+    closed = "closed"
+    open = "open"
+    half_open = "half_open"
+
+
+class ViCareCircuitOpenError(HomeAssistantError):
+    """Raised instead of sending a request while the ViCare cloud is down."""
+
+
+class ViCareCircuitBreaker:
+    """Stop sending the requests of an account during a ViCare cloud outage.
+
+    Requests pass while the breaker is closed. After several failed
+    requests in a row it opens, and every fetch and write fails at once
+    without touching the network or the quota. Once the backoff delay has
+    passed, a single request is let through as a probe. If it succeeds the
+    breaker closes again, otherwise the delay doubles, with some jitter so
+    accounts do not probe in lockstep. The outage is logged once when it
+    starts and once when it ends.
+    """
+
+    def __init__(self) -> None:
+        """Initialize a closed breaker."""
+        self.state = BreakerState.closed
+        self.failures = 0
+        self.short_circuited = 0
+        self.retry_at: datetime | None = None
+        self._opened_at: datetime | None = None
+        self._trips = 0
+
+    @contextmanager
+    def request(self) -> Iterator[None]:
+        """Guard a request, raising instead of sending it while open."""
+        self._before_request()
+        try:
+            yield
+        except OUTAGE_ERRORS as err:
+            self._record_failure(err)
+            raise
+        except Exception:
+            # The cloud answered, if only with an error
+            self._record_success()
+            raise
+        except BaseException:
+            if self.state is BreakerState.half_open:
+                # The probe was cancelled, the next request probes again
+                self.state = BreakerState.open
+            raise
+        else:
+            self._record_success()
+
+    def _before_request(self) -> None:
+        if self.state is BreakerState.closed:
+            return
+        if self.state is BreakerState.open and dt_util.utcnow() >= self.retry_at:
+            # Let this request through as the probe
+            self.state = BreakerState.half_open
+            return
+        self.short_circuited += 1
+        raise ViCareCircuitOpenError(
+            f"ViCare cloud unreachable, next attempt at {self.retry_at}"
+        )
+
+    def _record_success(self) -> None:
+        if self.state is not BreakerState.closed:
+            _LOGGER.info(
+                "ViCare cloud reachable again after %s, %s requests were skipped",
+                dt_util.utcnow() - self._opened_at,
+                self.short_circuited,
+            )
+        self.state = BreakerState.closed
+        self.failures = 0
+        self.short_circuited = 0
+        self.retry_at = None
+        self._opened_at = None
+        self._trips = 0
+
+    def _record_failure(self, err: Exception) -> None:
+        self.failures += 1
+        if self.state is BreakerState.open:
+            # Sent before the breaker opened
+            return
+        if self.state is BreakerState.closed and self.failures < FAILURE_THRESHOLD:
+            return
+        if self.state is BreakerState.closed:
+            self._opened_at = dt_util.utcnow()
+        self._trips += 1
+        delay = min(BASE_DELAY * 2 ** (self._trips - 1), MAX_DELAY)
+        delay *= 1 + random.uniform(-JITTER, JITTER)
+        self.retry_at = dt_util.utcnow() + delay
+        if self.state is BreakerState.closed:
+            _LOGGER.warning(
+                "ViCare cloud unreachable (%s), pausing requests until %s",
+                str(err) or type(err).__name__,
+                self.retry_at,
+            )
+        else:
+            _LOGGER.debug("Probe failed, next attempt at %s", self.retry_at)
+        self.state = BreakerState.open
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state of the breaker."""
+        return {
+            "state": self.state.value,
+            "failures": self.failures,
+            "short_circuited": self.short_circuited,
+            "retry_at": self.retry_at,
+        }
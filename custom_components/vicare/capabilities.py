@@ -0,0 +1,176 @@
+"""Capability manifest of ViCare devices."""
+from __future__ import annotations
+
+import hashlib
+import logging
+from typing import Any, Callable
+
+from PyViCare.PyViCareUtils import PyViCareNotSupportedFeatureError
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import device_registry
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_KEY = f"{DOMAIN}.capabilities"
+STORAGE_VERSION = 1
+SAVE_DELAY = 10
+
+ATTR_FINGERPRINT = "fingerprint"
+ATTR_HEATING_TYPE = "heating_type"
+ATTR_CAPABILITIES = "capabilities"
+
+
+def capability_key(key: str, api: Any = None) -> str:
+    """Return the manifest key of a getter, qualified by the component it reads."""
+    component = getattr(api, "component", None)
+    if component is None:
+        return key
+    return f"{key}.{component}"
+
+
+def feature_fingerprint(features) -> str:
+    """Return a fingerprint of the feature names in a snapshot."""
+    names = "\n".join(sorted(feature["feature"] for feature in features))
+    return hashlib.sha1(names.encode()).hexdigest()
+
+
+class ViCareCapabilities:
+    """Detected heating type and supported getters of a single device.
+
+    Every getter is probed once. Afterwards unsupported getters are skipped
+    without calling them until the feature list of the device changes.
+    """
+
+    def __init__(self, manifest: dict, on_change: Callable[[], None]) -> None:
+        """Initialize from a stored manifest."""
+        self._fingerprint: str | None = manifest.get(ATTR_FINGERPRINT)
+        self._heating_type: str | None = manifest.get(ATTR_HEATING_TYPE)
+        self._capabilities: dict[str, bool] = dict(
+            manifest.get(ATTR_CAPABILITIES, {})
+        )
+        self._on_change = on_change
+
+    @property
+    def heating_type(self) -> str | None:
+        """Return the heating type the manifest was built for."""
+        return self._heating_type
+
+    def set_heating_type(self, heating_type: str) -> None:
+        """Set the heating type, dropping getters probed for another one."""
+        if heating_type == self._heating_type:
+            return
+        self._heating_type = heating_type
+        self._capabilities = {}
+        self._on_change()
+
+    def check_features(self, features) -> bool:
+        """Rebuild the manifest if the feature list of the device changed.
+
+        Return True if the manifest was rebuilt.
+        """
+        fingerprint = feature_fingerprint(features)
+        if fingerprint == self._fingerprint:
+            return False
+        if self._fingerprint is not None:
+            _LOGGER.info("Feature list changed, rebuilding capability manifest")
+        self._fingerprint = fingerprint
+        self._capabilities = {}
+        self._on_change()
+        return True
+
+    def supports(self, key: str, getter: Callable[[], Any]) -> bool:
+        """Return True if the getter is supported, probing it if unknown."""
+        if key not in self._capabilities:
+            try:
+                getter()
+            except (PyViCareNotSupportedFeatureError, AttributeError):
+                self._set(key, False)
+            else:
+                self._set(key, True)
+        return self._capabilities[key]
+
+    def read(self, key: str, getter: Callable[[], Any]) -> Any:
+        """Return the value of a getter or None if it is not supported."""
+        if self._capabilities.get(key) is False:
+            return None
+        try:
+            value = getter()
+        except (PyViCareNotSupportedFeatureError, AttributeError):
+            if key not in self._capabilities:
+                self._set(key, False)
+            return None
+        if key not in self._capabilities:
+            self._set(key, True)
+        return value
+
+    def _set(self, key: str, supported: bool) -> None:
+        self._capabilities[key] = supported
+        self._on_change()
+
+    def as_dict(self) -> dict:
+        """Return the manifest for storage."""
+        return {
+            ATTR_FINGERPRINT: self._fingerprint,
+            ATTR_HEATING_TYPE: self._heating_type,
+            ATTR_CAPABILITIES: self._capabilities,
+        }
+
+
+class ViCareCapabilityStore:
+    """Persist the capability manifests of all devices under .storage.
+
+    Manifests of devices that left the device registry are dropped on save.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the store."""
+        self._hass = hass
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._manifests: dict[str, ViCareCapabilities] = {}
+        self._stored: dict[str, dict] = {}
+
+    async def async_load(self) -> None:
+        """Load the stored manifests."""
+        self._stored = await self._store.async_load() or {}
+
+    def get(self, serial: str) -> ViCareCapabilities:
+        """Return the manifest of a device."""
+        if serial not in self._manifests:
+            self._manifests[serial] = ViCareCapabilities(
+                self._stored.get(serial, {}), self._async_schedule_save
+            )
+        return self._manifests[serial]
+
+    @callback
+    def async_remove(self, serial: str) -> None:
+        """Drop the manifest of a removed device."""
+        self._manifests.pop(serial, None)
+        self._stored.pop(serial, None)
+        self._async_schedule_save()
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict:
+        registry = device_registry.async_get(self._hass)
+        data = {
+            serial: manifest
+            for serial, manifest in self._stored.items()
+            if registry.async_get_device({(DOMAIN, serial)}) is not None
+        }
+        for serial, capabilities in self._manifests.items():
+            data[serial] = capabilities.as_dict()
+        return data
+
+
+async def async_load_capability_store(hass: HomeAssistant) -> ViCareCapabilityStore:
+    """Load the capability store."""
+    store = ViCareCapabilityStore(hass)
+    await store.async_load()
+    return store
@@ -1,13 +1,7 @@
 """Viessmann ViCare climate device."""
-from contextlib import suppress
 import logging
 
-from PyViCare.PyViCareUtils import (
-    PyViCareInvalidDataError,
-    PyViCareNotSupportedFeatureError,
-    PyViCareRateLimitError,
-)
-import requests
+from PyViCare.PyViCareUtils import PyViCareInvalidDataError
 import voluptuous as vol
 
 from homeassistant.components.climate import ClimateEntity
@@ -25,14 +19,18 @@ from homeassistant.components.climate.const import (
 from homeassistant.const import ATTR_TEMPERATURE, PRECISION_WHOLE, TEMP_CELSIUS
 from homeassistant.helpers import entity_platform
 
+from .capabilities import capability_key
 from .const import (
     CONF_HEATING_TYPE,
     DOMAIN,
     VICARE_API,
-    VICARE_CIRCUITS,
-    VICARE_DEVICE_CONFIG,
+    VICARE_COMMANDS,
+    VICARE_COORDINATOR,
+    VICARE_DEVICE_LIST,
     VICARE_NAME,
 )
+from .entity import ViCareCommandEntity
+from .topology import named_components
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -92,9 +90,9 @@ HA_TO_VICARE_PRESET_HEATING = {
 }
 
 
-def _build_entity(name, vicare_api, circuit, device_config, heating_type):
+def _build_entity(coordinator, commands, name, vicare_api, circuit, heating_type):
     _LOGGER.debug("Found device %s", name)
-    return ViCareClimate(name, vicare_api, device_config, circuit, heating_type)
+    return ViCareClimate(coordinator, commands, name, vicare_api, circuit, heating_type)
 
 
 async def async_setup_entry(hass, config_entry, async_add_devices):
@@ -103,19 +101,20 @@ async def async_setup_entry(hass, config_entry, async_add_devices):
 
     all_devices = []
 
-    for circuit in hass.data[DOMAIN][config_entry.entry_id][VICARE_CIRCUITS]:
-        suffix = ""
-        if len(hass.data[DOMAIN][config_entry.entry_id][VICARE_CIRCUITS]) > 1:
-            suffix = f" {circuit.id}"
-        entity = _build_entity(
-            f"{name} Heating{suffix}",
-            hass.data[DOMAIN][config_entry.entry_id][VICARE_API],
-            hass.data[DOMAIN][config_entry.entry_id][VICARE_DEVICE_CONFIG],
-            circuit,
-            hass.data[DOMAIN][config_entry.entry_id][CONF_HEATING_TYPE],
-        )
-        if entity is not None:
-            all_devices.append(entity)
+    for device in hass.data[DOMAIN][config_entry.entry_id][VICARE_DEVICE_LIST]:
+        for entity_name, circuit in named_components(
+            name, "Heating", device[VICARE_COORDINATOR].topology.circuits
+        ):
+            entity = _build_entity(
+                device[VICARE_COORDINATOR],
+                device[VICARE_COMMANDS],
+                entity_name,
+                device[VICARE_API],
+                circuit,
+                hass.data[DOMAIN][config_entry.entry_id][CONF_HEATING_TYPE],
+            )
+            if entity is not None:
+                all_devices.append(entity)
 
     platform = entity_platform.async_get_current_platform()
 
@@ -126,57 +125,32 @@ async def async_setup_entry(hass, config_entry, async_add_devices):
                 VICARE_TO_HA_HVAC_HEATING
             )
         },
-        "set_vicare_mode",
+        "async_set_vicare_mode",
     )
 
     async_add_devices(all_devices)
 
 
-async def async_setup_platform(
-    hass, hass_config, async_add_entities, discovery_info=None
-):
-    """Create the ViCare climate devices."""
-    # Legacy setup. Remove after configuration.yaml deprecation end
-    if discovery_info is None:
-        return
-    name = hass.data[DOMAIN][VICARE_NAME]
-
-    async_add_entities(
-        [
-            _build_entity(
-                f"{name} Heating {circuit}",
-                hass.data[DOMAIN][VICARE_API],
-                hass.data[DOMAIN][VICARE_DEVICE_CONFIG],
-                circuit,
-                hass.data[DOMAIN][CONF_HEATING_TYPE],
-            )
-            for circuit in hass.data[DOMAIN][VICARE_CIRCUITS]
-        ]
-    )
-
-    platform = entity_platform.async_get_current_platform()
+class ViCareClimate(ViCareCommandEntity, ClimateEntity):
+    """Representation of the ViCare heating climate device."""
 
-    platform.async_register_entity_service(
-        SERVICE_SET_VICARE_MODE,
-        {
-            vol.Required(SERVICE_SET_VICARE_MODE_ATTR_MODE): vol.In(
-                VICARE_TO_HA_HVAC_HEATING
-            )
-        },
-        "set_vicare_mode",
+    __slots__ = (
+        "_state",
+        "_circuit",
+        "_attributes",
+        "_target_temperature",
+        "_current_mode",
+        "_current_temperature",
+        "_current_program",
+        "_heating_type",
+        "_current_action",
     )
 
-
-class ViCareClimate(ClimateEntity):
-    """Representation of the ViCare heating climate device."""
-
-    def __init__(self, name, api, circuit, device_config, heating_type):
+    def __init__(self, coordinator, commands, name, api, circuit, heating_type):
         """Initialize the climate device."""
-        self._name = name
+        super().__init__(coordinator, commands, f"circuit {circuit.id}", name, api)
         self._state = None
-        self._api = api
         self._circuit = circuit
-        self._device_config = device_config
         self._attributes = {}
         self._target_temperature = None
         self._current_mode = None
@@ -185,31 +159,15 @@ class ViCareClimate(ClimateEntity):
         self._heating_type = heating_type
         self._current_action = None
 
-    @property
-    def unique_id(self):
-        """Return unique ID for this device."""
-        return f"{self._device_config.getConfig().serial}-{self._name}"
-
-    @property
-    def device_info(self):
-        """Return device info for this device."""
-        return {
-            "identifiers": {(DOMAIN, self._device_config.getConfig().serial)},
-            "name": self._device_config.getModel(),
-            "manufacturer": "Viessmann",
-            "model": (DOMAIN, self._device_config.getModel()),
-        }
-
-    def update(self):
-        """Let HA know there has been an update from the ViCare API."""
+    def _update_state(self):
+        """Update the state from the device snapshot."""
         try:
-            _room_temperature = None
-            with suppress(PyViCareNotSupportedFeatureError):
-                _room_temperature = self._circuit.getRoomTemperature()
-
-            _supply_temperature = None
-            with suppress(PyViCareNotSupportedFeatureError):
-                _supply_temperature = self._circuit.getSupplyTemperature()
+            _room_temperature = self._read(
+                "room_temperature", self._circuit.getRoomTemperature
+            )
+            _supply_temperature = self._read(
+                "supply_temperature", self._circuit.getSupplyTemperature
+            )
 
             if _room_temperature is not None:
                 self._current_temperature = _room_temperature
@@ -218,14 +176,17 @@ class ViCareClimate(ClimateEntity):
             else:
                 self._current_temperature = None
 
-            with suppress(PyViCareNotSupportedFeatureError):
-                self._current_program = self._circuit.getActiveProgram()
-
-            with suppress(PyViCareNotSupportedFeatureError):
-                self._target_temperature = self._circuit.getCurrentDesiredTemperature()
-
-            with suppress(PyViCareNotSupportedFeatureError):
-                self._current_mode = self._circuit.getActiveMode()
+            self._current_program = self._read(
+                "active_program", self._circuit.getActiveProgram, self._current_program
+            )
+            self._target_temperature = self._read(
+                "desired_temperature",
+                self._circuit.getCurrentDesiredTemperature,
+                self._target_temperature,
+            )
+            self._current_mode = self._read(
+                "active_mode", self._circuit.getActiveMode, self._current_mode
+            )
 
             # Update the generic device attributes
             self._attributes = {}
@@ -234,47 +195,52 @@ class ViCareClimate(ClimateEntity):
             self._attributes["active_vicare_program"] = self._current_program
             self._attributes["active_vicare_mode"] = self._current_mode
 
-            with suppress(PyViCareNotSupportedFeatureError):
-                self._attributes[
-                    "heating_curve_slope"
-                ] = self._circuit.getHeatingCurveSlope()
+            heating_curve_slope = self._read(
+                "heating_curve_slope", self._circuit.getHeatingCurveSlope
+            )
+            if heating_curve_slope is not None:
+                self._attributes["heating_curve_slope"] = heating_curve_slope
 
-            with suppress(PyViCareNotSupportedFeatureError):
-                self._attributes[
-                    "heating_curve_shift"
-                ] = self._circuit.getHeatingCurveShift()
+            heating_curve_shift = self._read(
+                "heating_curve_shift", self._circuit.getHeatingCurveShift
+            )
+            if heating_curve_shift is not None:
+                self._attributes["heating_curve_shift"] = heating_curve_shift
 
             self._current_action = False
             # Update the specific device attributes
-            with suppress(PyViCareNotSupportedFeatureError):
-                for burner in self._api.burners:
-                    self._current_action = self._current_action or burner.getActive()
-
-            with suppress(PyViCareNotSupportedFeatureError):
-                for compressor in self._api.compressors:
-                    self._current_action = (
-                        self._current_action or compressor.getActive()
-                    )
-
-        except requests.exceptions.ConnectionError:
-            _LOGGER.error("Unable to retrieve data from ViCare server")
-        except PyViCareRateLimitError as limit_exception:
-            _LOGGER.error("Vicare API rate limit exceeded: %s", limit_exception)
+            capabilities = self.coordinator.capabilities
+            topology = self.coordinator.topology
+            for burner in topology.burners:
+                self._current_action = self._current_action or capabilities.read(
+                    capability_key("burner_active", burner), burner.getActive
+                )
+
+            for compressor in topology.compressors:
+                self._current_action = self._current_action or capabilities.read(
+                    capability_key("compressor_active", compressor),
+                    compressor.getActive,
+                )
+
         except ValueError:
             _LOGGER.error("Unable to decode data from ViCare server")
         except PyViCareInvalidDataError as invalid_data_exception:
             _LOGGER.error("Invalid data from Vicare server: %s", invalid_data_exception)
 
+    def _read(self, key, getter, default=None):
+        """Read a circuit getter, skipping getters the device does not support."""
+        value = self.coordinator.capabilities.read(
+            capability_key(key, self._circuit), getter
+        )
+        if value is None:
+            return default
+        return value
+
     @property
     def supported_features(self):
         """Return the list of supported features."""
         return SUPPORT_FLAGS_HEATING
 
-    @property
-    def name(self):
-        """Return the name of the climate device."""
-        return self._name
-
     @property
     def temperature_unit(self):
         """Return the unit of measurement."""
@@ -295,7 +261,7 @@ class ViCareClimate(ClimateEntity):
         """Return current hvac mode."""
         return VICARE_TO_HA_HVAC_HEATING.get(self._current_mode)
 
-    def set_hvac_mode(self, hvac_mode):
+    async def async_set_hvac_mode(self, hvac_mode):
         """Set a new hvac mode on the ViCare API."""
         vicare_mode = HA_TO_VICARE_HVAC_HEATING.get(hvac_mode)
         if vicare_mode is None:
@@ -304,7 +270,13 @@ class ViCareClimate(ClimateEntity):
             )
 
         _LOGGER.debug("Setting hvac mode to %s / %s", hvac_mode, vicare_mode)
-        self._circuit.setMode(vicare_mode)
+        await self._async_send(
+            "mode",
+            [self._feature("operating.modes.active")],
+            self._circuit.setMode,
+            vicare_mode,
+            _current_mode=vicare_mode,
+        )
 
     @property
     def hvac_modes(self):
@@ -333,12 +305,22 @@ class ViCareClimate(ClimateEntity):
         """Return the precision of the system."""
         return PRECISION_WHOLE
 
-    def set_temperature(self, **kwargs):
+    async def async_set_temperature(self, **kwargs):
         """Set new target temperatures."""
         temp = kwargs.get(ATTR_TEMPERATURE)
         if temp is not None:
-            self._circuit.setProgramTemperature(self._current_program, temp)
-            self._target_temperature = temp
+            if self._current_program is None:
+                raise ValueError(
+                    "Cannot set temperature, the active program is unknown"
+                )
+            await self._async_send(
+                f"temperature {self._current_program}",
+                [self._feature(f"operating.programs.{self._current_program}")],
+                self._circuit.setProgramTemperature,
+                self._current_program,
+                temp,
+                _target_temperature=temp,
+            )
 
     @property
     def preset_mode(self):
@@ -350,7 +332,7 @@ class ViCareClimate(ClimateEntity):
         """Return the available preset mode."""
         return list(VICARE_TO_HA_PRESET_HEATING)
 
-    def set_preset_mode(self, preset_mode):
+    async def async_set_preset_mode(self, preset_mode):
         """Set new preset mode and deactivate any existing programs."""
         vicare_program = HA_TO_VICARE_PRESET_HEATING.get(preset_mode)
         if vicare_program is None:
@@ -359,17 +341,54 @@ class ViCareClimate(ClimateEntity):
             )
 
         _LOGGER.debug("Setting preset to %s / %s", preset_mode, vicare_program)
-        self._circuit.deactivateProgram(self._current_program)
+        features = [
+            self._feature("operating.programs.active"),
+            self._feature(f"operating.programs.{vicare_program}"),
+        ]
+        # The program shown may be a requested one still waiting to be sent
+        device_program = self._read("active_program", self._circuit.getActiveProgram)
+        if device_program is not None:
+            features.append(self._feature(f"operating.programs.{device_program}"))
+        await self._async_send(
+            "program",
+            features,
+            self._switch_program,
+            vicare_program,
+            _current_program=vicare_program,
+        )
+
+    def _switch_program(self, vicare_program):
+        """Leave the preset program active on the device and activate another one.
+
+        Runs when the command is sent, so the program to deactivate is read
+        from the snapshot and not from a preset requested in the meantime.
+        """
+        device_program = self._read("active_program", self._circuit.getActiveProgram)
+        if (
+            device_program in VICARE_TO_HA_PRESET_HEATING
+            and device_program != vicare_program
+        ):
+            self._circuit.deactivateProgram(device_program)
         self._circuit.activateProgram(vicare_program)
 
     @property
     def extra_state_attributes(self):
         """Show Device Attributes."""
-        return self._attributes
+        return {**self._attributes, **(super().extra_state_attributes or {})}
 
-    def set_vicare_mode(self, vicare_mode):
+    async def async_set_vicare_mode(self, vicare_mode):
         """Service function to set vicare modes directly."""
         if vicare_mode not in VICARE_TO_HA_HVAC_HEATING:
             raise ValueError(f"Cannot set invalid vicare mode: {vicare_mode}")
 
-        self._circuit.setMode(vicare_mode)
+        await self._async_send(
+            "mode",
+            [self._feature("operating.modes.active")],
+            self._circuit.setMode,
+            vicare_mode,
+            _current_mode=vicare_mode,
+        )
+
+    def _feature(self, name):
+        """Return the name of a feature of the circuit."""
+        return f"heating.circuits.{self._circuit.id}.{name}"
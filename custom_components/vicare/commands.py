@@ -0,0 +1,179 @@
+"""Debounced write commands of ViCare devices."""
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from functools import partial
+import logging
+import time
+from typing import Any, Callable
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .coordinator import ViCareDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds a command waits for newer values before it is sent
+COMMAND_DEBOUNCE = 1.5
+RESULT_HISTORY = 50
+
+
+@dataclass(frozen=True)
+class ViCareCommandResult:
+    """Outcome of a single submitted command."""
+
+    name: str
+    latency: float
+    merged: bool
+
+
+@dataclass
+class _QueuedCommand:
+    """Command waiting to be sent, together with everyone waiting for it."""
+
+    name: str
+    features: set[str]
+    job: tuple[Callable[..., Any], tuple]
+    waiters: list[tuple[asyncio.Future, float]] = field(default_factory=list)
+
+
+class ViCareCommandQueue:
+    """Send the write commands of a single device.
+
+    Commands are collected per target, a heating circuit or the hot water
+    system, until no new command arrived for the debounce delay. A command
+    replacing a value that is still waiting takes its place, so a burst of
+    setpoint changes ends up as a single write of the last value. The
+    commands of a target are sent one after the other, in the order they
+    were first submitted, and never overlap with another batch of the same
+    target.
+
+    Once a batch was sent, only the features the commands touched are read
+    back and patched into the snapshot of the device, which confirms the
+    new state without fetching all features again.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, coordinator: ViCareDataUpdateCoordinator
+    ) -> None:
+        """Initialize the queue."""
+        self.hass = hass
+        self._coordinator = coordinator
+        self._pending: dict[str, dict[str, _QueuedCommand]] = {}
+        self._timers: dict[str, CALLBACK_TYPE] = {}
+        self._locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self.results: deque[ViCareCommandResult] = deque(maxlen=RESULT_HISTORY)
+
+    async def async_send(
+        self,
+        target: str,
+        key: str,
+        features: list[str],
+        func: Callable[..., Any],
+        *args,
+    ) -> ViCareCommandResult:
+        """Queue a command and wait until it, or a newer value, was confirmed.
+
+        `features` names the features the command changes, they are read
+        back once it was sent.
+        """
+        pending = self._pending.setdefault(target, {})
+        command = pending.get(key)
+        if command is None:
+            command = pending[key] = _QueuedCommand(
+                f"{target} {key}", set(features), (func, args)
+            )
+        else:
+            # The newer value replaces the one still waiting
+            command.features.update(features)
+            command.job = (func, args)
+
+        future = self.hass.loop.create_future()
+        command.waiters.append((future, time.monotonic()))
+
+        cancel = self._timers.pop(target, None)
+        if cancel is not None:
+            cancel()
+        self._timers[target] = async_call_later(
+            self.hass, COMMAND_DEBOUNCE, partial(self._async_schedule_flush, target)
+        )
+        return await future
+
+    @callback
+    def _async_schedule_flush(self, target: str, _now) -> None:
+        self._timers.pop(target, None)
+        self.hass.async_create_task(self._async_flush(target))
+
+    async def _async_flush(self, target: str) -> None:
+        """Send the waiting commands of a target."""
+        async with self._locks[target]:
+            commands = self._pending.pop(target, {})
+            sent = []
+            for command in commands.values():
+                func, args = command.job
+                try:
+                    with self._coordinator.tracer.span(
+                        "command",
+                        self._coordinator.serial,
+                        command=command.name,
+                        submissions=len(command.waiters),
+                    ):
+                        await self._coordinator.service.async_execute(func, *args)
+                except Exception as err:  # pylint: disable=broad-except
+                    for future, _ in command.waiters:
+                        if not future.done():
+                            future.set_exception(err)
+                    continue
+                sent.append(command)
+
+            if sent:
+                await self._async_verify(sent)
+            for command in sent:
+                self._complete(command)
+
+    async def _async_verify(self, commands: list[_QueuedCommand]) -> None:
+        """Read back the features changed by sent commands."""
+        names = sorted(set().union(*(command.features for command in commands)))
+        try:
+            with self._coordinator.tracer.span(
+                "verify", self._coordinator.serial, features=names
+            ):
+                features = await self._coordinator.service.async_fetch_features(
+                    names
+                )
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.debug("Unable to read back %s, refreshing all: %s", names, err)
+            await self._coordinator.async_request_refresh()
+            return
+        self._coordinator.async_patch_features(features)
+
+    def _complete(self, command: _QueuedCommand) -> None:
+        """Report the latency of every submission a command carried."""
+        sent = time.monotonic()
+        last = len(command.waiters) - 1
+        for index, (future, submitted) in enumerate(command.waiters):
+            result = ViCareCommandResult(command.name, sent - submitted, index < last)
+            self.results.append(result)
+            _LOGGER.debug(
+                "Command %s completed after %.2f s%s",
+                result.name,
+                result.latency,
+                " (merged into a newer value)" if result.merged else "",
+            )
+            if not future.done():
+                future.set_result(result)
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Drop all commands that were not sent yet."""
+        for cancel in self._timers.values():
+            cancel()
+        self._timers.clear()
+        for commands in self._pending.values():
+            for command in commands.values():
+                for future, _ in command.waiters:
+                    future.cancel()
+        self._pending.clear()
@@ -16,16 +16,24 @@ from homeassistant.const import (
     CONF_SCAN_INTERVAL,
     CONF_USERNAME,
 )
+from homeassistant.core import callback
 import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.device_registry import format_mac
 
-from . import vicare_login
 from .const import (
     CONF_HEATING_TYPE,
+    CONF_MAX_SCAN_INTERVAL,
+    CONF_MAX_STALENESS,
+    CONF_MIN_SCAN_INTERVAL,
+    CONF_RECORD_TRAFFIC,
+    CONF_TRACE,
     DEFAULT_HEATING_TYPE,
+    DEFAULT_MAX_SCAN_INTERVAL,
+    DEFAULT_MAX_STALENESS,
     DEFAULT_SCAN_INTERVAL,
     DOMAIN,
 )
+from .session import async_get_session_registry
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -35,11 +43,14 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Get the options flow for this handler."""
+        return OptionsFlowHandler(config_entry)
+
     async def async_step_user(self, user_input: dict[str, Any] | None = None):
         """Invoke when a user initiates a flow via the user interface."""
-        if self._async_current_entries():
-            return self.async_abort(reason="single_instance_allowed")
-
         data_schema = {
             vol.Required(CONF_USERNAME): cv.string,
             vol.Required(CONF_PASSWORD): cv.string,
@@ -55,10 +66,11 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         errors: dict[str, str] = {}
 
         if user_input is not None:
+            # Every account can be added once
+            await self.async_set_unique_id(user_input[CONF_USERNAME])
+            self._abort_if_unique_id_configured()
             try:
-                await self.hass.async_add_executor_job(
-                    vicare_login, self.hass, user_input
-                )
+                await async_get_session_registry(self.hass).async_get(user_input)
                 return self.async_create_entry(
                     title=user_input[CONF_NAME], data=user_input
                 )
@@ -101,3 +113,55 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             title="Configuration.yaml",
             data=import_info,
         )
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle the poll interval, staleness, recording and tracing options."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Initialize options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(self, user_input: dict[str, Any] | None = None):
+        """Manage the poll intervals, staleness, traffic recording and trace."""
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            if user_input[CONF_MIN_SCAN_INTERVAL] > user_input[CONF_MAX_SCAN_INTERVAL]:
+                errors["base"] = "invalid_interval"
+            elif user_input[CONF_MAX_STALENESS] < user_input[CONF_MAX_SCAN_INTERVAL]:
+                errors["base"] = "invalid_staleness"
+            else:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+        data_schema = {
+            vol.Optional(
+                CONF_MIN_SCAN_INTERVAL,
+                default=options.get(
+                    CONF_MIN_SCAN_INTERVAL,
+                    self.config_entry.data.get(
+                        CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL
+                    ),
+                ),
+            ): vol.All(vol.Coerce(int), vol.Range(min=30)),
+            vol.Optional(
+                CONF_MAX_SCAN_INTERVAL,
+                default=options.get(CONF_MAX_SCAN_INTERVAL, DEFAULT_MAX_SCAN_INTERVAL),
+            ): vol.All(vol.Coerce(int), vol.Range(min=30)),
+            vol.Optional(
+                CONF_MAX_STALENESS,
+                default=options.get(CONF_MAX_STALENESS, DEFAULT_MAX_STALENESS),
+            ): vol.All(vol.Coerce(int), vol.Range(min=30)),
+            vol.Optional(
+                CONF_RECORD_TRAFFIC,
+                default=options.get(CONF_RECORD_TRAFFIC, False),
+            ): bool,
+            vol.Optional(CONF_TRACE, default=options.get(CONF_TRACE, False)): bool,
+        }
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(data_schema),
+            errors=errors,
+        )
@@ -1,4 +1,5 @@
 """Constants for the ViCare integration."""
+from datetime import timedelta
 import enum
 
 DOMAIN = "vicare"
@@ -6,13 +7,37 @@ DOMAIN = "vicare"
 PLATFORMS = ["climate", "sensor", "binary_sensor", "water_heater"]
 
 VICARE_DEVICE_CONFIG = "device_conf"
+VICARE_DEVICE_LIST = "device_list"
 VICARE_API = "api"
+VICARE_CAPABILITIES = "capabilities"
 VICARE_NAME = "name"
-VICARE_CIRCUITS = "circuits"
+VICARE_COORDINATOR = "coordinator"
+VICARE_COMMANDS = "commands"
+VICARE_SESSION = "session"
+
+# hass.data keys of state kept across entry reloads
+VICARE_SESSIONS = f"{DOMAIN}_sessions"
+VICARE_CAPABILITY_STORE = f"{DOMAIN}_capabilities"
 
 CONF_HEATING_TYPE = "heating_type"
+CONF_MIN_SCAN_INTERVAL = "min_scan_interval"
+CONF_MAX_SCAN_INTERVAL = "max_scan_interval"
+CONF_MAX_STALENESS = "max_staleness"
+CONF_RECORD_TRAFFIC = "record_traffic"
+CONF_REPLAY = "replay"
+CONF_TRACE = "trace"
+
+ATTR_STALE = "stale"
+ATTR_DATA_AGE = "data_age"
+ATTR_LAST_SUCCESSFUL_REFRESH = "last_successful_refresh"
 
 DEFAULT_SCAN_INTERVAL = 60
+DEFAULT_MAX_SCAN_INTERVAL = 900
+# Entities serve the last good snapshot for this long before going unavailable
+DEFAULT_MAX_STALENESS = 3600
+# Calls per day allowed by the basic plan of the Viessmann API
+API_DAILY_QUOTA = 1450
+MAX_PARALLEL_FETCHES = 4
 DEFAULT_HEATING_TYPE = "auto"
 
 
@@ -25,3 +50,16 @@ class HeatingType(enum.Enum):
     pellets = "pellets"
     heatpump = "heatpump"
     fuelcell = "fuelcell"
+
+
+class RefreshTier(enum.Enum):
+    """How often work derived from the snapshot of a device is redone."""
+
+    realtime = "realtime"
+    hourly = "hourly"
+
+
+# Work of a slow tier, like importing statistics, is redone only this often
+REFRESH_TIER_INTERVALS = {
+    RefreshTier.hourly: timedelta(hours=1),
+}
@@ -0,0 +1,285 @@
+"""Data update coordinator for the ViCare integration."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+from functools import partial
+import logging
+import time
+from typing import Any, Callable
+
+import aiohttp
+from PyViCare.PyViCareUtils import (
+    PyViCareInternalServerError,
+    PyViCareInvalidDataError,
+    PyViCareRateLimitError,
+)
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+import homeassistant.util.dt as dt_util
+
+from .breaker import ViCareCircuitOpenError
+from .capabilities import ViCareCapabilities
+from .const import (
+    ATTR_DATA_AGE,
+    ATTR_LAST_SUCCESSFUL_REFRESH,
+    ATTR_STALE,
+    DEFAULT_MAX_STALENESS,
+    DOMAIN,
+    REFRESH_TIER_INTERVALS,
+    RefreshTier,
+)
+from .metrics import ViCareMetrics
+from .polling import ViCarePollScheduler
+from .quota import ViCareQuotaGovernor
+from .service import ViCareSnapshotService
+from .snapshot import ViCareSnapshotStore
+from .topology import ViCareTopology, read_topology
+from .trace import ViCareTracer
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ViCareDataUpdateCoordinator(DataUpdateCoordinator):
+    """Fetch the feature snapshot of a single ViCare device.
+
+    Entities always read the last good snapshot. A failed refresh leaves it
+    in place, and the entities stay available with the age of their data
+    until it is older than the maximum staleness.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        device_config,
+        serial: str,
+        api,
+        service: ViCareSnapshotService,
+        capabilities: ViCareCapabilities,
+        snapshot_store: ViCareSnapshotStore,
+        scheduler: ViCarePollScheduler,
+        fetch_semaphore: asyncio.Semaphore,
+        governor: ViCareQuotaGovernor,
+        metrics: ViCareMetrics,
+        tracer: ViCareTracer,
+        poll_offset: timedelta = timedelta(0),
+        max_staleness: timedelta = timedelta(seconds=DEFAULT_MAX_STALENESS),
+    ) -> None:
+        """Initialize the coordinator."""
+        model = device_config.getModel()
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"{DOMAIN} {model}",
+            update_interval=scheduler.interval + poll_offset,
+        )
+        self.serial = serial
+        self.device_info = DeviceInfo(
+            identifiers={(DOMAIN, serial)},
+            name=model,
+            manufacturer="Viessmann",
+            model=(DOMAIN, model),
+        )
+        self.api = api
+        self.service = service
+        self.capabilities = capabilities
+        self.topology: ViCareTopology | None = None
+        self.restored = False
+        self.last_successful_refresh: datetime | None = None
+        self.max_staleness = max_staleness
+        self._unsub_expiry: CALLBACK_TYPE | None = None
+        self._snapshot_store = snapshot_store
+        self._fetch_semaphore = fetch_semaphore
+        self._governor = governor
+        self._metrics = metrics
+        self.tracer = tracer
+        self._scheduler = scheduler
+        # Delays the first scheduled poll to spread devices across the interval
+        self._poll_offset = poll_offset
+        self._tiers_refreshed: dict[RefreshTier, datetime] = {}
+        self._due_tiers = set(RefreshTier)
+        self._refresh_callbacks: list[CALLBACK_TYPE] = []
+
+    @property
+    def data_available(self) -> bool:
+        """Return True while the snapshot is recent enough to be served."""
+        return (
+            self.last_successful_refresh is not None
+            and dt_util.utcnow() - self.last_successful_refresh <= self.max_staleness
+        )
+
+    @property
+    def staleness_attributes(self) -> dict[str, Any] | None:
+        """Return the age of the snapshot unless the last refresh fetched it."""
+        if self.last_update_success and not self.restored:
+            return None
+        data_age = None
+        if self.last_successful_refresh is not None:
+            data_age = round(
+                (dt_util.utcnow() - self.last_successful_refresh).total_seconds()
+            )
+        return {
+            ATTR_STALE: True,
+            ATTR_DATA_AGE: data_age,
+            ATTR_LAST_SUCCESSFUL_REFRESH: self.last_successful_refresh,
+        }
+
+    @callback
+    def async_restore(self, features, fetched: datetime) -> None:
+        """Serve a snapshot restored from disk until the first live refresh."""
+        self.service.snapshot = features
+        self._update_topology(self.capabilities.check_features(features))
+        self.data = features
+        self.restored = True
+        self._async_set_refreshed(fetched)
+        # The first poll was already delayed by the initial interval
+        self._poll_offset = timedelta(0)
+        self._due_tiers = set(RefreshTier)
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop waiting for the snapshot to expire."""
+        if self._unsub_expiry is not None:
+            self._unsub_expiry()
+            self._unsub_expiry = None
+
+    @callback
+    def _async_set_refreshed(self, refreshed: datetime) -> None:
+        """Note a good snapshot, notifying entities once it gets too old."""
+        self.last_successful_refresh = refreshed
+        self.async_shutdown()
+        self._unsub_expiry = async_track_point_in_utc_time(
+            self.hass, self._async_expired, refreshed + self.max_staleness
+        )
+
+    @callback
+    def _async_expired(self, _now: datetime) -> None:
+        """Let entities go unavailable once the snapshot is too old."""
+        self._unsub_expiry = None
+        self.async_update_listeners()
+
+    @callback
+    def async_patch_features(self, features) -> None:
+        """Replace single features of the current snapshot and notify entities."""
+        patched = {feature["feature"]: feature for feature in features}
+        snapshot = [
+            patched.pop(feature["feature"], feature)
+            for feature in self.service.snapshot or []
+        ]
+        self.service.snapshot = snapshot
+        self.data = snapshot
+        self._snapshot_store.async_schedule_save(snapshot)
+        self.async_update_listeners()
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> Callable[[], None]:
+        """Listen for data updates, timing the updates of entities per platform."""
+        entity = getattr(update_callback, "__self__", None)
+        platform = getattr(entity, "platform", None)
+        if platform is None:
+            return super().async_add_listener(update_callback)
+        histogram = self._metrics.entity_updates[platform.domain]
+
+        @callback
+        def _async_timed_update() -> None:
+            start = time.perf_counter()
+            with self.tracer.span(
+                "entity_update", self.serial, entity_id=entity.entity_id
+            ):
+                update_callback()
+            histogram.record(time.perf_counter() - start)
+
+        return super().async_add_listener(_async_timed_update)
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Notify all listeners without fetching new data."""
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    @callback
+    def async_add_refresh_callback(
+        self, refresh_callback: CALLBACK_TYPE
+    ) -> Callable[[], None]:
+        """Call back once a refresh finished, whether it succeeded or not.
+
+        Unlike listeners, the callback is not called when the snapshot is
+        patched after a command or when it expires.
+        """
+        self._refresh_callbacks.append(refresh_callback)
+        return partial(self._refresh_callbacks.remove, refresh_callback)
+
+    def _update_topology(self, features_changed: bool) -> None:
+        """Read the components again when the feature list changed."""
+        if features_changed or self.topology is None:
+            self.topology = read_topology(self.api)
+
+    def tier_due(self, tier: RefreshTier) -> bool:
+        """Return True if work of a tier should be redone for the current snapshot."""
+        return tier in self._due_tiers
+
+    def _update_due_tiers(self, features_changed: bool) -> None:
+        """Work out which tiers read the snapshot fetched in this cycle."""
+        now = dt_util.utcnow()
+        self._due_tiers = {RefreshTier.realtime}
+        for tier, interval in REFRESH_TIER_INTERVALS.items():
+            refreshed = self._tiers_refreshed.get(tier)
+            if features_changed or refreshed is None or now - refreshed >= interval:
+                self._due_tiers.add(tier)
+                self._tiers_refreshed[tier] = now
+
+    async def _async_refresh(self, *args, **kwargs) -> None:
+        """Refresh the data, then call back everyone waiting for refreshes."""
+        await super()._async_refresh(*args, **kwargs)
+        for refresh_callback in list(self._refresh_callbacks):
+            refresh_callback()
+
+    async def _async_update_data(self):
+        """Fetch the feature snapshot of the device."""
+        interval = self._scheduler.interval
+        try:
+            features = await self._async_fetch()
+            interval = self._scheduler.update(self.topology, self.capabilities)
+            return features
+        finally:
+            # Stretch the next poll to what the remaining quota allows
+            self.update_interval = (
+                self._governor.poll_interval(interval) + self._poll_offset
+            )
+            self._poll_offset = timedelta(0)
+
+    async def _async_fetch(self):
+        blocked_until = self._governor.blocked_until
+        if blocked_until is not None:
+            raise UpdateFailed(f"Vicare API rate limit exceeded until {blocked_until}")
+
+        try:
+            async with self._fetch_semaphore:
+                with self.tracer.span("fetch", self.serial) as span:
+                    features = await self.service.async_fetch()
+                    span["features"] = len(features)
+        except ViCareCircuitOpenError as err:
+            raise UpdateFailed(str(err)) from err
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            raise UpdateFailed("Unable to retrieve data from ViCare server") from err
+        except ValueError as err:
+            raise UpdateFailed("Unable to decode data from ViCare server") from err
+        except PyViCareInternalServerError as err:
+            raise UpdateFailed(f"ViCare server error: {err.message}") from err
+        except PyViCareRateLimitError as err:
+            raise UpdateFailed(f"Vicare API rate limit exceeded: {err}") from err
+        except PyViCareInvalidDataError as err:
+            raise UpdateFailed(f"Invalid data from Vicare server: {err}") from err
+
+        with self.tracer.span("parse", self.serial) as span:
+            features_changed = self.capabilities.check_features(features)
+            self._update_topology(features_changed)
+            self._update_due_tiers(features_changed or self.restored)
+            span["features_changed"] = features_changed
+        self._snapshot_store.async_schedule_save(features)
+        self._async_set_refreshed(dt_util.utcnow())
+        self.restored = False
+        return features
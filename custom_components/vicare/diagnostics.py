@@ -0,0 +1,61 @@
+"""Diagnostics support for ViCare."""
+from __future__ import annotations
+
+from dataclasses import asdict
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_CLIENT_ID, CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, VICARE_COORDINATOR, VICARE_DEVICE_LIST, VICARE_SESSION
+
+TO_REDACT = {CONF_CLIENT_ID, CONF_PASSWORD, CONF_USERNAME}
+REDACTED = "**REDACTED**"
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics of a config entry."""
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    session = entry_data[VICARE_SESSION]
+    governor = session.governor
+    return {
+        "entry": {
+            "data": _redact(entry.data),
+            "options": dict(entry.options),
+        },
+        "quota": {
+            "used": governor.used,
+            "remaining": governor.remaining,
+            "blocked_until": governor.blocked_until,
+            "projected_exhaustion": governor.projected_exhaustion(),
+        },
+        "breaker": session.breaker.as_dict(),
+        "transport": asdict(session.transport.stats),
+        "metrics": session.metrics.as_dict(),
+        "devices": [
+            _device_diagnostics(device[VICARE_COORDINATOR])
+            for device in entry_data.get(VICARE_DEVICE_LIST, [])
+        ],
+    }
+
+
+def _device_diagnostics(coordinator) -> dict[str, Any]:
+    topology = coordinator.topology
+    return {
+        "model": coordinator.device_info["name"],
+        "last_update_success": coordinator.last_update_success,
+        "last_successful_refresh": coordinator.last_successful_refresh,
+        "update_interval": coordinator.update_interval,
+        "restored": coordinator.restored,
+        "features": len(coordinator.data or []),
+        "circuits": len(topology.circuits) if topology else 0,
+        "burners": len(topology.burners) if topology else 0,
+        "compressors": len(topology.compressors) if topology else 0,
+    }
+
+
+def _redact(data) -> dict[str, Any]:
+    return {key: REDACTED if key in TO_REDACT else value for key, value in data.items()}
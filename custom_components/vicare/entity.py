@@ -0,0 +1,104 @@
+"""Base entities of the ViCare integration."""
+from __future__ import annotations
+
+from typing import Any, Callable
+
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .commands import ViCareCommandQueue
+from .coordinator import ViCareDataUpdateCoordinator
+
+
+class ViCareEntity(CoordinatorEntity):
+    """Entity reading the snapshot of a single ViCare device.
+
+    Unique id and device info are fixed when the entity is built. All
+    entities of a device share the device info of their coordinator. While
+    a refresh fails the entity keeps the state read from the last good
+    snapshot, telling its age, until the snapshot is too old.
+    """
+
+    __slots__ = ("_api",)
+
+    def __init__(
+        self, coordinator: ViCareDataUpdateCoordinator, name: str, api: Any
+    ) -> None:
+        """Initialize the entity."""
+        super().__init__(coordinator)
+        self._api = api
+        self._attr_name = name
+        self._attr_unique_id = f"{coordinator.serial}-{name}"
+        self._attr_device_info = coordinator.device_info
+
+    @property
+    def available(self) -> bool:
+        """Return True while the snapshot of the device is recent enough."""
+        return self.coordinator.data_available
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Tell the age of the state while it is not from the latest refresh."""
+        return self.coordinator.staleness_attributes
+
+    async def async_added_to_hass(self):
+        """Read the initial state when added to hass."""
+        await super().async_added_to_hass()
+        self._update_state()
+
+    def _update_state(self):
+        """Update the state from the device snapshot."""
+        raise NotImplementedError
+
+
+class ViCareCommandEntity(ViCareEntity):
+    """Entity sending write commands through the command queue of its device."""
+
+    __slots__ = ("_commands", "_target", "_writes_pending")
+
+    def __init__(
+        self,
+        coordinator: ViCareDataUpdateCoordinator,
+        commands: ViCareCommandQueue,
+        target: str,
+        name: str,
+        api: Any,
+    ) -> None:
+        """Initialize the entity."""
+        super().__init__(coordinator, name, api)
+        self._commands = commands
+        self._target = target
+        self._writes_pending = 0
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Read the state from the new snapshot and write it."""
+        if not self._writes_pending:
+            # Keep showing the requested state until the write is confirmed
+            self._update_state()
+        super()._handle_coordinator_update()
+
+    async def _async_send(
+        self, key: str, features: list[str], func: Callable, *args, **optimistic_state
+    ) -> None:
+        """Send a command, showing the state it requests until it is confirmed.
+
+        The state is read from the features written back by the device once
+        the command was sent, and rolled back if the command failed.
+        """
+        previous_state = {attr: getattr(self, attr) for attr in optimistic_state}
+        for attr, value in optimistic_state.items():
+            setattr(self, attr, value)
+        self._writes_pending += 1
+        self.async_write_ha_state()
+        try:
+            await self._commands.async_send(self._target, key, features, func, *args)
+        except Exception:
+            for attr, value in previous_state.items():
+                setattr(self, attr, value)
+            raise
+        finally:
+            self._writes_pending -= 1
+            if not self._writes_pending:
+                self._update_state()
+            self.async_write_ha_state()
@@ -0,0 +1,173 @@
+"""Rolling performance metrics of a ViCare account."""
+from __future__ import annotations
+
+from collections import defaultdict, deque
+import time
+from typing import Any
+
+# Metrics cover the last hour
+METRICS_WINDOW = 3600
+# Samples kept per histogram, the newest win once there are more
+MAX_SAMPLES = 10000
+# Upper bounds of the latency buckets in seconds
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Upper bounds of the payload size buckets in bytes
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144)
+
+
+class RollingCounter:
+    """Count events within a rolling window.
+
+    Events are counted per second, so the counter stays small however many
+    events are recorded.
+    """
+
+    def __init__(self, window: float = METRICS_WINDOW) -> None:
+        """Initialize the counter."""
+        self._window = window
+        # Seconds with events and the number of events in each
+        self._seconds: deque[list[int]] = deque()
+        self.total = 0
+
+    def record(self) -> None:
+        """Count an event."""
+        now = time.monotonic()
+        second = int(now)
+        if self._seconds and self._seconds[-1][0] == second:
+            self._seconds[-1][1] += 1
+        else:
+            self._seconds.append([second, 1])
+        self.total += 1
+        self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self._window
+        while self._seconds and self._seconds[0][0] < cutoff:
+            self._seconds.popleft()
+
+    @property
+    def count(self) -> int:
+        """Return the number of events within the window."""
+        self._prune(time.monotonic())
+        return sum(count for _, count in self._seconds)
+
+
+class RollingHistogram:
+    """Keep the samples of a rolling window and summarise them."""
+
+    def __init__(
+        self,
+        bounds: tuple[float, ...] = LATENCY_BUCKETS,
+        window: float = METRICS_WINDOW,
+    ) -> None:
+        """Initialize the histogram."""
+        self._bounds = bounds
+        self._window = window
+        self._samples: deque[tuple[float, float]] = deque(maxlen=MAX_SAMPLES)
+
+    def record(self, value: float) -> None:
+        """Add a sample."""
+        now = time.monotonic()
+        self._samples.append((now, value))
+        self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self._window
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+
+    def values(self) -> list[float]:
+        """Return the samples within the window, oldest first."""
+        self._prune(time.monotonic())
+        return [value for _, value in self._samples]
+
+    def percentile(self, fraction: float) -> float | None:
+        """Return the sample below which the given fraction of samples falls."""
+        return _percentile(sorted(self.values()), fraction)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return count, mean, percentiles and cumulative bucket counts."""
+        values = sorted(self.values())
+        if not values:
+            return {"count": 0}
+        return {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "p50": _percentile(values, 0.5),
+            "p95": _percentile(values, 0.95),
+            "max": values[-1],
+            "buckets": {
+                f"le_{bound}": sum(1 for value in values if value <= bound)
+                for bound in self._bounds
+            },
+        }
+
+
+def _percentile(values: list[float], fraction: float) -> float | None:
+    if not values:
+        return None
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+class ViCareMetrics:
+    """Rolling counters and histograms of the requests of a ViCare account.
+
+    Requests, token renewals and writes are measured where the session
+    and token manager send them. Snapshot lookups count how many PyViCare
+    getters found their feature in the snapshot, and entity updates are
+    timed per platform by the coordinators.
+    """
+
+    def __init__(self) -> None:
+        """Initialize empty metrics."""
+        self.requests = RollingCounter()
+        self.fetch_latency = RollingHistogram()
+        self.write_latency = RollingHistogram()
+        self.token_latency = RollingHistogram()
+        self.payload_size = RollingHistogram(SIZE_BUCKETS)
+        self.snapshot_hits = RollingCounter()
+        self.snapshot_misses = RollingCounter()
+        self.entity_updates: defaultdict[str, RollingHistogram] = defaultdict(
+            RollingHistogram
+        )
+
+    @property
+    def snapshot_hit_ratio(self) -> float | None:
+        """Return the share of getters answered from the snapshot in percent."""
+        hits = self.snapshot_hits.count
+        lookups = hits + self.snapshot_misses.count
+        if not lookups:
+            return None
+        return round(100 * hits / lookups, 1)
+
+    def entity_update_percentile(self, fraction: float) -> float | None:
+        """Return the percentile of entity updates of the slowest platform."""
+        percentiles = [
+            percentile
+            for histogram in self.entity_updates.values()
+            if (percentile := histogram.percentile(fraction)) is not None
+        ]
+        return max(percentiles, default=None)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return all metrics."""
+        return {
+            "requests_last_hour": self.requests.count,
+            "requests_total": self.requests.total,
+            "fetch_latency": self.fetch_latency.as_dict(),
+            "write_latency": self.write_latency.as_dict(),
+            "token_latency": self.token_latency.as_dict(),
+            "payload_size": self.payload_size.as_dict(),
+            "snapshot_hit_ratio": self.snapshot_hit_ratio,
+            "entity_updates": {
+                platform: histogram.as_dict()
+                for platform, histogram in self.entity_updates.items()
+            },
+        }
+
+
+def milliseconds(seconds: float | None) -> float | None:
+    """Convert a latency to rounded milliseconds."""
+    if seconds is None:
+        return None
+    return round(seconds * 1000, 1)
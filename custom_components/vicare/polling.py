@@ -0,0 +1,118 @@
+"""Adaptive poll intervals of ViCare devices."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import timedelta
+import logging
+
+from PyViCare.PyViCareUtils import PyViCareInvalidDataError
+
+from .capabilities import ViCareCapabilities, capability_key
+from .topology import ViCareTopology
+
+_LOGGER = logging.getLogger(__name__)
+
+# Factor the interval grows by with every cycle the device stays idle
+BACKOFF_FACTOR = 2
+# Temperature change between two cycles that counts as activity
+TEMPERATURE_CHANGE = 0.5
+
+
+@dataclass(frozen=True)
+class ViCareActivity:
+    """Activity of a device as seen in a single snapshot."""
+
+    running: bool
+    programs: tuple
+    temperatures: tuple
+
+
+def read_activity(
+    topology: ViCareTopology, capabilities: ViCareCapabilities
+) -> ViCareActivity:
+    """Read running equipment, active programs and temperatures of a device."""
+    api = topology.device
+    running = False
+    for burner in topology.burners:
+        running = running or bool(
+            capabilities.read(capability_key("burner_active", burner), burner.getActive)
+        )
+    for compressor in topology.compressors:
+        running = running or bool(
+            capabilities.read(
+                capability_key("compressor_active", compressor), compressor.getActive
+            )
+        )
+
+    programs = []
+    temperatures = [
+        capabilities.read("boiler_temperature", lambda: api.getBoilerTemperature())
+    ]
+    for circuit in topology.circuits:
+        programs.append(
+            capabilities.read(
+                capability_key("active_program", circuit), circuit.getActiveProgram
+            )
+        )
+        temperatures.append(
+            capabilities.read(
+                capability_key("supply_temperature", circuit),
+                circuit.getSupplyTemperature,
+            )
+        )
+
+    return ViCareActivity(running, tuple(programs), tuple(temperatures))
+
+
+class ViCarePollScheduler:
+    """Poll fast while a device is active and back off while it is idle.
+
+    A device is active while a burner or compressor runs, right after its
+    active program changed and while its temperatures move. Each idle cycle
+    doubles the interval up to the configured maximum, any activity drops
+    it back to the minimum.
+    """
+
+    def __init__(self, min_interval: timedelta, max_interval: timedelta) -> None:
+        """Initialize the scheduler."""
+        self._min_interval = min_interval
+        self._max_interval = max(min_interval, max_interval)
+        self._interval = min_interval
+        self._activity: ViCareActivity | None = None
+
+    @property
+    def interval(self) -> timedelta:
+        """Return the current poll interval."""
+        return self._interval
+
+    def update(
+        self, topology: ViCareTopology, capabilities: ViCareCapabilities
+    ) -> timedelta:
+        """Return the next poll interval after a refresh of the device."""
+        try:
+            activity = read_activity(topology, capabilities)
+        except (ValueError, PyViCareInvalidDataError) as err:
+            _LOGGER.debug("Unable to read device activity: %s", err)
+            return self._interval
+
+        previous, self._activity = self._activity, activity
+        if activity.running or previous is None or _changed(previous, activity):
+            self._interval = self._min_interval
+        else:
+            self._interval = min(self._interval * BACKOFF_FACTOR, self._max_interval)
+        return self._interval
+
+
+def _changed(previous: ViCareActivity, activity: ViCareActivity) -> bool:
+    """Return True if programs or temperatures changed between two cycles."""
+    if previous.programs != activity.programs:
+        return True
+    if len(previous.temperatures) != len(activity.temperatures):
+        return True
+    for old, new in zip(previous.temperatures, activity.temperatures):
+        if old is None or new is None:
+            if old is not new:
+                return True
+        elif abs(new - old) >= TEMPERATURE_CHANGE:
+            return True
+    return False
@@ -0,0 +1,165 @@
+"""Profile ViCare refresh cycles on demand."""
+from __future__ import annotations
+
+import asyncio
+from contextlib import suppress
+import cProfile
+from datetime import timedelta
+import logging
+import pstats
+import time
+import tracemalloc
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, callback
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+import homeassistant.util.dt as dt_util
+
+from .const import (
+    DEFAULT_MAX_SCAN_INTERVAL,
+    DOMAIN,
+    VICARE_COORDINATOR,
+    VICARE_DEVICE_LIST,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_CAPTURE_PROFILE = "capture_profile"
+ATTR_CYCLES = "cycles"
+ATTR_INCLUDE_SETUP = "include_setup"
+
+DEFAULT_CYCLES = 3
+# Extra time allowed for the cycles before the capture ends anyway
+CYCLE_MARGIN = timedelta(minutes=1)
+TOP_FUNCTIONS = 50
+TOP_ALLOCATIONS = 25
+
+CAPTURE_PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CYCLES, default=DEFAULT_CYCLES): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=100)
+        ),
+        vol.Optional(ATTR_INCLUDE_SETUP, default=False): cv.boolean,
+    }
+)
+
+
+@callback
+def async_register_services(hass: HomeAssistant) -> None:
+    """Register the profiling service of ViCare."""
+    lock = asyncio.Lock()
+
+    async def _async_capture_profile(call: ServiceCall) -> None:
+        if lock.locked():
+            raise HomeAssistantError("A ViCare profile capture is already running")
+        async with lock:
+            await _async_capture(
+                hass, call.data[ATTR_CYCLES], call.data[ATTR_INCLUDE_SETUP]
+            )
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_CAPTURE_PROFILE,
+        _async_capture_profile,
+        schema=CAPTURE_PROFILE_SCHEMA,
+    )
+
+
+async def _async_capture(hass: HomeAssistant, cycles: int, include_setup: bool) -> None:
+    """Profile the next refresh cycles and write the results to the config dir.
+
+    Everything running on the event loop meanwhile is profiled, so the
+    cost of ViCare shows next to the rest of Home Assistant.
+    """
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        if include_setup:
+            for entry in hass.config_entries.async_entries(DOMAIN):
+                await hass.config_entries.async_reload(entry.entry_id)
+        completed = await _async_wait_for_cycles(hass, cycles)
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        snapshot = await hass.async_add_executor_job(tracemalloc.take_snapshot)
+        if started_tracing:
+            tracemalloc.stop()
+
+    path = hass.config.path(f"vicare_profile_{dt_util.utcnow():%Y%m%d_%H%M%S}")
+    summary = (
+        f"ViCare profile of {completed} refresh cycles"
+        f"{' and entry setup' if include_setup else ''} in {elapsed:.1f} s"
+    )
+    await hass.async_add_executor_job(
+        _write_profile, path, summary, profiler, snapshot
+    )
+    _LOGGER.info("%s written to %s.txt", summary, path)
+
+
+async def _async_wait_for_cycles(hass: HomeAssistant, cycles: int) -> int:
+    """Wait until every coordinator refreshed, return the cycles completed."""
+    coordinators = [
+        device[VICARE_COORDINATOR]
+        for entry_data in hass.data.get(DOMAIN, {}).values()
+        for device in entry_data.get(VICARE_DEVICE_LIST, [])
+    ]
+    if not coordinators:
+        return 0
+
+    refreshes = [0] * len(coordinators)
+    done = asyncio.Event()
+    removers = []
+    for index, coordinator in enumerate(coordinators):
+
+        @callback
+        def _async_refreshed(index: int = index) -> None:
+            refreshes[index] += 1
+            if min(refreshes) >= cycles:
+                done.set()
+
+        removers.append(coordinator.async_add_refresh_callback(_async_refreshed))
+
+    interval = max(
+        coordinator.update_interval or timedelta(seconds=DEFAULT_MAX_SCAN_INTERVAL)
+        for coordinator in coordinators
+    )
+    timeout = interval * cycles + CYCLE_MARGIN
+    try:
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(done.wait(), timeout.total_seconds())
+    finally:
+        for remove in removers:
+            remove()
+    if not done.is_set():
+        _LOGGER.warning("Profiling ended after %s without all refresh cycles", timeout)
+    return min(refreshes)
+
+
+def _write_profile(
+    path: str,
+    summary: str,
+    profiler: cProfile.Profile,
+    snapshot: tracemalloc.Snapshot,
+) -> None:
+    """Write the profile and the top allocation sites."""
+    profiler.dump_stats(f"{path}.prof")
+    snapshot = snapshot.filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),)
+    )
+    with open(f"{path}.txt", "w", encoding="utf-8") as file:
+        file.write(f"{summary}\n\nTop functions by cumulative time\n")
+        stats = pstats.Stats(profiler, stream=file)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+        file.write("Top allocation sites\n")
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+            frame = stat.traceback[0]
+            file.write(
+                f"{frame.filename}:{frame.lineno}: "
+                f"{stat.size / 1024:.1f} KiB in {stat.count} blocks\n"
+            )
@@ -0,0 +1,101 @@
+"""Budget ViCare API calls against the daily quota of an account."""
+from __future__ import annotations
+
+from collections import deque
+from datetime import datetime, timedelta
+import logging
+
+import homeassistant.util.dt as dt_util
+
+from .const import API_DAILY_QUOTA
+
+_LOGGER = logging.getLogger(__name__)
+
+QUOTA_WINDOW = timedelta(days=1)
+# Share of the quota kept free for logins and write commands
+QUOTA_RESERVE = 0.1
+RATE_WINDOW = timedelta(hours=1)
+
+
+class ViCareQuotaGovernor:
+    """Count the API calls of an account and stretch polling to fit the quota.
+
+    Every outgoing call is recorded in a rolling window of one day. Polling
+    is slowed down to the rate that keeps all pollers of the account inside
+    the daily quota, and stops until the reported reset time once the API
+    answers with a rate limit error.
+    """
+
+    def __init__(self, daily_quota: int = API_DAILY_QUOTA) -> None:
+        """Initialize the governor."""
+        self._daily_quota = daily_quota
+        self._calls: deque[datetime] = deque()
+        self._blocked_until: datetime | None = None
+        self.pollers = 1
+
+    def record_call(self) -> None:
+        """Record an outgoing API call."""
+        self._calls.append(dt_util.utcnow())
+
+    def rate_limited(self, reset: datetime | None) -> None:
+        """Hold off polling until the reset time reported by the API."""
+        if reset is None:
+            reset = dt_util.utcnow() + RATE_WINDOW
+        elif reset.tzinfo is None:
+            reset = reset.replace(tzinfo=dt_util.UTC)
+        _LOGGER.warning("ViCare API rate limit reached, pausing until %s", reset)
+        self._blocked_until = reset
+
+    def _prune(self, now: datetime) -> None:
+        while self._calls and now - self._calls[0] > QUOTA_WINDOW:
+            self._calls.popleft()
+
+    @property
+    def used(self) -> int:
+        """Return the number of calls within the last day."""
+        self._prune(dt_util.utcnow())
+        return len(self._calls)
+
+    @property
+    def remaining(self) -> int:
+        """Return the number of calls left within the last day."""
+        return max(self._daily_quota - self.used, 0)
+
+    @property
+    def blocked_until(self) -> datetime | None:
+        """Return the time polling is paused until after a rate limit error."""
+        if self._blocked_until is not None and self._blocked_until <= dt_util.utcnow():
+            self._blocked_until = None
+        return self._blocked_until
+
+    def projected_exhaustion(self) -> datetime | None:
+        """Return when the quota runs out at the rate of the last hour."""
+        now = dt_util.utcnow()
+        self._prune(now)
+        recent = sum(1 for call in self._calls if now - call <= RATE_WINDOW)
+        if recent == 0:
+            return None
+        remaining = self.remaining
+        if remaining == 0:
+            return now
+        exhaustion = now + RATE_WINDOW * (remaining / recent)
+        if exhaustion - now > QUOTA_WINDOW:
+            # Calls leave the window faster than new ones use it up
+            return None
+        return exhaustion
+
+    def poll_interval(self, interval: timedelta) -> timedelta:
+        """Return the poll interval of a single poller that fits the quota."""
+        now = dt_util.utcnow()
+        budget = self._daily_quota * (1 - QUOTA_RESERVE)
+        interval = max(interval, QUOTA_WINDOW * self.pollers / budget)
+
+        if self.remaining < self.pollers and self._calls:
+            # Wait until enough calls have left the window
+            freed = self._calls[min(self.pollers, len(self._calls)) - 1]
+            interval = max(interval, freed + QUOTA_WINDOW - now)
+
+        blocked_until = self.blocked_until
+        if blocked_until is not None:
+            interval = max(interval, blocked_until - now)
+        return interval
@@ -0,0 +1,229 @@
+"""Record ViCare API traffic and replay it without a network."""
+from __future__ import annotations
+
+from collections import defaultdict, deque
+import hashlib
+import json
+import logging
+import re
+from typing import Any
+
+from PyViCare.PyViCareUtils import (
+    PyViCareCommandError,
+    PyViCareInternalServerError,
+    PyViCareRateLimitError,
+)
+
+from homeassistant.const import CONF_USERNAME
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import slugify
+
+from .metrics import ViCareMetrics
+from .trace import ViCareTracer
+from .transport import ViCareTransportStats
+
+_LOGGER = logging.getLogger(__name__)
+
+INSTALLATIONS_URL = "/equipment/installations?includeGateways=true"
+# Recording stops once the file reaches this size
+RECORDING_MAX_BYTES = 10 * 1024 * 1024
+
+# Installation ids and gateway serials, as strings, path segments or the
+# bare numbers the API answers ids with
+SECRET_NUMBER = re.compile(
+    r'(?<=["/])\d{6,}(?=["/?])'
+    r'|(?<="id": )\d{6,}(?=[,}])'
+    r'|(?<="installationId": )\d{6,}(?=[,}])'
+)
+
+
+def recording_file_name(conf) -> str:
+    """Return the name of the recording file of an account."""
+    return f"vicare_recording_{slugify(conf[CONF_USERNAME])}.jsonl"
+
+
+def redact(text: str) -> str:
+    """Replace installation ids and serials by stable stand-ins of the same length.
+
+    The same number is always replaced by the same stand-in, so URLs built
+    from a redacted installation list still match the redacted responses.
+    """
+
+    def _replace(match: re.Match) -> str:
+        number = match.group()
+        digest = str(int(hashlib.sha256(number.encode()).hexdigest(), 16))
+        return digest[: len(number)]
+
+    return SECRET_NUMBER.sub(_replace, text)
+
+
+class ViCareRecorder:
+    """Append the requests of a transport and their responses to a JSONL file.
+
+    Every line holds the method, URL, request body and decoded response of
+    one request, redacted. Lines are written from the executor in the order
+    they were recorded. Recording stops at a maximum file size rather than
+    rotating, since a replay needs the installation list at its start.
+    """
+
+    def __init__(self, hass: HomeAssistant, path: str) -> None:
+        """Initialize the recorder."""
+        self.hass = hass
+        self.path = path
+        self._pending: list[str] = []
+        self._flushing = False
+        self._mode = "a"
+        self._size = 0
+        self._full = False
+
+    @callback
+    def async_start(self, devices) -> None:
+        """Start a new recording with the installation list of the devices.
+
+        The list was loaded during login, possibly long before recording
+        starts, so it is rebuilt from the devices PyViCare read from it.
+        """
+        installations: dict[str, dict[str, list]] = defaultdict(
+            lambda: defaultdict(list)
+        )
+        for device in devices:
+            accessor = device.service.accessor
+            installations[str(accessor.id)][accessor.serial].append(
+                {
+                    "id": accessor.device_id,
+                    "modelId": device.device_model,
+                    "status": device.status,
+                    "deviceType": "heating",
+                }
+            )
+        response = {
+            "data": [
+                {
+                    "id": installation_id,
+                    "gateways": [
+                        {"serial": serial, "devices": gateway_devices}
+                        for serial, gateway_devices in gateways.items()
+                    ],
+                }
+                for installation_id, gateways in installations.items()
+            ]
+        }
+        self._mode = "w"
+        self._size = 0
+        self._full = False
+        self.async_record("GET", INSTALLATIONS_URL, None, response)
+        _LOGGER.info("Recording ViCare API traffic to %s", self.path)
+
+    @callback
+    def async_record(self, method: str, url: str, data: Any, response: Any) -> None:
+        """Record a request and its response."""
+        if self._full:
+            return
+        line = redact(
+            json.dumps(
+                {"method": method, "url": url, "data": data, "response": response}
+            )
+        )
+        self._size += len(line.encode()) + 1
+        if self._size > RECORDING_MAX_BYTES:
+            self._full = True
+            _LOGGER.warning(
+                "Stopped recording ViCare API traffic, %s reached %s MiB",
+                self.path,
+                RECORDING_MAX_BYTES // (1024 * 1024),
+            )
+            return
+        self._pending.append(line)
+        if not self._flushing:
+            self._flushing = True
+            self.hass.async_create_task(self._async_flush())
+
+    async def _async_flush(self) -> None:
+        try:
+            while self._pending:
+                lines, self._pending = self._pending, []
+                mode, self._mode = self._mode, "a"
+                await self.hass.async_add_executor_job(self._write, lines, mode)
+        finally:
+            self._flushing = False
+
+    def _write(self, lines: list[str], mode: str) -> None:
+        with open(self.path, mode, encoding="utf-8") as file:
+            file.writelines(f"{line}\n" for line in lines)
+
+
+def load_recording(path: str) -> list[dict[str, Any]]:
+    """Read the requests of a recording."""
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+class ViCareReplayTransport:
+    """Answer ViCare API requests from a recording.
+
+    Every request gets the next response recorded for its method and URL.
+    Once they are used up the last one is repeated, so polling can go on
+    for as long as needed. PyViCare uses the transport as its OAuth manager
+    for the installation lookup during login.
+    """
+
+    def __init__(
+        self,
+        recording: list[dict[str, Any]],
+        metrics: ViCareMetrics,
+        tracer: ViCareTracer,
+    ) -> None:
+        """Initialize the transport."""
+        self.stats = ViCareTransportStats()
+        self.metrics = metrics
+        self.tracer = tracer
+        self._responses: dict[tuple[str, str], deque] = defaultdict(deque)
+        for request in recording:
+            self._responses[(request["method"], request["url"])].append(
+                request["response"]
+            )
+
+    def get(self, url: str) -> Any:
+        """Return the recorded response of a GET request."""
+        response = self._replay("GET", url)
+        if response.get("statusCode", 0) >= 500:
+            raise PyViCareInternalServerError(response)
+        return response
+
+    def post(self, url: str, data: str) -> Any:
+        """Return the recorded response of a POST request."""
+        response = self._replay("POST", url)
+        if response.get("statusCode", 0) >= 400:
+            raise PyViCareCommandError(response)
+        return response
+
+    async def async_get(self, url: str) -> Any:
+        """Return the recorded response of a GET request."""
+        return self.get(url)
+
+    async def async_post(self, url: str, data: str) -> Any:
+        """Return the recorded response of a POST request."""
+        return self.post(url, data)
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Release nothing, a replay holds no connections."""
+
+    def _replay(self, method: str, url: str) -> Any:
+        with self.tracer.span("request", method=method, url=url) as span:
+            responses = self._responses.get((method, url))
+            if not responses:
+                _LOGGER.warning("No recorded response to %s %s", method, url)
+                span["outcome"] = 404
+                return {"statusCode": 404, "error": "Not Found"}
+            response = responses.popleft() if len(responses) > 1 else responses[0]
+            size = len(json.dumps(response))
+            span["bytes"] = size
+            span["outcome"] = response.get("statusCode", "ok")
+        self.stats.requests += 1
+        self.stats.bytes_received += size
+        self.stats.bytes_decoded += size
+        self.metrics.payload_size.record(size)
+        if response.get("statusCode") == 429:
+            raise PyViCareRateLimitError(response)
+        return response
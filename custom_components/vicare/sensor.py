@@ -3,16 +3,17 @@ from __future__ import annotations
 
 from contextlib import suppress
 from dataclasses import dataclass
+from functools import partial
 import logging
+from typing import Any, Callable
 
 from PyViCare.PyViCareUtils import (
     PyViCareInvalidDataError,
     PyViCareNotSupportedFeatureError,
-    PyViCareRateLimitError,
 )
-import requests
 
 from homeassistant.components.sensor import (
+    STATE_CLASS_MEASUREMENT,
     STATE_CLASS_TOTAL_INCREASING,
     SensorEntityDescription,
     SensorEntity,
@@ -22,16 +23,31 @@ from homeassistant.const import (
     DEVICE_CLASS_GAS,
     DEVICE_CLASS_POWER,
     DEVICE_CLASS_TEMPERATURE,
+    DEVICE_CLASS_TIMESTAMP,
+    DATA_BYTES,
     ENERGY_KILO_WATT_HOUR,
+    ENTITY_CATEGORY_DIAGNOSTIC,
     PERCENTAGE,
     POWER_WATT,
     TEMP_CELSIUS,
     TIME_HOURS,
+    TIME_MILLISECONDS,
 )
+from homeassistant.core import callback
 import homeassistant.util.dt as dt_util
 
 from . import ViCareRequiredKeysMixin
-from .const import DOMAIN, VICARE_API, VICARE_DEVICE_CONFIG, VICARE_NAME
+from .capabilities import capability_key
+from .const import (
+    DOMAIN,
+    VICARE_COORDINATOR,
+    VICARE_DEVICE_LIST,
+    VICARE_NAME,
+    VICARE_SESSION,
+)
+from .entity import ViCareEntity
+from .metrics import ViCareMetrics, milliseconds
+from .quota import ViCareQuotaGovernor
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -70,6 +86,19 @@ SENSOR_POWER_PRODUCTION_THIS_WEEK = "power_production_this_week"
 SENSOR_POWER_PRODUCTION_THIS_MONTH = "power_production_this_month"
 SENSOR_POWER_PRODUCTION_THIS_YEAR = "power_production_this_year"
 
+# api quota sensors
+SENSOR_API_QUOTA_REMAINING = "api_quota_remaining"
+SENSOR_API_QUOTA_EXHAUSTION = "api_quota_exhaustion"
+
+# performance metrics sensors
+SENSOR_API_CALLS_PER_HOUR = "api_calls_per_hour"
+SENSOR_API_FETCH_LATENCY = "api_fetch_latency"
+SENSOR_API_WRITE_LATENCY = "api_write_latency"
+SENSOR_API_PAYLOAD_SIZE = "api_payload_size"
+SENSOR_TOKEN_RENEWAL_LATENCY = "token_renewal_latency"
+SENSOR_SNAPSHOT_HIT_RATIO = "snapshot_hit_ratio"
+SENSOR_ENTITY_UPDATE_TIME = "entity_update_time"
+
 
 @dataclass
 class ViCareSensorEntityDescription(SensorEntityDescription, ViCareRequiredKeysMixin):
@@ -282,127 +311,209 @@ COMPRESSOR_SENSORS: tuple[ViCareSensorEntityDescription, ...] = (
 )
 
 
-def _build_entity(name, vicare_api, device_config, sensor):
+@dataclass
+class ViCareQuotaRequiredKeysMixin:
+    """Mixin for required keys of quota sensors."""
+
+    value_getter: Callable[[ViCareQuotaGovernor], Any]
+
+
+@dataclass
+class ViCareQuotaSensorEntityDescription(
+    SensorEntityDescription, ViCareQuotaRequiredKeysMixin
+):
+    """Describes ViCare API quota sensor entity."""
+
+
+QUOTA_SENSORS: tuple[ViCareQuotaSensorEntityDescription, ...] = (
+    ViCareQuotaSensorEntityDescription(
+        key=SENSOR_API_QUOTA_REMAINING,
+        name="API quota remaining",
+        icon="mdi:api",
+        entity_category=ENTITY_CATEGORY_DIAGNOSTIC,
+        value_getter=lambda governor: governor.remaining,
+    ),
+    ViCareQuotaSensorEntityDescription(
+        key=SENSOR_API_QUOTA_EXHAUSTION,
+        name="API quota exhaustion",
+        device_class=DEVICE_CLASS_TIMESTAMP,
+        entity_category=ENTITY_CATEGORY_DIAGNOSTIC,
+        value_getter=lambda governor: governor.projected_exhaustion(),
+    ),
+)
+
+
+@dataclass
+class ViCareMetricsRequiredKeysMixin:
+    """Mixin for required keys of performance metrics sensors."""
+
+    value_getter: Callable[[ViCareMetrics], Any]
+
+
+@dataclass
+class ViCareMetricsSensorEntityDescription(
+    SensorEntityDescription, ViCareMetricsRequiredKeysMixin
+):
+    """Describes ViCare performance metrics sensor entity."""
+
+    entity_category: str = ENTITY_CATEGORY_DIAGNOSTIC
+    entity_registry_enabled_default: bool = False
+    state_class: str = STATE_CLASS_MEASUREMENT
+
+
+# Latencies and sizes are the 95th percentile of the last hour
+METRICS_SENSORS: tuple[ViCareMetricsSensorEntityDescription, ...] = (
+    ViCareMetricsSensorEntityDescription(
+        key=SENSOR_API_CALLS_PER_HOUR,
+        name="API calls per hour",
+        icon="mdi:api",
+        value_getter=lambda metrics: metrics.requests.count,
+    ),
+    ViCareMetricsSensorEntityDescription(
+        key=SENSOR_API_FETCH_LATENCY,
+        name="API fetch latency",
+        icon="mdi:timer-outline",
+        native_unit_of_measurement=TIME_MILLISECONDS,
+        value_getter=lambda metrics: milliseconds(
+            metrics.fetch_latency.percentile(0.95)
+        ),
+    ),
+    ViCareMetricsSensorEntityDescription(
+        key=SENSOR_API_WRITE_LATENCY,
+        name="API write latency",
+        icon="mdi:timer-outline",
+        native_unit_of_measurement=TIME_MILLISECONDS,
+        value_getter=lambda metrics: milliseconds(
+            metrics.write_latency.percentile(0.95)
+        ),
+    ),
+    ViCareMetricsSensorEntityDescription(
+        key=SENSOR_API_PAYLOAD_SIZE,
+        name="API payload size",
+        icon="mdi:download-network-outline",
+        native_unit_of_measurement=DATA_BYTES,
+        value_getter=lambda metrics: metrics.payload_size.percentile(0.95),
+    ),
+    ViCareMetricsSensorEntityDescription(
+        key=SENSOR_TOKEN_RENEWAL_LATENCY,
+        name="Token renewal latency",
+        icon="mdi:timer-outline",
+        native_unit_of_measurement=TIME_MILLISECONDS,
+        value_getter=lambda metrics: milliseconds(
+            metrics.token_latency.percentile(0.95)
+        ),
+    ),
+    ViCareMetricsSensorEntityDescription(
+        key=SENSOR_SNAPSHOT_HIT_RATIO,
+        name="Snapshot hit ratio",
+        icon="mdi:database-check-outline",
+        native_unit_of_measurement=PERCENTAGE,
+        value_getter=lambda metrics: metrics.snapshot_hit_ratio,
+    ),
+    ViCareMetricsSensorEntityDescription(
+        key=SENSOR_ENTITY_UPDATE_TIME,
+        name="Entity update time",
+        icon="mdi:timer-outline",
+        native_unit_of_measurement=TIME_MILLISECONDS,
+        value_getter=lambda metrics: milliseconds(
+            metrics.entity_update_percentile(0.95)
+        ),
+    ),
+)
+
+
+def _build_entity(coordinator, name, vicare_api, sensor):
     _LOGGER.debug("Found device %s", name)
-    try:
-        sensor.value_getter(vicare_api)
-        _LOGGER.debug("Found entity %s", name)
-        return ViCareSensor(
-            name,
-            vicare_api,
-            device_config,
-            sensor,
-        )
-    except PyViCareNotSupportedFeatureError:
+    if not coordinator.capabilities.supports(
+        capability_key(sensor.key, vicare_api),
+        lambda: sensor.value_getter(vicare_api),
+    ):
         _LOGGER.info("Feature not supported %s", name)
         return None
-    except AttributeError:
-        _LOGGER.debug("Attribute Error %s", name)
-        return None
+
+    _LOGGER.debug("Found entity %s", name)
+    return ViCareSensor(
+        coordinator,
+        name,
+        vicare_api,
+        sensor,
+    )
+
+
+def _build_device_entities(name, device):
+    """Create the ViCare sensor entities of a single device."""
+    coordinator = device[VICARE_COORDINATOR]
+    return coordinator.topology.build_entities(
+        name,
+        partial(_build_entity, coordinator),
+        device=GLOBAL_SENSORS,
+        circuits=CIRCUIT_SENSORS,
+        burners=BURNER_SENSORS,
+        compressors=COMPRESSOR_SENSORS,
+    )
 
 
 async def async_setup_entry(hass, config_entry, async_add_devices):
     """Create the ViCare sensor devices."""
     name = hass.data[DOMAIN][config_entry.entry_id][VICARE_NAME]
-    api = hass.data[DOMAIN][config_entry.entry_id][VICARE_API]
 
     all_devices = []
-    for description in GLOBAL_SENSORS:
-        entity = _build_entity(
-            f"{name} {description.name}",
-            api,
-            hass.data[DOMAIN][config_entry.entry_id][VICARE_DEVICE_CONFIG],
-            description,
-        )
-        if entity is not None:
-            all_devices.append(entity)
-
-    for description in CIRCUIT_SENSORS:
-        for circuit in api.circuits:
-            suffix = ""
-            if len(api.circuits) > 1:
-                suffix = f" {circuit.id}"
-            entity = _build_entity(
-                f"{name} {description.name}{suffix}",
-                circuit,
-                hass.data[DOMAIN][config_entry.entry_id][VICARE_DEVICE_CONFIG],
-                description,
-            )
-            if entity is not None:
-                all_devices.append(entity)
-
-    try:
-        for description in BURNER_SENSORS:
-            for burner in api.burners:
-                suffix = ""
-                if len(api.burners) > 1:
-                    suffix = f" {burner.id}"
-                entity = _build_entity(
-                    f"{name} {description.name}{suffix}",
-                    burner,
-                    hass.data[DOMAIN][config_entry.entry_id][VICARE_DEVICE_CONFIG],
-                    description,
-                )
-                if entity is not None:
-                    all_devices.append(entity)
-    except PyViCareNotSupportedFeatureError:
-        _LOGGER.info("No burners found")
-
-    try:
-        for description in COMPRESSOR_SENSORS:
-            for compressor in api.compressors:
-                suffix = ""
-                if len(api.compressors) > 1:
-                    suffix = f" {compressor.id}"
-                entity = _build_entity(
-                    f"{name} {description.name}{suffix}",
-                    compressor,
-                    hass.data[DOMAIN][config_entry.entry_id][VICARE_DEVICE_CONFIG],
-                    description,
-                )
-                if entity is not None:
-                    all_devices.append(entity)
-    except PyViCareNotSupportedFeatureError:
-        _LOGGER.info("No compressor found")
+    for device in hass.data[DOMAIN][config_entry.entry_id][VICARE_DEVICE_LIST]:
+        all_devices.extend(_build_device_entities(name, device))
 
     async_add_devices(all_devices)
 
+    session = hass.data[DOMAIN][config_entry.entry_id][VICARE_SESSION]
+    async_add_devices(
+        [
+            ViCareQuotaSensor(
+                f"{name} {description.name}",
+                session.governor,
+                config_entry.unique_id,
+                description,
+            )
+            for description in QUOTA_SENSORS
+        ],
+        True,
+    )
+    async_add_devices(
+        [
+            ViCareMetricsSensor(
+                f"{name} {description.name}",
+                session.metrics,
+                config_entry.unique_id,
+                description,
+            )
+            for description in METRICS_SENSORS
+        ],
+        True,
+    )
 
-class ViCareSensor(SensorEntity):
+
+class ViCareSensor(ViCareEntity, SensorEntity):
     """Representation of a ViCare sensor."""
 
     entity_description: ViCareSensorEntityDescription
 
+    __slots__ = ("_state",)
+
     def __init__(
-        self, name, api, device_config, description: ViCareSensorEntityDescription
+        self,
+        coordinator,
+        name,
+        api,
+        description: ViCareSensorEntityDescription,
     ):
         """Initialize the sensor."""
+        super().__init__(coordinator, name, api)
         self.entity_description = description
-        self._attr_name = name
-        self._api = api
-        self._device_config = device_config
         self._state = None
         #self._last_reset = dt_util.utcnow()
 
-    @property
-    def device_info(self):
-        """Return device info for this device."""
-        return {
-            "identifiers": {(DOMAIN, self._device_config.getConfig().serial)},
-            "name": self._device_config.getModel(),
-            "manufacturer": "Viessmann",
-            "model": (DOMAIN, self._device_config.getModel()),
-        }
-
     @property
     def available(self):
         """Return True if entity is available."""
-        return self._state is not None
-
-    @property
-    def unique_id(self):
-        """Return unique ID for this device."""
-        return f"{self._device_config.getConfig().serial}-{self._attr_name}"
+        return super().available and self._state is not None
 
     @property
     def native_value(self):
@@ -414,17 +525,68 @@ class ViCareSensor(SensorEntity):
     #    """Return the time when the sensor was last reset."""
     #    return self._last_reset
 
-    def update(self):
-        """Update state of sensor."""
+    @callback
+    def _handle_coordinator_update(self):
+        """Read the state from the new snapshot and write it."""
+        self._update_state()
+        super()._handle_coordinator_update()
+
+    def _update_state(self):
+        """Update state of sensor from the device snapshot."""
         #self._last_reset = dt_util.start_of_local_day()
         try:
             with suppress(PyViCareNotSupportedFeatureError):
                 self._state = self.entity_description.value_getter(self._api)
-        except requests.exceptions.ConnectionError:
-            _LOGGER.error("Unable to retrieve data from ViCare server")
         except ValueError:
             _LOGGER.error("Unable to decode data from ViCare server")
-        except PyViCareRateLimitError as limit_exception:
-            _LOGGER.error("Vicare API rate limit exceeded: %s", limit_exception)
         except PyViCareInvalidDataError as invalid_data_exception:
             _LOGGER.error("Invalid data from Vicare server: %s", invalid_data_exception)
+
+
+class ViCareQuotaSensor(SensorEntity):
+    """Representation of the API quota of a ViCare account."""
+
+    entity_description: ViCareQuotaSensorEntityDescription
+
+    def __init__(
+        self,
+        name,
+        governor: ViCareQuotaGovernor,
+        account_id,
+        description: ViCareQuotaSensorEntityDescription,
+    ):
+        """Initialize the sensor."""
+        self.entity_description = description
+        self._attr_name = name
+        self._attr_unique_id = f"{account_id}-{description.key}"
+        self._governor = governor
+
+    async def async_update(self):
+        """Update the quota state from the calls counted so far."""
+        self._attr_native_value = self.entity_description.value_getter(self._governor)
+
+
+class ViCareMetricsSensor(SensorEntity):
+    """Representation of a performance metric of a ViCare account."""
+
+    entity_description: ViCareMetricsSensorEntityDescription
+
+    def __init__(
+        self,
+        name,
+        metrics: ViCareMetrics,
+        account_id,
+        description: ViCareMetricsSensorEntityDescription,
+    ):
+        """Initialize the sensor."""
+        self.entity_description = description
+        self._attr_name = name
+        self._attr_unique_id = f"{account_id}-{description.key}"
+        self._metrics = metrics
+
+    async def async_update(self):
+        """Update the state from the metrics of the last hour.
+
+        The metrics are recorded on the event loop, so they are read there too.
+        """
+        self._attr_native_value = self.entity_description.value_getter(self._metrics)
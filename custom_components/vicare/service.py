@@ -0,0 +1,113 @@
+"""PyViCare service backed by a per-device feature snapshot."""
+from __future__ import annotations
+
+import json
+
+from PyViCare.PyViCareService import (
+    ViCareService,
+    buildGetPropertyUrl,
+    buildSetPropertyUrl,
+)
+from PyViCare.PyViCareUtils import (
+    PyViCareInvalidDataError,
+    PyViCareNotSupportedFeatureError,
+)
+
+from .metrics import ViCareMetrics
+
+
+class ViCareSnapshotService(ViCareService):
+    """Answer PyViCare getters from the last fetched feature snapshot.
+
+    Only `async_fetch` and `async_fetch_features` talk to the ViCare API for
+    reading. Every device, circuit, burner and compressor object created on
+    top of this service reads from the same snapshot, so all entities see
+    the same data within a cycle. Each snapshot is indexed by feature name
+    once when it is set, so a getter finds its feature without scanning
+    the feature list.
+
+    Both await the session's asyncio transport. Writes made by PyViCare
+    setters are captured by `async_execute` and sent the same way instead
+    of a blocking request from the executor.
+    """
+
+    def __init__(self, oauth_manager, accessor, metrics: ViCareMetrics):
+        """Initialize the service without a snapshot."""
+        super().__init__(oauth_manager, accessor)
+        self._metrics = metrics
+        self._snapshot = None
+        self._features: dict[str, dict] = {}
+        self._captured: list[tuple[str, str]] | None = None
+
+    @property
+    def snapshot(self):
+        """Return the feature list of the current snapshot."""
+        return self._snapshot
+
+    @snapshot.setter
+    def snapshot(self, features) -> None:
+        """Make a feature list the current snapshot and index it by name."""
+        self._snapshot = features
+        self._features = {
+            feature["feature"]: feature for feature in features or []
+        }
+
+    async def async_fetch(self):
+        """Fetch all features of the device and make them the current snapshot."""
+        response = await self.oauth_manager.async_get(
+            f"/equipment/installations/{self.accessor.id}"
+            f"/gateways/{self.accessor.serial}"
+            f"/devices/{self.accessor.device_id}/features/"
+        )
+        if "data" not in response:
+            raise PyViCareInvalidDataError(response)
+        self.snapshot = response["data"]
+        return self.snapshot
+
+    async def async_fetch_features(self, property_names):
+        """Fetch single features of the device without touching the snapshot."""
+        features = []
+        for property_name in property_names:
+            response = await self.oauth_manager.async_get(
+                buildGetPropertyUrl(self.accessor, property_name)
+            )
+            if "data" not in response:
+                raise PyViCareInvalidDataError(response)
+            features.append(response["data"])
+        return features
+
+    async def async_execute(self, func, *args):
+        """Run a PyViCare setter and send the commands it makes.
+
+        The setter runs on the event loop with writes captured, so it must
+        not read features from the API; getters answer from the snapshot.
+        """
+        self._captured = []
+        try:
+            func(*args)
+            commands = self._captured
+        finally:
+            self._captured = None
+        for url, data in commands:
+            await self.oauth_manager.async_post(url, data)
+
+    def setProperty(self, property_name, action, data):
+        """Send a command, or capture it while `async_execute` runs a setter."""
+        if self._captured is None:
+            return super().setProperty(property_name, action, data)
+        self._captured.append(
+            (
+                buildSetPropertyUrl(self.accessor, property_name, action),
+                data if isinstance(data, str) else json.dumps(data),
+            )
+        )
+        return {}
+
+    def getProperty(self, property_name):
+        """Return a feature from the current snapshot."""
+        feature = self._features.get(property_name)
+        if feature is None:
+            self._metrics.snapshot_misses.record()
+            raise PyViCareNotSupportedFeatureError(property_name)
+        self._metrics.snapshot_hits.record()
+        return feature
@@ -0,0 +1,241 @@
+"""Authenticated ViCare sessions shared by config flow, setup and reloads."""
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+import logging
+import time
+
+from PyViCare.PyViCare import PyViCare
+from PyViCare.PyViCareUtils import PyViCareRateLimitError
+
+from homeassistant.const import CONF_CLIENT_ID, CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import slugify
+
+from .auth import ViCareTokenManager
+from .breaker import ViCareCircuitBreaker
+from .const import CONF_REPLAY, VICARE_SESSIONS
+from .metrics import ViCareMetrics
+from .quota import ViCareQuotaGovernor
+from .recording import ViCareReplayTransport, load_recording
+from .trace import ViCareTracer
+from .transport import (
+    ViCareAsyncTransport,
+    ViCareTransportStats,
+    async_create_websession,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def vicare_login(token_manager: ViCareTokenManager) -> PyViCare:
+    """Login via PyVicare API."""
+    if token_manager.access_token is None:
+        token_manager.renewToken()
+    vicare_api = PyViCare()
+    vicare_api.initWithExternalOAuth(token_manager)
+    return vicare_api
+
+
+def vicare_replay(
+    path: str, metrics: ViCareMetrics, tracer: ViCareTracer
+) -> tuple[PyViCare, ViCareReplayTransport]:
+    """Login to a recording of the ViCare API."""
+    transport = ViCareReplayTransport(load_recording(path), metrics, tracer)
+    vicare_api = PyViCare()
+    vicare_api.initWithExternalOAuth(transport)
+    return vicare_api, transport
+
+
+class ViCareSession:
+    """Authenticated PyViCare client of a single ViCare account.
+
+    The client keeps the OAuth session with its token as well as the
+    installations and devices loaded during login. Device services send
+    their requests through the session, which pauses polling when the API
+    reports its rate limit. Requests go through the asyncio transport with
+    the token of the account's token manager. Sessions replaying a
+    recording have neither a token manager nor a network. Requests are
+    measured by the metrics of the account and traced by its tracer, and
+    are held back by its circuit breaker during an outage.
+    """
+
+    def __init__(
+        self,
+        client: PyViCare,
+        password: str,
+        governor: ViCareQuotaGovernor,
+        breaker: ViCareCircuitBreaker,
+        metrics: ViCareMetrics,
+        tracer: ViCareTracer,
+        token_manager: ViCareTokenManager | None,
+        transport: ViCareAsyncTransport | ViCareReplayTransport,
+    ) -> None:
+        """Initialize the session."""
+        self.client = client
+        self.password = password
+        self.governor = governor
+        self.breaker = breaker
+        self.metrics = metrics
+        self.tracer = tracer
+        self.token_manager = token_manager
+        self.transport = transport
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop renewing the token and release the HTTP session."""
+        if self.token_manager is not None:
+            self.token_manager.async_shutdown()
+        self.transport.async_shutdown()
+
+    async def async_get(self, url):
+        """Send a GET request to the ViCare API from the event loop."""
+        with self.breaker.request():
+            self.metrics.requests.record()
+            start = time.monotonic()
+            try:
+                return await self.transport.async_get(url)
+            except PyViCareRateLimitError as err:
+                self.governor.rate_limited(err.limitResetDate)
+                raise
+            finally:
+                self.metrics.fetch_latency.record(time.monotonic() - start)
+
+    async def async_post(self, url, data):
+        """Send a POST request to the ViCare API from the event loop."""
+        with self.breaker.request():
+            self.metrics.requests.record()
+            start = time.monotonic()
+            try:
+                return await self.transport.async_post(url, data)
+            except PyViCareRateLimitError as err:
+                self.governor.rate_limited(err.limitResetDate)
+                raise
+            finally:
+                self.metrics.write_latency.record(time.monotonic() - start)
+
+
+class ViCareSessionRegistry:
+    """Keep one authenticated session per ViCare account."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the registry."""
+        self.hass = hass
+        self._sessions: dict[tuple[str, str], ViCareSession] = {}
+        self._tracers: dict[tuple[str, str], ViCareTracer] = {}
+        # Logins of one account wait for each other, other accounts go ahead
+        self._locks: defaultdict[tuple[str, str], asyncio.Lock] = defaultdict(
+            asyncio.Lock
+        )
+
+    def get_tracer(self, conf) -> ViCareTracer:
+        """Return the tracer of an account, creating it on first use.
+
+        The tracer outlives the sessions of the account, so it can be
+        started before the first login.
+        """
+        key = _session_key(conf)
+        if key not in self._tracers:
+            self._tracers[key] = ViCareTracer(
+                self.hass, slugify(conf[CONF_USERNAME])
+            )
+        return self._tracers[key]
+
+    async def async_get(self, conf) -> ViCareSession:
+        """Return the session of an account, logging in if there is none yet."""
+        key = _session_key(conf)
+        tracer = self.get_tracer(conf)
+        async with self._locks[key]:
+            session = self._sessions.get(key)
+            if session is not None and session.password == conf[CONF_PASSWORD]:
+                _LOGGER.debug("Reusing ViCare session of %s", conf[CONF_USERNAME])
+                if session.token_manager is not None:
+                    # Renewals stopped when the entry was unloaded
+                    session.token_manager.async_schedule_refresh()
+                return session
+
+            if CONF_REPLAY in conf:
+                if session is not None:
+                    session.async_shutdown()
+                _LOGGER.info("Replaying ViCare API traffic from %s", conf[CONF_REPLAY])
+                metrics = ViCareMetrics()
+                client, transport = await self.hass.async_add_executor_job(
+                    vicare_replay, conf[CONF_REPLAY], metrics, tracer
+                )
+                session = ViCareSession(
+                    client,
+                    conf[CONF_PASSWORD],
+                    ViCareQuotaGovernor(),
+                    ViCareCircuitBreaker(),
+                    metrics,
+                    tracer,
+                    None,
+                    transport,
+                )
+                self._sessions[key] = session
+                return session
+
+            if session is not None:
+                # Keep counting the calls already made by the account and
+                # the connections already open
+                governor = session.governor
+                breaker = session.breaker
+                metrics = session.metrics
+                stats = session.transport.stats
+                websession = session.transport.websession
+            else:
+                governor = ViCareQuotaGovernor()
+                breaker = ViCareCircuitBreaker()
+                metrics = ViCareMetrics()
+                stats = ViCareTransportStats()
+                websession = async_create_websession(self.hass, stats)
+
+            token_manager = ViCareTokenManager(
+                self.hass, conf, websession, stats, governor, metrics, tracer
+            )
+            await token_manager.async_load()
+            try:
+                with tracer.span("login"):
+                    client = await self.hass.async_add_executor_job(
+                        vicare_login, token_manager
+                    )
+            except Exception:
+                token_manager.async_shutdown()
+                if session is None:
+                    websession.detach()
+                raise
+            if session is not None:
+                session.token_manager.async_shutdown()
+            transport = ViCareAsyncTransport(
+                websession, token_manager, stats, governor, metrics, tracer
+            )
+            session = ViCareSession(
+                client,
+                conf[CONF_PASSWORD],
+                governor,
+                breaker,
+                metrics,
+                tracer,
+                token_manager,
+                transport,
+            )
+            self._sessions[key] = session
+            return session
+
+    def async_remove(self, conf) -> None:
+        """Forget the session of an account."""
+        session = self._sessions.pop(_session_key(conf), None)
+        if session is not None:
+            session.async_shutdown()
+
+
+def _session_key(conf) -> tuple[str, str]:
+    return (conf[CONF_USERNAME], conf[CONF_CLIENT_ID])
+
+
+def async_get_session_registry(hass: HomeAssistant) -> ViCareSessionRegistry:
+    """Return the session registry, creating it on first use."""
+    if VICARE_SESSIONS not in hass.data:
+        hass.data[VICARE_SESSIONS] = ViCareSessionRegistry(hass)
+    return hass.data[VICARE_SESSIONS]
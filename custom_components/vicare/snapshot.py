@@ -0,0 +1,80 @@
+"""Persisted feature snapshots of ViCare devices."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import logging
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+import homeassistant.util.dt as dt_util
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+# Snapshots are written at most this often and once more on shutdown
+SAVE_DELAY = 600
+
+ATTR_FETCHED = "fetched"
+ATTR_FEATURES = "features"
+
+FEATURE_KEYS = ("feature", "properties", "components")
+
+
+def compact_features(features) -> list:
+    """Return the features reduced to the parts PyViCare getters read."""
+    compacted = []
+    for feature in features:
+        item = {key: feature[key] for key in FEATURE_KEYS if feature.get(key)}
+        commands = {
+            name: {"params": command["params"]}
+            for name, command in feature.get("commands", {}).items()
+            if command.get("params")
+        }
+        if commands:
+            item["commands"] = commands
+        compacted.append(item)
+    return compacted
+
+
+class ViCareSnapshotStore:
+    """Keep the last good feature snapshot of a device under .storage."""
+
+    def __init__(self, hass: HomeAssistant, serial: str) -> None:
+        """Initialize the store."""
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.snapshot.{serial}")
+        self._features = None
+        # When the latest snapshot was fetched
+        self.fetched: datetime | None = None
+        self._save_pending = False
+
+    async def async_load(self, max_age: timedelta):
+        """Return the stored features, or None if there are none recent enough."""
+        data = await self._store.async_load()
+        if not data:
+            return None
+
+        fetched = dt_util.parse_datetime(data[ATTR_FETCHED])
+        if fetched is None or dt_util.utcnow() - fetched > max_age:
+            _LOGGER.debug("Ignoring stored snapshot from %s", data[ATTR_FETCHED])
+            return None
+        self.fetched = fetched
+        return data[ATTR_FEATURES]
+
+    @callback
+    def async_schedule_save(self, features) -> None:
+        """Schedule writing the latest snapshot."""
+        self._features = features
+        self.fetched = dt_util.utcnow()
+        if not self._save_pending:
+            self._save_pending = True
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict:
+        self._save_pending = False
+        return {
+            ATTR_FETCHED: self.fetched.isoformat(),
+            ATTR_FEATURES: compact_features(self._features),
+        }
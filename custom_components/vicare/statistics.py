@@ -0,0 +1,178 @@
+"""Long-term statistics of ViCare consumption and production history."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+import logging
+from typing import Callable
+
+from PyViCare.PyViCareDevice import Device
+from PyViCare.PyViCareUtils import PyViCareInvalidDataError
+
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    get_last_statistics,
+)
+from homeassistant.const import ENERGY_KILO_WATT_HOUR
+from homeassistant.core import HomeAssistant, callback
+import homeassistant.util.dt as dt_util
+from homeassistant.util import slugify
+
+from .const import DOMAIN, RefreshTier
+from .coordinator import ViCareDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class ViCareStatisticDescription:
+    """Describes a daily history imported into long-term statistics."""
+
+    key: str
+    name: str
+    days_getter: Callable[[Device], list]
+
+
+STATISTICS: tuple[ViCareStatisticDescription, ...] = (
+    ViCareStatisticDescription(
+        key="gas_consumption_heating",
+        name="Heating gas consumption",
+        days_getter=lambda api: api.getGasConsumptionHeatingDays(),
+    ),
+    ViCareStatisticDescription(
+        key="gas_consumption_dhw",
+        name="Hot water gas consumption",
+        days_getter=lambda api: api.getGasConsumptionDomesticHotWaterDays(),
+    ),
+    ViCareStatisticDescription(
+        key="gas_consumption_total",
+        name="Total gas consumption",
+        days_getter=lambda api: api.getGasConsumptionTotalDays(),
+    ),
+    ViCareStatisticDescription(
+        key="power_consumption_heating",
+        name="Heating power consumption",
+        days_getter=lambda api: api.getPowerConsumptionHeatingDays(),
+    ),
+    ViCareStatisticDescription(
+        key="power_production",
+        name="Power production",
+        days_getter=lambda api: api.getPowerProductionDays(),
+    ),
+)
+
+
+def day_start(day: date) -> datetime:
+    """Return the start of the statistics row of a local day.
+
+    Rows start on the hour in UTC, which local midnight is not in zones with
+    a half hour offset, so the row starts at the UTC hour midnight falls in.
+    """
+    start = dt_util.as_utc(dt_util.start_of_local_day(day))
+    return start.replace(minute=0, second=0, microsecond=0)
+
+
+class ViCareStatisticsImporter:
+    """Write the daily consumption and production arrays of a device to statistics.
+
+    The API reports the values of the last days with today first. Each
+    import writes one row per day, starting on the UTC hour local midnight
+    falls in, and rewrites the row of the last imported day as it grows.
+    Days missed while Home Assistant was down are backfilled as far as the
+    arrays reach.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        coordinator: ViCareDataUpdateCoordinator,
+        api,
+        serial: str,
+        name: str,
+    ) -> None:
+        """Initialize the importer."""
+        self.hass = hass
+        self._coordinator = coordinator
+        self._api = api
+        self._serial = serial
+        self._name = name
+        self._importing = False
+
+    @callback
+    def async_schedule_import(self) -> None:
+        """Import the history after a good refresh once the hourly tier is due."""
+        if (
+            self._importing
+            or not self._coordinator.last_update_success
+            or not self._coordinator.tier_due(RefreshTier.hourly)
+        ):
+            return
+        self._importing = True
+        self.hass.async_create_task(self._async_import())
+
+    async def _async_import(self) -> None:
+        """Import every history the device reports."""
+        try:
+            today = dt_util.now().date()
+            for description in STATISTICS:
+                try:
+                    days = self._coordinator.capabilities.read(
+                        f"statistics_{description.key}",
+                        lambda description=description: description.days_getter(
+                            self._api
+                        ),
+                    )
+                except (ValueError, PyViCareInvalidDataError) as err:
+                    _LOGGER.debug("Unable to read %s: %s", description.key, err)
+                    continue
+                if days:
+                    await self._async_import_days(description, days, today)
+        finally:
+            self._importing = False
+
+    async def _async_import_days(
+        self, description: ViCareStatisticDescription, days: list, today
+    ) -> None:
+        """Import the daily values of a single history."""
+        statistic_id = f"{DOMAIN}:{slugify(f'{self._serial} {description.key}')}"
+        starts: list[datetime] = [
+            day_start(today - timedelta(days=index)) for index in range(len(days))
+        ]
+
+        # Continue the sum of the rows imported so far
+        first = len(days) - 1
+        total = 0.0
+        last = await self.hass.async_add_executor_job(
+            get_last_statistics, self.hass, 1, statistic_id, True
+        )
+        if last:
+            row = last[statistic_id][0]
+            last_start = dt_util.parse_datetime(row["start"])
+            if last_start in starts:
+                first = starts.index(last_start)
+                total = (row["sum"] or 0) - (row["state"] or 0)
+            elif last_start > starts[0]:
+                return
+            else:
+                # Down for longer than the history reaches
+                total = row["sum"] or 0
+
+        statistics = []
+        for index in range(first, -1, -1):
+            value = days[index] or 0
+            total += value
+            statistics.append(
+                StatisticData(start=starts[index], state=value, sum=total)
+            )
+
+        metadata = StatisticMetaData(
+            has_mean=False,
+            has_sum=True,
+            name=f"{self._name} {description.name}",
+            source=DOMAIN,
+            statistic_id=statistic_id,
+            unit_of_measurement=ENERGY_KILO_WATT_HOUR,
+        )
+        _LOGGER.debug("Importing %s days of %s", len(statistics), statistic_id)
+        async_add_external_statistics(self.hass, metadata, statistics)
@@ -0,0 +1,98 @@
+"""Component topology of ViCare devices."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+import logging
+from typing import Any, Callable, Iterator, Sequence
+
+from PyViCare.PyViCareUtils import (
+    PyViCareInvalidDataError,
+    PyViCareNotSupportedFeatureError,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ViCareTopology:
+    """Heating circuits, burners and compressors of a single device.
+
+    PyViCare derives these from the feature snapshot and creates new
+    component objects on every access. The topology reads them once per
+    feature list, so setup, polling and entities share the same objects.
+    """
+
+    device: Any
+    circuits: tuple = ()
+    burners: tuple = ()
+    compressors: tuple = ()
+
+    def build_entities(
+        self,
+        name: str,
+        build: Callable[[str, Any, Any], Any],
+        device: Sequence = (),
+        circuits: Sequence = (),
+        burners: Sequence = (),
+        compressors: Sequence = (),
+    ) -> list:
+        """Build an entity for every description and matching component.
+
+        `build` is called with the entity name, the component and the
+        description, it returns None for a getter the component does not
+        support.
+        """
+        entities = []
+        for descriptions, components in (
+            (device, (self.device,)),
+            (circuits, self.circuits),
+            (burners, self.burners),
+            (compressors, self.compressors),
+        ):
+            for description in descriptions:
+                for entity_name, component in named_components(
+                    name, description.name, components
+                ):
+                    entity = build(entity_name, component, description)
+                    if entity is not None:
+                        entities.append(entity)
+        return entities
+
+
+def named_components(
+    name: str, label: str, components: Sequence
+) -> Iterator[tuple[str, Any]]:
+    """Yield the entity name of every component, numbered if there are several."""
+    for component in components:
+        suffix = ""
+        if len(components) > 1:
+            suffix = f" {component.id}"
+        yield f"{name} {label}{suffix}", component
+
+
+def read_topology(api) -> ViCareTopology:
+    """Read the components of a device from its current snapshot."""
+    topology = ViCareTopology(
+        device=api,
+        circuits=_read_components(api, "circuits"),
+        burners=_read_components(api, "burners"),
+        compressors=_read_components(api, "compressors"),
+    )
+    _LOGGER.debug(
+        "Found %s circuits, %s burners and %s compressors",
+        len(topology.circuits),
+        len(topology.burners),
+        len(topology.compressors),
+    )
+    return topology
+
+
+def _read_components(api, kind: str) -> tuple:
+    try:
+        return tuple(getattr(api, kind))
+    except (
+        AttributeError,
+        PyViCareInvalidDataError,
+        PyViCareNotSupportedFeatureError,
+    ):
+        return ()
@@ -0,0 +1,118 @@
+"""Span trace of ViCare logins, requests, refreshes and commands."""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from functools import partial
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import queue
+import time
+from typing import Any, Iterator
+
+from homeassistant.const import CONF_USERNAME
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import slugify
+import homeassistant.util.dt as dt_util
+
+_LOGGER = logging.getLogger(__name__)
+
+# The trace file is rotated at this size, keeping this many old files
+TRACE_MAX_BYTES = 10 * 1024 * 1024
+TRACE_BACKUP_COUNT = 3
+
+
+def trace_file_name(conf) -> str:
+    """Return the name of the trace file of an account."""
+    return f"vicare_trace_{slugify(conf[CONF_USERNAME])}.jsonl"
+
+
+class ViCareTracer:
+    """Write a JSON line for every span of work done for a ViCare account.
+
+    A span carries its name, start time, duration, the serial of the device
+    it belongs to, its outcome and whatever the caller adds, like the bytes
+    received. Spans are handed to a queue and written to a size rotated
+    file by a background thread, so the event loop never waits for the
+    disk. While the trace is not started, spans cost next to nothing and
+    are dropped.
+    """
+
+    def __init__(self, hass: HomeAssistant, name: str) -> None:
+        """Initialize a tracer that is not started."""
+        self.hass = hass
+        self._logger = logging.getLogger(f"{__name__}.{name}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._listener: QueueListener | None = None
+
+    @property
+    def enabled(self) -> bool:
+        """Return True while spans are written."""
+        return self._listener is not None
+
+    async def async_start(self, path: str) -> None:
+        """Start writing spans to a file."""
+        if self._listener is not None:
+            return
+        handler = await self.hass.async_add_executor_job(
+            partial(
+                RotatingFileHandler,
+                path,
+                maxBytes=TRACE_MAX_BYTES,
+                backupCount=TRACE_BACKUP_COUNT,
+                encoding="utf-8",
+            )
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        span_queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._logger.addHandler(QueueHandler(span_queue))
+        self._listener = QueueListener(span_queue, handler)
+        self._listener.start()
+        _LOGGER.info("Writing ViCare span trace to %s", path)
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop writing spans, the file is closed in the background."""
+        listener, self._listener = self._listener, None
+        if listener is None:
+            return
+        for handler in list(self._logger.handlers):
+            self._logger.removeHandler(handler)
+        self.hass.async_add_executor_job(_stop_listener, listener)
+
+    @contextmanager
+    def span(
+        self, name: str, serial: str | None = None, **attributes: Any
+    ) -> Iterator[dict[str, Any]]:
+        """Time the work within the block and write it as a span.
+
+        The yielded dict can be extended with attributes known only at the
+        end, an `outcome` set there replaces the default of ok.
+        """
+        if self._listener is None:
+            yield {}
+            return
+        span = {
+            "span": name,
+            "start": dt_util.utcnow().isoformat(),
+            "serial": serial,
+            **attributes,
+        }
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as err:
+            span["outcome"] = type(err).__name__
+            raise
+        finally:
+            span["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            span.setdefault("outcome", "ok")
+            self._logger.info(json.dumps(span, default=str))
+
+
+def _stop_listener(listener: QueueListener) -> None:
+    """Write the spans still queued and close the file."""
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
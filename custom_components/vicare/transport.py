@@ -0,0 +1,218 @@
+"""Asyncio transport for the ViCare API."""
+from __future__ import annotations
+
+from contextlib import suppress
+from dataclasses import dataclass
+import json
+import logging
+from typing import TYPE_CHECKING, Any
+
+import aiohttp
+import async_timeout
+from PyViCare import PyViCareAbstractOAuthManager as vicare_api
+from PyViCare.PyViCareUtils import (
+    PyViCareCommandError,
+    PyViCareInternalServerError,
+    PyViCareRateLimitError,
+)
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+
+if TYPE_CHECKING:
+    from .auth import ViCareTokenManager
+    from .metrics import ViCareMetrics
+    from .quota import ViCareQuotaGovernor
+    from .recording import ViCareRecorder
+    from .trace import ViCareTracer
+
+_LOGGER = logging.getLogger(__name__)
+
+API_TIMEOUT = 30
+ACCEPT_ENCODING = "gzip, deflate"
+
+
+@dataclass
+class ViCareTransportStats:
+    """Connection reuse and traffic of a transport."""
+
+    requests: int = 0
+    pool_hits: int = 0
+    pool_misses: int = 0
+    bytes_received: int = 0
+    bytes_decoded: int = 0
+
+
+@callback
+def async_create_websession(
+    hass: HomeAssistant, stats: ViCareTransportStats
+) -> aiohttp.ClientSession:
+    """Create the keep-alive HTTP session of a ViCare account.
+
+    The session counts whether a request found an idle connection in the
+    pool or had to open a new one. It is not closed with the config entry,
+    call `detach` once the account's session is dropped.
+    """
+
+    async def _on_reuse(_session, _context, _params) -> None:
+        stats.pool_hits += 1
+
+    async def _on_create(_session, _context, _params) -> None:
+        stats.pool_misses += 1
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_reuseconn.append(_on_reuse)
+    trace_config.on_connection_create_end.append(_on_create)
+    return async_create_clientsession(
+        hass, auto_cleanup=False, trace_configs=[trace_config]
+    )
+
+
+class ViCareAsyncTransport:
+    """Send ViCare API requests from the event loop.
+
+    Requests carry the access token of the account's token manager. A
+    request finding the token expired has it renewed and is sent once more.
+    Every request sent counts against the quota of the account.
+
+    Reads and writes go through the pooled HTTP session of the account and
+    ask for compressed responses. While a recorder is attached every request
+    is recorded with its response.
+    """
+
+    def __init__(
+        self,
+        websession: aiohttp.ClientSession,
+        token_manager: ViCareTokenManager,
+        stats: ViCareTransportStats,
+        governor: ViCareQuotaGovernor,
+        metrics: ViCareMetrics,
+        tracer: ViCareTracer,
+    ) -> None:
+        """Initialize the transport."""
+        self.websession = websession
+        self.stats = stats
+        self.governor = governor
+        self.metrics = metrics
+        self.tracer = tracer
+        self.recorder: ViCareRecorder | None = None
+        self._token_manager = token_manager
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Release the HTTP session once the account is dropped."""
+        self.websession.detach()
+
+    async def async_get(self, url: str) -> Any:
+        """Send a GET request to the ViCare API."""
+        return await self._async_request("GET", url)
+
+    async def async_post(self, url: str, data: str) -> Any:
+        """Send a POST request to the ViCare API."""
+        response = await self._async_request(
+            "POST",
+            url,
+            data=data,
+            headers={
+                "Content-Type": "application/json",
+                "Accept": "application/vnd.siren+json",
+            },
+        )
+        if response.get("statusCode", 0) >= 400:
+            raise PyViCareCommandError(response)
+        return response
+
+    async def _async_request(self, method: str, url: str, **kwargs) -> Any:
+        """Send a request, renewing an expired token once."""
+        access_token = self._token_manager.access_token
+        response = await self._async_send(method, url, access_token, **kwargs)
+        if response.get("error") == "EXPIRED TOKEN":
+            await self._token_manager.async_refresh(access_token)
+            response = await self._async_send(
+                method, url, self._token_manager.access_token, **kwargs
+            )
+
+        if self.recorder is not None:
+            self.recorder.async_record(method, url, kwargs.get("data"), response)
+        if response.get("statusCode") == 429:
+            raise PyViCareRateLimitError(response)
+        return response
+
+    async def _async_send(
+        self, method: str, url: str, access_token: str, headers=None, **kwargs
+    ) -> Any:
+        headers = {
+            **(headers or {}),
+            "Authorization": f"Bearer {access_token}",
+            "Accept-Encoding": ACCEPT_ENCODING,
+        }
+        self.governor.record_call()
+        with self.tracer.span("request", method=method, url=url) as span:
+            async with async_timeout.timeout(API_TIMEOUT):
+                response = await async_read_json(
+                    self.websession.request(
+                        method,
+                        f"{vicare_api.API_BASE_URL}{url}",
+                        headers=headers,
+                        **kwargs,
+                    ),
+                    self.stats,
+                    self.metrics,
+                    span,
+                )
+            if "statusCode" in response:
+                span["outcome"] = response["statusCode"]
+            elif "error" in response:
+                span["outcome"] = response["error"]
+            return response
+
+
+async def async_read_json(
+    request,
+    stats: ViCareTransportStats,
+    metrics: ViCareMetrics | None = None,
+    span: dict[str, Any] | None = None,
+) -> Any:
+    """Send a request and decode its JSON body, counting the traffic.
+
+    Server errors raise PyViCareInternalServerError, whether the body is an
+    error of the API or the page of a gateway in front of it.
+    """
+    async with request as response:
+        body = await response.read()
+
+    # Content-Length is the compressed size when the body was compressed
+    received = response.content_length
+    if received is None:
+        received = len(body)
+    stats.requests += 1
+    stats.bytes_received += received
+    stats.bytes_decoded += len(body)
+    if metrics is not None:
+        metrics.payload_size.record(received)
+    if span is not None:
+        span["bytes"] = received
+    _LOGGER.debug(
+        "%s %s: %s bytes on the wire, %s decoded",
+        response.method,
+        response.url.path,
+        received,
+        len(body),
+    )
+    if response.status >= 500:
+        raise PyViCareInternalServerError(_server_error(response, body))
+    return json.loads(body) if body.strip() else {}
+
+
+def _server_error(response: aiohttp.ClientResponse, body: bytes) -> dict[str, Any]:
+    """Return the error of a server error response, as the API reports it."""
+    error = {
+        "statusCode": response.status,
+        "message": response.reason,
+        "viErrorId": None,
+    }
+    with suppress(ValueError):
+        payload = json.loads(body)
+        if isinstance(payload, dict):
+            error.update(payload)
+    return error
@@ -1,13 +1,7 @@
 """Viessmann ViCare water_heater device."""
-from contextlib import suppress
 import logging
 
-from PyViCare.PyViCareUtils import (
-    PyViCareInvalidDataError,
-    PyViCareNotSupportedFeatureError,
-    PyViCareRateLimitError,
-)
-import requests
+from PyViCare.PyViCareUtils import PyViCareInvalidDataError
 
 from homeassistant.components.water_heater import (
     SUPPORT_TARGET_TEMPERATURE,
@@ -15,14 +9,18 @@ from homeassistant.components.water_heater import (
 )
 from homeassistant.const import ATTR_TEMPERATURE, PRECISION_WHOLE, TEMP_CELSIUS
 
+from .capabilities import capability_key
 from .const import (
     CONF_HEATING_TYPE,
     DOMAIN,
     VICARE_API,
-    VICARE_CIRCUITS,
-    VICARE_DEVICE_CONFIG,
+    VICARE_COMMANDS,
+    VICARE_COORDINATOR,
+    VICARE_DEVICE_LIST,
     VICARE_NAME,
 )
+from .entity import ViCareCommandEntity
+from .topology import named_components
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -54,13 +52,14 @@ HA_TO_VICARE_HVAC_DHW = {
 }
 
 
-def _build_entity(name, vicare_api, circuit, device_config, heating_type):
+def _build_entity(coordinator, commands, name, vicare_api, circuit, heating_type):
     _LOGGER.debug("Found device %s", name)
     return ViCareWater(
+        coordinator,
+        commands,
         name,
         vicare_api,
         circuit,
-        device_config,
         heating_type,
     )
 
@@ -70,89 +69,83 @@ async def async_setup_entry(hass, config_entry, async_add_devices):
     name = hass.data[DOMAIN][config_entry.entry_id][VICARE_NAME]
 
     all_devices = []
-    for circuit in hass.data[DOMAIN][config_entry.entry_id][VICARE_CIRCUITS]:
-        suffix = ""
-        if len(hass.data[DOMAIN][config_entry.entry_id][VICARE_CIRCUITS]) > 1:
-            suffix = f" {circuit.id}"
-        entity = _build_entity(
-            f"{name} Water{suffix}",
-            hass.data[DOMAIN][config_entry.entry_id][VICARE_API],
-            circuit,
-            hass.data[DOMAIN][config_entry.entry_id][VICARE_DEVICE_CONFIG],
-            hass.data[DOMAIN][config_entry.entry_id][CONF_HEATING_TYPE],
-        )
-        if entity is not None:
-            all_devices.append(entity)
+    for device in hass.data[DOMAIN][config_entry.entry_id][VICARE_DEVICE_LIST]:
+        for entity_name, circuit in named_components(
+            name, "Water", device[VICARE_COORDINATOR].topology.circuits
+        ):
+            entity = _build_entity(
+                device[VICARE_COORDINATOR],
+                device[VICARE_COMMANDS],
+                entity_name,
+                device[VICARE_API],
+                circuit,
+                hass.data[DOMAIN][config_entry.entry_id][CONF_HEATING_TYPE],
+            )
+            if entity is not None:
+                all_devices.append(entity)
 
     async_add_devices(all_devices)
 
 
-class ViCareWater(WaterHeaterEntity):
+class ViCareWater(ViCareCommandEntity, WaterHeaterEntity):
     """Representation of the ViCare domestic hot water device."""
 
-    def __init__(self, name, api, circuit, device_config, heating_type):
+    __slots__ = (
+        "_state",
+        "_circuit",
+        "_attributes",
+        "_target_temperature",
+        "_current_temperature",
+        "_current_mode",
+        "_heating_type",
+    )
+
+    def __init__(self, coordinator, commands, name, api, circuit, heating_type):
         """Initialize the DHW water_heater device."""
-        self._name = name
+        super().__init__(coordinator, commands, "dhw", name, api)
         self._state = None
-        self._api = api
         self._circuit = circuit
-        self._device_config = device_config
         self._attributes = {}
         self._target_temperature = None
         self._current_temperature = None
         self._current_mode = None
         self._heating_type = heating_type
 
-    def update(self):
-        """Let HA know there has been an update from the ViCare API."""
+    def _update_state(self):
+        """Update the state from the device snapshot."""
+        capabilities = self.coordinator.capabilities
         try:
-            with suppress(PyViCareNotSupportedFeatureError):
-                self._current_temperature = (
-                    self._api.getDomesticHotWaterStorageTemperature()
-                )
-
-            with suppress(PyViCareNotSupportedFeatureError):
-                self._target_temperature = (
-                    self._api.getDomesticHotWaterDesiredTemperature()
-                )
-
-            with suppress(PyViCareNotSupportedFeatureError):
-                self._current_mode = self._circuit.getActiveMode()
-
-        except requests.exceptions.ConnectionError:
-            _LOGGER.error("Unable to retrieve data from ViCare server")
-        except PyViCareRateLimitError as limit_exception:
-            _LOGGER.error("Vicare API rate limit exceeded: %s", limit_exception)
+            current_temperature = capabilities.read(
+                "dhw_storage_temperature",
+                self._api.getDomesticHotWaterStorageTemperature,
+            )
+            if current_temperature is not None:
+                self._current_temperature = current_temperature
+
+            target_temperature = capabilities.read(
+                "dhw_desired_temperature",
+                self._api.getDomesticHotWaterDesiredTemperature,
+            )
+            if target_temperature is not None:
+                self._target_temperature = target_temperature
+
+            current_mode = capabilities.read(
+                capability_key("active_mode", self._circuit),
+                self._circuit.getActiveMode,
+            )
+            if current_mode is not None:
+                self._current_mode = current_mode
+
         except ValueError:
             _LOGGER.error("Unable to decode data from ViCare server")
         except PyViCareInvalidDataError as invalid_data_exception:
             _LOGGER.error("Invalid data from Vicare server: %s", invalid_data_exception)
 
-    @property
-    def unique_id(self):
-        """Return unique ID for this device."""
-        return f"{self._device_config.getConfig().serial}-{self._name}"
-
-    @property
-    def device_info(self):
-        """Return device info for this device."""
-        return {
-            "identifiers": {(DOMAIN, self._device_config.getConfig().serial)},
-            "name": self._device_config.getModel(),
-            "manufacturer": "Viessmann",
-            "model": (DOMAIN, self._device_config.getModel()),
-        }
-
     @property
     def supported_features(self):
         """Return the list of supported features."""
         return SUPPORT_FLAGS_HEATER
 
-    @property
-    def name(self):
-        """Return the name of the water_heater device."""
-        return self._name
-
     @property
     def temperature_unit(self):
         """Return the unit of measurement."""
@@ -168,12 +161,17 @@ class ViCareWater(WaterHeaterEntity):
         """Return the temperature we try to reach."""
         return self._target_temperature
 
-    def set_temperature(self, **kwargs):
+    async def async_set_temperature(self, **kwargs):
         """Set new target temperatures."""
         temp = kwargs.get(ATTR_TEMPERATURE)
         if temp is not None:
-            self._api.setDomesticHotWaterTemperature(temp)
-            self._target_temperature = temp
+            await self._async_send(
+                "temperature",
+                ["heating.dhw.temperature.main"],
+                self._api.setDomesticHotWaterTemperature,
+                temp,
+                _target_temperature=temp,
+            )
 
     @property
     def min_temp(self):
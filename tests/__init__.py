@@ -1,5 +1,10 @@
 """Test for ViCare."""
-from homeassistant.components.vicare.const import CONF_HEATING_TYPE
+from homeassistant.components.vicare.const import (
+    CONF_HEATING_TYPE,
+    DOMAIN,
+    VICARE_COORDINATOR,
+    VICARE_DEVICE_LIST,
+)
 from homeassistant.const import (
     CONF_CLIENT_ID,
     CONF_NAME,
@@ -8,6 +13,8 @@ from homeassistant.const import (
     CONF_USERNAME,
 )
 
+from tests.common import MockConfigEntry
+
 ENTRY_CONFIG = {
     CONF_USERNAME: "foo@bar.com",
     CONF_PASSWORD: "1234",
@@ -18,3 +25,22 @@ ENTRY_CONFIG = {
 }
 
 MOCK_MAC = "B874241B7B9"
+
+
+async def setup_entry(hass, data=ENTRY_CONFIG, options=None):
+    """Set up a ViCare config entry and wait for its first states."""
+    entry = MockConfigEntry(
+        domain=DOMAIN, unique_id="foo@bar.com", data=data, options=options or {}
+    )
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    return entry
+
+
+def get_coordinators(hass, entry):
+    """Return the coordinators of all devices of an entry."""
+    return [
+        device[VICARE_COORDINATOR]
+        for device in hass.data[DOMAIN][entry.entry_id][VICARE_DEVICE_LIST]
+    ]
@@ -0,0 +1,356 @@
+"""Local stand-in for the ViCare cloud used by the ViCare tests."""
+from __future__ import annotations
+
+from collections import Counter
+import copy
+import gzip
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from pathlib import Path
+import re
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = Path(__file__).parent / "fixtures" / "vicare"
+
+REDIRECT_URI = "vicare://oauth-callback/everest"
+INSTALLATION_ID = 2045379
+GATEWAY_SERIAL = "7637415022052208"
+
+FEATURE_PATH = re.compile(
+    r"^/iot/v1/equipment/installations/(?P<installation>\d+)"
+    r"/gateways/(?P<gateway>[^/]+)/devices/(?P<device>[^/]+)"
+    r"/features/(?P<feature>[^/]*)(?:/(?P<action>[^/]+))?$"
+)
+
+
+def load_fixture(name: str) -> dict:
+    """Return a canned installation device, e.g. `gas` or `heatpump`."""
+    with open(FIXTURES / f"{name}.json", encoding="utf-8") as fixture:
+        return json.load(fixture)
+
+
+class ViCareCloudServer:
+    """Serve the OAuth, installation and feature endpoints of the ViCare API.
+
+    Every device of the installation is backed by a canned fixture. Write
+    commands change the served features the way the real devices do for
+    the commands the integration sends. Latency, rate limit responses,
+    server errors and outages can be switched on while a test runs, and every request is
+    counted per endpoint along with the most requests served at once.
+    """
+
+    def __init__(self, *fixtures: str) -> None:
+        """Initialize the server for one gateway with a device per fixture."""
+        self.devices: dict[str, dict] = {
+            str(device_id): load_fixture(fixture)
+            for device_id, fixture in enumerate(fixtures or ("gas",))
+        }
+        self.latency = 0.0
+        self.rate_limit_reset: float | None = None
+        self.outage = False
+        # Status of the server error answered to every request, if any
+        self.server_error: int | None = None
+        # Answer server errors with the HTML page of a gateway
+        self.error_page = False
+        self.calls: Counter[str] = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.commands: list[tuple[str, str, dict]] = []
+        self.tokens: list[str] = []
+        self._valid_tokens: set[str] = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _handler_for(self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="vicare-cloud", daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        """Return the base url of the server."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_calls(self) -> int:
+        """Return the number of API requests, not counting OAuth."""
+        return sum(
+            count for kind, count in self.calls.items() if not kind.startswith("oauth")
+        )
+
+    def start(self) -> ViCareCloudServer:
+        """Start serving in a background thread."""
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_calls(self) -> None:
+        """Forget the requests counted so far."""
+        with self._lock:
+            self.calls.clear()
+            self.commands.clear()
+            self.max_in_flight = 0
+
+    def rate_limit(self, seconds: float = 3600) -> None:
+        """Answer every API request with a rate limit error for a while."""
+        self.rate_limit_reset = time.time() + seconds
+
+    def expire_tokens(self) -> None:
+        """Reject every access token issued so far as expired."""
+        with self._lock:
+            self._valid_tokens.clear()
+
+    def issue_token(self) -> str:
+        """Return a new access token."""
+        with self._lock:
+            token = f"test-access-token-{len(self.tokens)}"
+            self.tokens.append(token)
+            self._valid_tokens.add(token)
+        return token
+
+    def token_valid(self, authorization: str | None) -> bool:
+        """Return True if a request carries an access token that did not expire."""
+        token = (authorization or "").partition(" ")[2]
+        with self._lock:
+            return token in self._valid_tokens
+
+    def feature(self, device_id: str, name: str) -> dict | None:
+        """Return a served feature of a device."""
+        for feature in self.devices[device_id]["features"]:
+            if feature["feature"] == name:
+                return feature
+        return None
+
+    def begin_request(self) -> None:
+        """Note a request the server started to answer."""
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def end_request(self) -> None:
+        """Note a request the server answered."""
+        with self._lock:
+            self.in_flight -= 1
+
+    def count(self, kind: str) -> None:
+        """Count a request of an endpoint."""
+        with self._lock:
+            self.calls[kind] += 1
+
+    def installations(self) -> dict:
+        """Return the installation with all devices."""
+        return {
+            "data": [
+                {
+                    "id": INSTALLATION_ID,
+                    "description": "Test installation",
+                    "gateways": [
+                        {
+                            "serial": GATEWAY_SERIAL,
+                            "version": "250.22.4.0",
+                            "gatewayType": "VitoconnectOptolink",
+                            "installationId": INSTALLATION_ID,
+                            "devices": [
+                                {
+                                    "id": device_id,
+                                    "gatewaySerial": GATEWAY_SERIAL,
+                                    "modelId": device["modelId"],
+                                    "status": "Online",
+                                    "deviceType": "heating",
+                                }
+                                for device_id, device in self.devices.items()
+                            ],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    def execute(self, device_id: str, name: str, action: str, params: dict) -> bool:
+        """Apply a write command to the served features of a device."""
+        feature = self.feature(device_id, name)
+        if feature is None or action not in feature.get("commands", {}):
+            return False
+
+        with self._lock:
+            self.commands.append((name, action, params))
+            properties = feature["properties"]
+            if action == "setMode":
+                properties["value"]["value"] = params["mode"]
+            elif action == "setTemperature":
+                properties["temperature"]["value"] = params["targetTemperature"]
+            elif action == "setTargetTemperature":
+                properties["value"]["value"] = params["temperature"]
+            elif action in ("activate", "deactivate"):
+                properties["active"]["value"] = action == "activate"
+                program = name.rsplit(".", 1)[1]
+                active = self.feature(device_id, f"{name.rsplit('.', 1)[0]}.active")
+                if action == "activate":
+                    active["properties"]["value"]["value"] = program
+                elif active["properties"]["value"]["value"] == program:
+                    active["properties"]["value"]["value"] = "normal"
+        return True
+
+
+def _handler_for(cloud: ViCareCloudServer):
+    """Return the request handler class serving a cloud stand-in."""
+
+    class ViCareCloudHandler(BaseHTTPRequestHandler):
+        """Answer a single request to the ViCare cloud stand-in."""
+
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            """Keep the test output quiet."""
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            """Serve installations and features."""
+            self._serve("GET")
+
+        def do_POST(self):  # pylint: disable=invalid-name
+            """Serve OAuth and write commands."""
+            self._serve("POST")
+
+        def _serve(self, method: str) -> None:
+            cloud.begin_request()
+            try:
+                self._answer(method)
+            finally:
+                cloud.end_request()
+
+        def _answer(self, method: str) -> None:
+            url = urlsplit(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+
+            if cloud.outage:
+                # Drop the connection like an unreachable server
+                self.close_connection = True
+                return
+            if cloud.latency:
+                time.sleep(cloud.latency)
+            if cloud.server_error is not None:
+                cloud.count("server_error")
+                if cloud.error_page:
+                    self._send(
+                        cloud.server_error,
+                        b"<html><body><h1>Bad Gateway</h1></body></html>",
+                        "text/html",
+                    )
+                else:
+                    self._json(
+                        cloud.server_error,
+                        _error(cloud.server_error, "INTERNAL_SERVER_ERROR"),
+                    )
+                return
+
+            if url.path == "/idp/v2/authorize":
+                cloud.count("oauth_authorize")
+                state = parse_qs(url.query).get("state", [""])[0]
+                self.send_response(302)
+                self.send_header(
+                    "Location", f"{REDIRECT_URI}?code=test-code&state={state}"
+                )
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if url.path == "/idp/v2/token":
+                cloud.count("oauth_token")
+                self._json(
+                    200,
+                    {
+                        "access_token": cloud.issue_token(),
+                        "token_type": "Bearer",
+                        "expires_in": 3600,
+                    },
+                )
+                return
+
+            if not cloud.token_valid(self.headers.get("Authorization")):
+                cloud.count("expired_token")
+                self._json(401, {"error": "EXPIRED TOKEN"})
+                return
+
+            if cloud.rate_limit_reset is not None:
+                if time.time() < cloud.rate_limit_reset:
+                    cloud.count("rate_limited")
+                    self._json(429, _rate_limit_error(cloud.rate_limit_reset))
+                    return
+                cloud.rate_limit_reset = None
+
+            if url.path == "/iot/v1/equipment/installations":
+                cloud.count("installations")
+                self._json(200, cloud.installations())
+                return
+
+            match = FEATURE_PATH.match(url.path)
+            if match is None or match["device"] not in cloud.devices:
+                self._json(404, _error(404, "NOT_FOUND"))
+                return
+
+            device_id = match["device"]
+            if method == "POST" and match["action"]:
+                cloud.count("command")
+                params = json.loads(body or b"{}")
+                if cloud.execute(device_id, match["feature"], match["action"], params):
+                    self._json(202, {"data": {"success": True}})
+                else:
+                    self._json(400, _error(400, "FEATURE_COMMAND_NOT_FOUND"))
+                return
+
+            if not match["feature"]:
+                cloud.count("features")
+                self._json(
+                    200, {"data": copy.deepcopy(cloud.devices[device_id]["features"])}
+                )
+                return
+
+            cloud.count("feature")
+            feature = cloud.feature(device_id, match["feature"])
+            if feature is None:
+                self._json(404, _error(404, "FEATURE_NOT_FOUND"))
+                return
+            self._json(200, {"data": copy.deepcopy(feature)})
+
+        def _json(self, status: int, payload: dict) -> None:
+            self._send(status, json.dumps(payload).encode(), "application/json")
+
+        def _send(self, status: int, data: bytes, content_type: str) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                data = gzip.compress(data)
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return ViCareCloudHandler
+
+
+def _error(status: int, error_type: str) -> dict:
+    return {
+        "viErrorId": "test",
+        "statusCode": status,
+        "errorType": error_type,
+        "message": error_type.replace("_", " ").lower(),
+    }
+
+
+def _rate_limit_error(reset: float) -> dict:
+    return {
+        **_error(429, "RATE_LIMIT_EXCEEDED"),
+        "extendedPayload": {
+            "name": "ViCare day limit",
+            "requestCountLimit": 1450,
+            "clientId": "test",
+            "userId": "test",
+            "limitReset": int(reset * 1000),
+        },
+    }
@@ -0,0 +1,23 @@
+"""Fixtures for ViCare integration tests."""
+import pytest
+
+from .cloud_server import ViCareCloudServer
+
+
+@pytest.fixture
+def vicare_cloud(request, hass, monkeypatch):
+    """Serve the ViCare cloud locally, one device per fixture name in the param."""
+    cloud = ViCareCloudServer(*getattr(request, "param", ("gas",))).start()
+    # The stand-in serves plain http
+    monkeypatch.setenv("OAUTHLIB_INSECURE_TRANSPORT", "1")
+    monkeypatch.setattr(
+        "PyViCare.PyViCareAbstractOAuthManager.API_BASE_URL", f"{cloud.url}/iot/v1"
+    )
+    monkeypatch.setattr(
+        "PyViCare.PyViCareOAuthManager.AUTHORIZE_URL", f"{cloud.url}/idp/v2/authorize"
+    )
+    monkeypatch.setattr(
+        "PyViCare.PyViCareOAuthManager.TOKEN_URL", f"{cloud.url}/idp/v2/token"
+    )
+    yield cloud
+    cloud.stop()
@@ -0,0 +1,201 @@
+"""Benchmark the ViCare setup and update paths against a local cloud stand-in."""
+import asyncio
+from contextlib import suppress
+import logging
+import os
+import time
+
+import pytest
+
+from homeassistant.components.vicare.const import (
+    CONF_RECORD_TRAFFIC,
+    CONF_REPLAY,
+    DOMAIN,
+    VICARE_SESSION,
+)
+from homeassistant.components.vicare.recording import recording_file_name
+from homeassistant.const import STATE_UNAVAILABLE
+
+from . import ENTRY_CONFIG, get_coordinators, setup_entry
+
+_LOGGER = logging.getLogger(__name__)
+
+INSTALLATIONS = [
+    ("gas",),
+    ("heatpump",),
+    ("fuelcell",),
+    ("multi_circuit",),
+    ("gas", "heatpump", "fuelcell"),
+]
+
+
+class LoopMonitor:
+    """Measure how long the event loop was blocked while it runs."""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        """Initialize the monitor."""
+        self._interval = interval
+        self._task = None
+        self.blocked = 0.0
+        self.longest = 0.0
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self._interval)
+            lag = loop.time() - start - self._interval
+            if lag > 0:
+                self.blocked += lag
+                self.longest = max(self.longest, lag)
+
+    def start(self):
+        """Start measuring."""
+        # Not a hass task, so async_block_till_done does not wait for it
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop measuring."""
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+
+
+def _report(record_property, name, cloud, elapsed, monitor):
+    """Record the metrics of a benchmark for the test report."""
+    metrics = {
+        f"{name}_api_calls": cloud.api_calls,
+        f"{name}_wall_time": round(elapsed, 4),
+        f"{name}_loop_blocked": round(monitor.blocked, 4),
+        f"{name}_loop_longest_block": round(monitor.longest, 4),
+    }
+    for key, value in metrics.items():
+        record_property(key, value)
+    _LOGGER.info(" ".join(f"{key}={value}" for key, value in metrics.items()))
+
+
+@pytest.mark.parametrize("vicare_cloud", INSTALLATIONS, indirect=True)
+async def test_setup(hass, vicare_cloud, record_property):
+    """Test the cost of setting up an installation up to its first states."""
+    monitor = LoopMonitor()
+    monitor.start()
+    start = time.perf_counter()
+    entry = await setup_entry(hass)
+    elapsed = time.perf_counter() - start
+    await monitor.stop()
+
+    _report(record_property, "setup", vicare_cloud, elapsed, monitor)
+
+    devices = len(vicare_cloud.devices)
+    assert len(get_coordinators(hass, entry)) == devices
+    # One installation lookup and a single snapshot per device
+    assert vicare_cloud.calls["installations"] == 1
+    assert vicare_cloud.calls["features"] == devices
+    assert vicare_cloud.api_calls == 1 + devices
+
+    states = hass.states.async_all()
+    assert states
+    assert all(state.state != STATE_UNAVAILABLE for state in states)
+
+
+@pytest.mark.parametrize("vicare_cloud", INSTALLATIONS, indirect=True)
+async def test_refresh_cycle(hass, vicare_cloud, record_property):
+    """Test the cost of a single refresh cycle of all devices."""
+    entry = await setup_entry(hass)
+    vicare_cloud.reset_calls()
+
+    monitor = LoopMonitor()
+    monitor.start()
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(coordinator.async_refresh() for coordinator in get_coordinators(hass, entry))
+    )
+    await hass.async_block_till_done()
+    elapsed = time.perf_counter() - start
+    await monitor.stop()
+
+    _report(record_property, "refresh", vicare_cloud, elapsed, monitor)
+
+    assert vicare_cloud.api_calls == len(vicare_cloud.devices)
+    assert vicare_cloud.calls["features"] == len(vicare_cloud.devices)
+
+
+@pytest.mark.parametrize("vicare_cloud", INSTALLATIONS, indirect=True)
+async def test_replay(hass, vicare_cloud, record_property):
+    """Test that a recording replays setup and refreshes without the cloud."""
+    entry = await setup_entry(hass, options={CONF_RECORD_TRAFFIC: True})
+    await asyncio.gather(
+        *(coordinator.async_refresh() for coordinator in get_coordinators(hass, entry))
+    )
+    await hass.async_block_till_done()
+    recorded = {state.entity_id: state.state for state in hass.states.async_all()}
+    await hass.config_entries.async_remove(entry.entry_id)
+    await hass.async_block_till_done()
+
+    path = hass.config.path(recording_file_name(ENTRY_CONFIG))
+    vicare_cloud.reset_calls()
+    try:
+        monitor = LoopMonitor()
+        monitor.start()
+        start = time.perf_counter()
+        entry = await setup_entry(hass, data={**ENTRY_CONFIG, CONF_REPLAY: path})
+        await asyncio.gather(
+            *(
+                coordinator.async_refresh()
+                for coordinator in get_coordinators(hass, entry)
+            )
+        )
+        await hass.async_block_till_done()
+        elapsed = time.perf_counter() - start
+        await monitor.stop()
+    finally:
+        os.remove(path)
+
+    _report(record_property, "replay", vicare_cloud, elapsed, monitor)
+
+    assert vicare_cloud.api_calls == 0
+    assert not vicare_cloud.calls
+    assert all(
+        coordinator.last_update_success for coordinator in get_coordinators(hass, entry)
+    )
+    replayed = {state.entity_id: state.state for state in hass.states.async_all()}
+    assert replayed == recorded
+
+
+@pytest.mark.parametrize("vicare_cloud", [("heatpump",)], indirect=True)
+async def test_connection_reuse(hass, vicare_cloud, record_property):
+    """Test that refreshes reuse the pooled connection and get compressed data."""
+    entry = await setup_entry(hass)
+    (coordinator,) = get_coordinators(hass, entry)
+    stats = hass.data[DOMAIN][entry.entry_id][VICARE_SESSION].transport.stats
+    misses = stats.pool_misses
+
+    for _ in range(3):
+        await coordinator.async_refresh()
+
+    record_property("wire_bytes", stats.bytes_received)
+    record_property("decoded_bytes", stats.bytes_decoded)
+    assert stats.pool_misses == misses
+    assert stats.pool_hits >= 3
+    assert stats.bytes_received < stats.bytes_decoded / 2
+
+
+@pytest.mark.parametrize(
+    "vicare_cloud", [("gas", "heatpump", "fuelcell")], indirect=True
+)
+async def test_setup_with_latency(hass, vicare_cloud, record_property):
+    """Test that devices are fetched in parallel on a slow connection."""
+    vicare_cloud.latency = 0.2
+
+    monitor = LoopMonitor()
+    monitor.start()
+    start = time.perf_counter()
+    await setup_entry(hass)
+    elapsed = time.perf_counter() - start
+    await monitor.stop()
+
+    _report(record_property, "setup_latency", vicare_cloud, elapsed, monitor)
+
+    # Authorization, token and installations in sequence, then the snapshots
+    # of all devices at once
+    assert vicare_cloud.max_in_flight == len(vicare_cloud.devices)
@@ -0,0 +1,141 @@
+"""Test the capability manifests of ViCare devices."""
+from datetime import timedelta
+from unittest.mock import Mock
+
+from PyViCare.PyViCareUtils import PyViCareNotSupportedFeatureError
+
+from homeassistant.components.vicare.capabilities import (
+    SAVE_DELAY,
+    STORAGE_KEY,
+    ViCareCapabilityStore,
+    ViCareCapabilities,
+    async_load_capability_store,
+    feature_fingerprint,
+)
+from homeassistant.components.vicare.const import DOMAIN
+from homeassistant.helpers import device_registry
+import homeassistant.util.dt as dt_util
+
+from tests.common import MockConfigEntry, async_fire_time_changed
+
+FEATURES = [{"feature": "heating.boiler.temperature"}, {"feature": "heating.burner"}]
+
+
+def _unsupported():
+    raise PyViCareNotSupportedFeatureError("getBurnerActive")
+
+
+def test_probe_once():
+    """Test that an unsupported getter is probed once and skipped afterwards."""
+    on_change = Mock()
+    capabilities = ViCareCapabilities({}, on_change)
+    getter = Mock(side_effect=_unsupported)
+
+    assert capabilities.read("burner_active", getter) is None
+    assert capabilities.read("burner_active", getter) is None
+    assert getter.call_count == 1
+    assert not capabilities.supports("burner_active", getter)
+
+    # Supported getters are read every time
+    values = iter([45.0, 46.0])
+    assert capabilities.read("boiler_temperature", lambda: next(values)) == 45.0
+    assert capabilities.read("boiler_temperature", lambda: next(values)) == 46.0
+    assert on_change.call_count == 2
+    assert capabilities.as_dict()["capabilities"] == {
+        "burner_active": False,
+        "boiler_temperature": True,
+    }
+
+
+def test_rebuild_on_feature_change():
+    """Test that the manifest is kept for the same features and rebuilt otherwise."""
+    capabilities = ViCareCapabilities(
+        {
+            "fingerprint": feature_fingerprint(FEATURES),
+            "heating_type": "gas",
+            "capabilities": {"burner_active": False},
+        },
+        Mock(),
+    )
+    getter = Mock(return_value=True)
+
+    assert not capabilities.check_features(list(reversed(FEATURES)))
+    assert capabilities.read("burner_active", getter) is None
+    getter.assert_not_called()
+
+    assert capabilities.check_features(FEATURES + [{"feature": "heating.dhw"}])
+    assert capabilities.read("burner_active", getter) is True
+    getter.assert_called_once()
+    assert capabilities.heating_type == "gas"
+
+
+def test_rebuild_on_heating_type_change():
+    """Test that getters probed for another heating type are dropped."""
+    on_change = Mock()
+    capabilities = ViCareCapabilities(
+        {"heating_type": "gas", "capabilities": {"burner_active": False}}, on_change
+    )
+
+    capabilities.set_heating_type("gas")
+    on_change.assert_not_called()
+    assert capabilities.as_dict()["capabilities"] == {"burner_active": False}
+
+    capabilities.set_heating_type("heatpump")
+    on_change.assert_called_once()
+    assert capabilities.as_dict() == {
+        "fingerprint": None,
+        "heating_type": "heatpump",
+        "capabilities": {},
+    }
+
+
+async def test_persistence(hass, hass_storage):
+    """Test that manifests are saved and restored without probing again."""
+    hass_storage[STORAGE_KEY] = {
+        "version": 1,
+        "key": STORAGE_KEY,
+        "data": {
+            "kept": {"heating_type": "heatpump", "capabilities": {}},
+            "removed": {"heating_type": "heatpump", "capabilities": {}},
+        },
+    }
+    entry = MockConfigEntry(domain=DOMAIN)
+    entry.add_to_hass(hass)
+    device_registry.async_get(hass).async_get_or_create(
+        config_entry_id=entry.entry_id, identifiers={(DOMAIN, "kept")}
+    )
+    store = await async_load_capability_store(hass)
+    capabilities = store.get("1234")
+    capabilities.set_heating_type("gas")
+    capabilities.check_features(FEATURES)
+    capabilities.read("burner_active", _unsupported)
+
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=SAVE_DELAY))
+    await hass.async_block_till_done()
+    data = hass_storage[STORAGE_KEY]["data"]
+    assert data["1234"] == {
+        "fingerprint": feature_fingerprint(FEATURES),
+        "heating_type": "gas",
+        "capabilities": {"burner_active": False},
+    }
+    # Manifests of registered devices not set up yet are kept, others dropped
+    assert data["kept"] == {"heating_type": "heatpump", "capabilities": {}}
+    assert "removed" not in data
+
+    restored = (await async_load_capability_store(hass)).get("1234")
+    assert restored.heating_type == "gas"
+    assert not restored.check_features(FEATURES)
+    getter = Mock()
+    assert restored.read("burner_active", getter) is None
+    getter.assert_not_called()
+
+
+async def test_remove(hass, hass_storage):
+    """Test that the manifest of a removed device is dropped."""
+    store = ViCareCapabilityStore(hass)
+    store.get("1234").set_heating_type("gas")
+    store.async_remove("1234")
+
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=SAVE_DELAY))
+    await hass.async_block_till_done()
+    assert hass_storage[STORAGE_KEY]["data"] == {}
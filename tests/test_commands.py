@@ -0,0 +1,177 @@
+"""Test the command queue of ViCare."""
+from PyViCare.PyViCareUtils import PyViCareCommandError
+import pytest
+
+from homeassistant.components.climate.const import (
+    ATTR_HVAC_MODE,
+    ATTR_PRESET_MODE,
+    DOMAIN as CLIMATE_DOMAIN,
+    HVAC_MODE_HEAT,
+    PRESET_COMFORT,
+    PRESET_ECO,
+    SERVICE_SET_HVAC_MODE,
+    SERVICE_SET_PRESET_MODE,
+    SERVICE_SET_TEMPERATURE,
+)
+from homeassistant.components.vicare import commands
+from homeassistant.components.vicare.const import (
+    DOMAIN,
+    VICARE_COMMANDS,
+    VICARE_DEVICE_LIST,
+)
+from homeassistant.const import ATTR_ENTITY_ID, ATTR_TEMPERATURE
+
+from . import setup_entry
+
+ENTITY_ID = "climate.vicare_heating"
+PROGRAMS = "heating.circuits.0.operating.programs"
+NORMAL_PROGRAM = f"{PROGRAMS}.normal"
+DEBOUNCE = 0.1
+
+
+@pytest.fixture(autouse=True)
+def short_debounce(monkeypatch):
+    """Send the commands shortly after the last submission."""
+    monkeypatch.setattr(commands, "COMMAND_DEBOUNCE", DEBOUNCE)
+
+
+async def _async_call(hass, service, data):
+    """Call a climate service and wait until the command was confirmed."""
+    await hass.services.async_call(
+        CLIMATE_DOMAIN, service, {ATTR_ENTITY_ID: ENTITY_ID, **data}, blocking=True
+    )
+
+
+async def _async_submit(hass, service, data):
+    """Call a climate service without waiting for the command to be sent."""
+    await hass.services.async_call(
+        CLIMATE_DOMAIN, service, {ATTR_ENTITY_ID: ENTITY_ID, **data}
+    )
+
+
+def _get_queue(hass, entry):
+    (device,) = hass.data[DOMAIN][entry.entry_id][VICARE_DEVICE_LIST]
+    return device[VICARE_COMMANDS]
+
+
+async def test_burst_sends_last_value(hass, vicare_cloud):
+    """Test that a burst of setpoints is sent once with the last value."""
+    entry = await setup_entry(hass)
+    queue = _get_queue(hass, entry)
+    vicare_cloud.reset_calls()
+
+    for temperature in (19, 20, 23):
+        await _async_submit(
+            hass, SERVICE_SET_TEMPERATURE, {ATTR_TEMPERATURE: temperature}
+        )
+    await hass.async_block_till_done()
+
+    assert vicare_cloud.commands == [
+        (NORMAL_PROGRAM, "setTemperature", {"targetTemperature": 23})
+    ]
+    # Only the written feature is read back
+    assert vicare_cloud.calls["command"] == 1
+    assert vicare_cloud.calls["feature"] == 1
+    assert vicare_cloud.calls["features"] == 0
+    assert hass.states.get(ENTITY_ID).attributes[ATTR_TEMPERATURE] == 23
+
+    results = list(queue.results)
+    assert [result.merged for result in results] == [True, True, False]
+    assert {result.name for result in results} == {"circuit 0 temperature normal"}
+    # Every submission waited for the debounce, the earliest the longest
+    assert all(result.latency >= DEBOUNCE for result in results)
+    assert results[0].latency >= results[1].latency >= results[2].latency
+
+
+async def test_commands_sent_in_order(hass, vicare_cloud):
+    """Test that different commands of a circuit are sent in submission order."""
+    entry = await setup_entry(hass)
+    queue = _get_queue(hass, entry)
+    vicare_cloud.reset_calls()
+
+    await _async_submit(hass, SERVICE_SET_HVAC_MODE, {ATTR_HVAC_MODE: HVAC_MODE_HEAT})
+    await _async_submit(hass, SERVICE_SET_TEMPERATURE, {ATTR_TEMPERATURE: 22})
+    await hass.async_block_till_done()
+
+    assert vicare_cloud.commands == [
+        (
+            "heating.circuits.0.operating.modes.active",
+            "setMode",
+            {"mode": "forcedNormal"},
+        ),
+        (NORMAL_PROGRAM, "setTemperature", {"targetTemperature": 22}),
+    ]
+    assert vicare_cloud.calls["features"] == 0
+
+    state = hass.states.get(ENTITY_ID)
+    assert state.state == HVAC_MODE_HEAT
+    assert state.attributes[ATTR_TEMPERATURE] == 22
+    assert [(result.name, result.merged) for result in queue.results] == [
+        ("circuit 0 mode", False),
+        ("circuit 0 temperature normal", False),
+    ]
+
+
+async def test_preset_burst(hass, vicare_cloud):
+    """Test that presets changed twice before sending leave the device program."""
+    entry = await setup_entry(hass)
+    queue = _get_queue(hass, entry)
+    vicare_cloud.reset_calls()
+
+    for preset in (PRESET_COMFORT, PRESET_ECO):
+        await _async_submit(hass, SERVICE_SET_PRESET_MODE, {ATTR_PRESET_MODE: preset})
+    await hass.async_block_till_done()
+
+    # Comfort was never activated, so it is not deactivated either
+    assert vicare_cloud.commands == [(f"{PROGRAMS}.eco", "activate", {})]
+    assert hass.states.get(ENTITY_ID).attributes[ATTR_PRESET_MODE] == PRESET_ECO
+    assert [result.merged for result in queue.results] == [True, False]
+
+
+async def test_preset_switch(hass, vicare_cloud):
+    """Test that the preset program active on the device is deactivated."""
+    active = vicare_cloud.feature("0", f"{PROGRAMS}.active")
+    active["properties"]["value"]["value"] = "comfort"
+    comfort = vicare_cloud.feature("0", f"{PROGRAMS}.comfort")
+    comfort["properties"]["active"]["value"] = True
+    await setup_entry(hass)
+    vicare_cloud.reset_calls()
+
+    await _async_call(hass, SERVICE_SET_PRESET_MODE, {ATTR_PRESET_MODE: PRESET_ECO})
+
+    assert vicare_cloud.commands == [
+        (f"{PROGRAMS}.comfort", "deactivate", {}),
+        (f"{PROGRAMS}.eco", "activate", {}),
+    ]
+    assert hass.states.get(ENTITY_ID).attributes[ATTR_PRESET_MODE] == PRESET_ECO
+
+
+async def test_rejected_command_rolls_back(hass, vicare_cloud):
+    """Test that a rejected command restores the previous state."""
+    entry = await setup_entry(hass)
+    queue = _get_queue(hass, entry)
+    del vicare_cloud.feature("0", NORMAL_PROGRAM)["commands"]["setTemperature"]
+    vicare_cloud.reset_calls()
+
+    with pytest.raises(PyViCareCommandError):
+        await _async_call(hass, SERVICE_SET_TEMPERATURE, {ATTR_TEMPERATURE: 25})
+
+    assert hass.states.get(ENTITY_ID).attributes[ATTR_TEMPERATURE] == 21
+    # Nothing is read back after a failed command
+    assert vicare_cloud.calls["command"] == 1
+    assert vicare_cloud.calls["feature"] == 0
+    assert vicare_cloud.calls["features"] == 0
+    assert not queue.results
+
+
+async def test_set_temperature_without_program(hass, vicare_cloud):
+    """Test that no setpoint is sent while the active program is unknown."""
+    active = vicare_cloud.feature("0", "heating.circuits.0.operating.programs.active")
+    active["properties"] = {}
+    await setup_entry(hass)
+    vicare_cloud.reset_calls()
+
+    with pytest.raises(ValueError):
+        await _async_call(hass, SERVICE_SET_TEMPERATURE, {ATTR_TEMPERATURE: 22})
+
+    assert vicare_cloud.api_calls == 0
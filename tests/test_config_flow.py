@@ -5,7 +5,15 @@ from PyViCare.PyViCareUtils import PyViCareInvalidCredentialsError
 
 from homeassistant import config_entries, data_entry_flow, setup
 from homeassistant.components import dhcp
-from homeassistant.components.vicare.const import DOMAIN
+from homeassistant.components.vicare.const import (
+    CONF_MAX_SCAN_INTERVAL,
+    CONF_MAX_STALENESS,
+    CONF_MIN_SCAN_INTERVAL,
+    CONF_RECORD_TRAFFIC,
+    CONF_TRACE,
+    DEFAULT_MAX_STALENESS,
+    DOMAIN,
+)
 from homeassistant.const import CONF_CLIENT_ID, CONF_PASSWORD, CONF_USERNAME
 
 from . import ENTRY_CONFIG, MOCK_MAC
@@ -23,7 +31,7 @@ async def test_form(hass):
     assert len(result["errors"]) == 0
 
     with patch(
-        "homeassistant.components.vicare.config_flow.ConfigFlow.vicare_login",
+        "homeassistant.components.vicare.session.vicare_login",
         return_value=None,
     ), patch(
         "homeassistant.components.vicare.async_setup_entry",
@@ -85,7 +93,7 @@ async def test_invalid_login(hass) -> None:
     )
 
     with patch(
-        "homeassistant.components.vicare.config_flow.ConfigFlow.vicare_login",
+        "homeassistant.components.vicare.session.vicare_login",
         side_effect=PyViCareInvalidCredentialsError,
     ):
         result2 = await hass.config_entries.flow.async_configure(
@@ -121,7 +129,7 @@ async def test_form_dhcp(hass):
     assert result["errors"] == {}
 
     with patch(
-        "homeassistant.components.vicare.config_flow.ConfigFlow.vicare_login",
+        "homeassistant.components.vicare.session.vicare_login",
         return_value=None,
     ), patch(
         "homeassistant.components.vicare.async_setup_entry",
@@ -185,12 +193,12 @@ async def test_import_single_instance_allowed(hass):
     assert result["reason"] == "already_configured"
 
 
-async def test_user_input_single_instance_allowed(hass):
-    """Test that configuring more than one instance is rejected."""
+async def test_user_input_second_account(hass):
+    """Test that another account can be added next to a configured one."""
     await setup.async_setup_component(hass, "persistent_notification", {})
     mock_entry = MockConfigEntry(
         domain=DOMAIN,
-        unique_id="ViCare",
+        unique_id="foo@bar.com",
         data=ENTRY_CONFIG,
     )
     mock_entry.add_to_hass(hass)
@@ -198,5 +206,108 @@ async def test_user_input_single_instance_allowed(hass):
     result = await hass.config_entries.flow.async_init(
         DOMAIN, context={"source": config_entries.SOURCE_USER}
     )
-    assert result["type"] == data_entry_flow.RESULT_TYPE_ABORT
-    assert result["reason"] == "single_instance_allowed"
+    assert result["type"] == data_entry_flow.RESULT_TYPE_FORM
+
+    with patch(
+        "homeassistant.components.vicare.session.vicare_login",
+        return_value=None,
+    ), patch(
+        "homeassistant.components.vicare.async_setup_entry",
+        return_value=True,
+    ) as mock_setup_entry:
+        result2 = await hass.config_entries.flow.async_configure(
+            result["flow_id"],
+            {
+                CONF_USERNAME: "other@bar.com",
+                CONF_PASSWORD: "1234",
+                CONF_CLIENT_ID: "5678",
+            },
+        )
+        await hass.async_block_till_done()
+
+    assert result2["type"] == data_entry_flow.RESULT_TYPE_CREATE_ENTRY
+    assert result2["result"].unique_id == "other@bar.com"
+    assert len(mock_setup_entry.mock_calls) == 1
+
+
+async def test_user_input_already_configured(hass):
+    """Test that configuring the same account twice is rejected."""
+    await setup.async_setup_component(hass, "persistent_notification", {})
+    mock_entry = MockConfigEntry(
+        domain=DOMAIN,
+        unique_id="foo@bar.com",
+        data=ENTRY_CONFIG,
+    )
+    mock_entry.add_to_hass(hass)
+
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": config_entries.SOURCE_USER}
+    )
+
+    with patch(
+        "homeassistant.components.vicare.session.vicare_login",
+        return_value=None,
+    ) as mock_login:
+        result2 = await hass.config_entries.flow.async_configure(
+            result["flow_id"],
+            {
+                CONF_USERNAME: "foo@bar.com",
+                CONF_PASSWORD: "1234",
+                CONF_CLIENT_ID: "5678",
+            },
+        )
+
+    assert result2["type"] == data_entry_flow.RESULT_TYPE_ABORT
+    assert result2["reason"] == "already_configured"
+    assert len(mock_login.mock_calls) == 0
+
+
+async def test_options_flow(hass):
+    """Test that the poll intervals can be changed."""
+    mock_entry = MockConfigEntry(
+        domain=DOMAIN,
+        unique_id="ViCare",
+        data=ENTRY_CONFIG,
+    )
+    mock_entry.add_to_hass(hass)
+
+    with patch(
+        "homeassistant.components.vicare.async_setup_entry",
+        return_value=True,
+    ):
+        result = await hass.config_entries.options.async_init(mock_entry.entry_id)
+        assert result["type"] == data_entry_flow.RESULT_TYPE_FORM
+        assert result["step_id"] == "init"
+
+        result2 = await hass.config_entries.options.async_configure(
+            result["flow_id"],
+            {CONF_MIN_SCAN_INTERVAL: 600, CONF_MAX_SCAN_INTERVAL: 60},
+        )
+        assert result2["type"] == data_entry_flow.RESULT_TYPE_FORM
+        assert result2["errors"] == {"base": "invalid_interval"}
+
+        result3 = await hass.config_entries.options.async_configure(
+            result["flow_id"],
+            {
+                CONF_MIN_SCAN_INTERVAL: 60,
+                CONF_MAX_SCAN_INTERVAL: 600,
+                CONF_MAX_STALENESS: 300,
+            },
+        )
+        assert result3["type"] == data_entry_flow.RESULT_TYPE_FORM
+        assert result3["errors"] == {"base": "invalid_staleness"}
+
+        result3 = await hass.config_entries.options.async_configure(
+            result["flow_id"],
+            {CONF_MIN_SCAN_INTERVAL: 60, CONF_MAX_SCAN_INTERVAL: 600},
+        )
+        await hass.async_block_till_done()
+
+    assert result3["type"] == data_entry_flow.RESULT_TYPE_CREATE_ENTRY
+    assert mock_entry.options == {
+        CONF_MIN_SCAN_INTERVAL: 60,
+        CONF_MAX_SCAN_INTERVAL: 600,
+        CONF_MAX_STALENESS: DEFAULT_MAX_STALENESS,
+        CONF_RECORD_TRAFFIC: False,
+        CONF_TRACE: False,
+    }
@@ -0,0 +1,65 @@
+"""Test the refresh tiers of the ViCare coordinator."""
+from datetime import timedelta
+from unittest.mock import patch
+
+from homeassistant.components.vicare.const import RefreshTier
+import homeassistant.util.dt as dt_util
+
+from . import get_coordinators, setup_entry
+
+DHW_GAS_TODAY = "sensor.vicare_hot_water_gas_consumption_today"
+
+
+def _due_tiers(coordinator):
+    return {tier for tier in RefreshTier if coordinator.tier_due(tier)}
+
+
+async def _async_refresh_at(hass, coordinator, now):
+    with patch("homeassistant.util.dt.utcnow", return_value=now):
+        await coordinator.async_refresh()
+        await hass.async_block_till_done()
+
+
+async def test_tier_due(hass, vicare_cloud):
+    """Test that slow tiers are due once their interval has passed."""
+    entry = await setup_entry(hass)
+    (coordinator,) = get_coordinators(hass, entry)
+    start = dt_util.utcnow()
+    assert _due_tiers(coordinator) == set(RefreshTier)
+
+    await _async_refresh_at(hass, coordinator, start + timedelta(minutes=1))
+    assert _due_tiers(coordinator) == {RefreshTier.realtime}
+
+    await _async_refresh_at(hass, coordinator, start + timedelta(minutes=61))
+    assert _due_tiers(coordinator) == {RefreshTier.realtime, RefreshTier.hourly}
+
+    await _async_refresh_at(hass, coordinator, start + timedelta(minutes=62))
+    assert _due_tiers(coordinator) == {RefreshTier.realtime}
+
+
+async def test_tier_due_on_new_features(hass, vicare_cloud):
+    """Test that every tier is due when the feature list changed."""
+    entry = await setup_entry(hass)
+    (coordinator,) = get_coordinators(hass, entry)
+    await coordinator.async_refresh()
+    assert _due_tiers(coordinator) == {RefreshTier.realtime}
+
+    vicare_cloud.devices["0"]["features"].append(
+        {"feature": "heating.test", "properties": {}, "commands": {}}
+    )
+    await coordinator.async_refresh()
+    assert _due_tiers(coordinator) == set(RefreshTier)
+
+
+async def test_counters_read_every_refresh(hass, vicare_cloud):
+    """Test that slow changing counters are read from every snapshot."""
+    entry = await setup_entry(hass)
+    (coordinator,) = get_coordinators(hass, entry)
+    assert hass.states.get(DHW_GAS_TODAY).state == "0.8"
+
+    # Like the reset at midnight
+    dhw = vicare_cloud.feature("0", "heating.gas.consumption.dhw")
+    dhw["properties"]["day"]["value"][0] = 0.0
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+    assert hass.states.get(DHW_GAS_TODAY).state == "0.0"
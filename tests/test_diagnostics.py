@@ -0,0 +1,39 @@
+"""Test the diagnostics and metrics of ViCare."""
+import asyncio
+
+from homeassistant.components.vicare.const import DOMAIN
+from homeassistant.components.vicare.diagnostics import (
+    async_get_config_entry_diagnostics,
+)
+from homeassistant.const import CONF_USERNAME
+from homeassistant.helpers import entity_registry as er
+
+from . import get_coordinators, setup_entry
+
+
+async def test_metrics(hass, vicare_cloud):
+    """Test that requests and entity updates are measured."""
+    entry = await setup_entry(hass)
+    await asyncio.gather(
+        *(coordinator.async_refresh() for coordinator in get_coordinators(hass, entry))
+    )
+    await hass.async_block_till_done()
+
+    diagnostics = await async_get_config_entry_diagnostics(hass, entry)
+    assert diagnostics["entry"]["data"][CONF_USERNAME] == "**REDACTED**"
+    metrics = diagnostics["metrics"]
+    # The installation lookup during login goes through PyViCare
+    assert vicare_cloud.calls["features"] == 2
+    assert metrics["requests_last_hour"] == 2
+    assert metrics["fetch_latency"]["count"] == 2
+    assert metrics["payload_size"]["count"] == 2
+    assert metrics["token_latency"]["count"] == 1
+    assert 0 < metrics["snapshot_hit_ratio"] <= 100
+    assert metrics["entity_updates"]["sensor"]["count"] > 0
+    assert diagnostics["devices"][0]["last_update_success"]
+
+    registry = er.async_get(hass)
+    entity_id = registry.async_get_entity_id(
+        "sensor", DOMAIN, f"{entry.unique_id}-api_calls_per_hour"
+    )
+    assert registry.async_get(entity_id).disabled
@@ -0,0 +1,391 @@
+"""Test the setup, polling and token handling of ViCare."""
+import asyncio
+import copy
+from datetime import timedelta
+import threading
+from unittest.mock import patch
+
+from PyViCare.PyViCareUtils import PyViCareInternalServerError
+import pytest
+
+from homeassistant.components.vicare import session as vicare_session
+from homeassistant.components.vicare.breaker import FAILURE_THRESHOLD, BreakerState
+from homeassistant.components.vicare.const import (
+    ATTR_DATA_AGE,
+    ATTR_LAST_SUCCESSFUL_REFRESH,
+    ATTR_STALE,
+    CONF_MAX_STALENESS,
+    DOMAIN,
+    VICARE_SESSION,
+)
+from homeassistant.components.vicare.snapshot import compact_features
+from homeassistant.const import CONF_SCAN_INTERVAL, CONF_USERNAME, STATE_UNAVAILABLE
+from homeassistant.helpers.update_coordinator import UpdateFailed
+import homeassistant.util.dt as dt_util
+
+from . import ENTRY_CONFIG, get_coordinators, setup_entry
+from .cloud_server import GATEWAY_SERIAL
+
+from tests.common import MockConfigEntry, async_fire_time_changed
+
+TOKEN_STORAGE_KEY = f"{DOMAIN}.token.foo_bar_com"
+SNAPSHOT_STORAGE_KEY = f"{DOMAIN}.snapshot.{GATEWAY_SERIAL}"
+OUTSIDE_TEMPERATURE = "sensor.vicare_outside_temperature"
+
+
+async def test_rate_limit(hass, vicare_cloud):
+    """Test that polling pauses after a rate limit response."""
+    entry = await setup_entry(hass)
+    (coordinator,) = get_coordinators(hass, entry)
+
+    vicare_cloud.rate_limit()
+    vicare_cloud.reset_calls()
+    await coordinator.async_refresh()
+    assert not coordinator.last_update_success
+    assert vicare_cloud.calls["rate_limited"] == 1
+
+    # No further requests until the reported reset time
+    await coordinator.async_refresh()
+    assert vicare_cloud.api_calls == 1
+    assert coordinator.update_interval.total_seconds() > 3000
+
+
+@pytest.mark.parametrize("vicare_cloud", [("gas", "heatpump")], indirect=True)
+async def test_quota_counts_sent_requests(hass, vicare_cloud):
+    """Test that every request sent counts against the quota, and only those."""
+    entry = await setup_entry(hass)
+    governor = hass.data[DOMAIN][entry.entry_id][VICARE_SESSION].governor
+    # Authorization, token, installations and a snapshot per device
+    assert governor.used == sum(vicare_cloud.calls.values()) == 5
+
+    # The rejected request, the token renewal and the retry all count
+    vicare_cloud.expire_tokens()
+    await get_coordinators(hass, entry)[0].async_refresh()
+    assert governor.used == sum(vicare_cloud.calls.values()) == 9
+
+
+async def test_server_error(hass, vicare_cloud, caplog):
+    """Test that a server error fails the refresh like any other cloud error."""
+    entry = await setup_entry(hass)
+    (coordinator,) = get_coordinators(hass, entry)
+
+    vicare_cloud.server_error = 500
+    await coordinator.async_refresh()
+    assert not coordinator.last_update_success
+    assert isinstance(coordinator.last_exception, UpdateFailed)
+    assert "Unexpected error" not in caplog.text
+
+    vicare_cloud.server_error = None
+    await coordinator.async_refresh()
+    assert coordinator.last_update_success
+
+
+async def test_outage(hass, vicare_cloud):
+    """Test that entities serve stale data during an outage and recover."""
+    entry = await setup_entry(hass, options={CONF_MAX_STALENESS: 120})
+    (coordinator,) = get_coordinators(hass, entry)
+    entity_id = "sensor.vicare_outside_temperature"
+    state = hass.states.get(entity_id)
+    assert state.state == "7.3"
+    assert ATTR_DATA_AGE not in state.attributes
+
+    vicare_cloud.outage = True
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+    assert not coordinator.last_update_success
+    state = hass.states.get(entity_id)
+    assert state.state == "7.3"
+    assert state.attributes[ATTR_STALE]
+    assert state.attributes[ATTR_DATA_AGE] >= 0
+    assert (
+        state.attributes[ATTR_LAST_SUCCESSFUL_REFRESH]
+        == coordinator.last_successful_refresh
+    )
+
+    # Unavailable once the snapshot is older than the maximum staleness
+    expired = coordinator.last_successful_refresh + timedelta(seconds=121)
+    with patch("homeassistant.util.dt.utcnow", return_value=expired):
+        async_fire_time_changed(hass, expired)
+        await hass.async_block_till_done()
+    assert hass.states.get(entity_id).state == STATE_UNAVAILABLE
+
+    vicare_cloud.outage = False
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+    assert coordinator.last_update_success
+    state = hass.states.get(entity_id)
+    assert state.state == "7.3"
+    assert ATTR_STALE not in state.attributes
+
+
+@pytest.mark.parametrize("outage", ["unreachable", "gateway_error"])
+async def test_circuit_breaker(hass, vicare_cloud, outage):
+    """Test that requests are held back during an outage until a probe succeeds."""
+    entry = await setup_entry(hass)
+    (coordinator,) = get_coordinators(hass, entry)
+    session = hass.data[DOMAIN][entry.entry_id][VICARE_SESSION]
+    breaker = session.breaker
+
+    if outage == "unreachable":
+        vicare_cloud.outage = True
+    else:
+        vicare_cloud.server_error = 502
+        vicare_cloud.error_page = True
+    for _ in range(FAILURE_THRESHOLD):
+        await coordinator.async_refresh()
+    assert breaker.state is BreakerState.open
+
+    # Nothing is sent and no quota is used while the breaker is open
+    vicare_cloud.outage = False
+    vicare_cloud.server_error = None
+    vicare_cloud.reset_calls()
+    used = session.governor.used
+    await coordinator.async_refresh()
+    assert not coordinator.last_update_success
+    assert vicare_cloud.api_calls == 0
+    assert session.governor.used == used
+    assert breaker.short_circuited == 1
+
+    # The first request after the backoff probes and closes the breaker
+    with patch(
+        "homeassistant.util.dt.utcnow",
+        return_value=breaker.retry_at + timedelta(seconds=1),
+    ):
+        await coordinator.async_refresh()
+    assert coordinator.last_update_success
+    assert vicare_cloud.api_calls == 1
+    assert breaker.state is BreakerState.closed
+
+
+async def test_circuit_breaker_counts_failed_writes(hass, vicare_cloud):
+    """Test that a write answered by a gateway error page counts as a failure."""
+    entry = await setup_entry(hass)
+    session = hass.data[DOMAIN][entry.entry_id][VICARE_SESSION]
+
+    vicare_cloud.server_error = 503
+    vicare_cloud.error_page = True
+    with pytest.raises(PyViCareInternalServerError):
+        await session.async_post(
+            "/equipment/installations/1/gateways/2/devices/0/features/"
+            "heating.circuits.0.operating.modes.active/commands/setMode",
+            '{"mode": "standby"}',
+        )
+    assert session.breaker.failures == 1
+
+
+@pytest.mark.parametrize(
+    "vicare_cloud", [("gas", "heatpump", "fuelcell")], indirect=True
+)
+async def test_token_renewal(hass, vicare_cloud):
+    """Test that an expired token is renewed once for all devices."""
+    entry = await setup_entry(hass)
+    coordinators = get_coordinators(hass, entry)
+
+    vicare_cloud.expire_tokens()
+    vicare_cloud.reset_calls()
+    await asyncio.gather(*(coordinator.async_refresh() for coordinator in coordinators))
+
+    assert all(coordinator.last_update_success for coordinator in coordinators)
+    assert vicare_cloud.calls["oauth_token"] == 1
+    assert vicare_cloud.calls["features"] == len(coordinators)
+
+
+async def test_proactive_token_refresh(hass, hass_storage, vicare_cloud):
+    """Test that the token is renewed and stored before it expires."""
+    entry = await setup_entry(hass)
+    coordinators = get_coordinators(hass, entry)
+    token = hass_storage[TOKEN_STORAGE_KEY]["data"]["access_token"]
+
+    vicare_cloud.reset_calls()
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(minutes=56))
+    await hass.async_block_till_done()
+    assert vicare_cloud.calls["oauth_token"] == 1
+    assert hass_storage[TOKEN_STORAGE_KEY]["data"]["access_token"] != token
+
+    vicare_cloud.reset_calls()
+    await asyncio.gather(*(coordinator.async_refresh() for coordinator in coordinators))
+    assert all(coordinator.last_update_success for coordinator in coordinators)
+    assert vicare_cloud.calls["expired_token"] == 0
+
+
+@pytest.mark.parametrize(
+    "error,message",
+    [
+        (ValueError("not json"), "Unable to renew the ViCare access token"),
+        (RuntimeError("boom"), "Unexpected error renewing the ViCare access token"),
+    ],
+)
+async def test_proactive_token_refresh_error(
+    hass, vicare_cloud, caplog, error, message
+):
+    """Test that a failed background renewal is logged instead of raised."""
+    await setup_entry(hass)
+
+    with patch(
+        "homeassistant.components.vicare.auth.ViCareTokenManager._async_login",
+        side_effect=error,
+    ):
+        async_fire_time_changed(hass, dt_util.utcnow() + timedelta(minutes=56))
+        await hass.async_block_till_done()
+    assert message in caplog.text
+
+
+async def test_token_refresh_stops_on_unload(hass, vicare_cloud):
+    """Test that the token of an unloaded entry is not renewed."""
+    entry = await setup_entry(hass)
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+
+    vicare_cloud.reset_calls()
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(minutes=56))
+    await hass.async_block_till_done()
+    assert vicare_cloud.calls["oauth_token"] == 0
+
+    # Loading the entry again reuses the session and renews its token again
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    assert vicare_cloud.calls["oauth_token"] == 0
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(minutes=56))
+    await hass.async_block_till_done()
+    assert vicare_cloud.calls["oauth_token"] == 1
+
+
+async def test_stored_token(hass, hass_storage, vicare_cloud):
+    """Test that a stored token is used without logging in."""
+    hass_storage[TOKEN_STORAGE_KEY] = {
+        "version": 1,
+        "key": TOKEN_STORAGE_KEY,
+        "data": {
+            "access_token": vicare_cloud.issue_token(),
+            "expires_at": (dt_util.utcnow() + timedelta(minutes=30)).isoformat(),
+        },
+    }
+    entry = await setup_entry(hass)
+    coordinators = get_coordinators(hass, entry)
+
+    assert vicare_cloud.calls["oauth_token"] == 0
+    assert all(coordinator.last_update_success for coordinator in coordinators)
+    # Only the installation lookup and the snapshot were sent
+    governor = hass.data[DOMAIN][entry.entry_id][VICARE_SESSION].governor
+    assert governor.used == vicare_cloud.api_calls == 2
+
+
+async def test_multiple_accounts(hass, vicare_cloud):
+    """Test that accounts keep their own session and poll in separate slots."""
+    first = MockConfigEntry(
+        domain=DOMAIN,
+        unique_id="foo@bar.com",
+        data=ENTRY_CONFIG,
+    )
+    second = MockConfigEntry(
+        domain=DOMAIN,
+        unique_id="other@bar.com",
+        data={**ENTRY_CONFIG, CONF_USERNAME: "other@bar.com"},
+    )
+    first.add_to_hass(hass)
+    second.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(first.entry_id)
+    assert await hass.config_entries.async_setup(second.entry_id)
+    await hass.async_block_till_done()
+
+    sessions = [
+        hass.data[DOMAIN][entry.entry_id][VICARE_SESSION] for entry in (first, second)
+    ]
+    assert sessions[0] is not sessions[1]
+    assert vicare_cloud.calls["installations"] == 2
+
+    (first_coordinator,) = get_coordinators(hass, first)
+    (second_coordinator,) = get_coordinators(hass, second)
+    # The second account polls half an interval after the first one
+    offset = second_coordinator.update_interval - first_coordinator.update_interval
+    assert offset.total_seconds() == ENTRY_CONFIG[CONF_SCAN_INTERVAL] / 2
+
+    # Unloading one account leaves the other one running
+    assert await hass.config_entries.async_unload(first.entry_id)
+    assert second.entry_id in hass.data[DOMAIN]
+
+
+async def test_slow_login_does_not_block_other_accounts(hass, vicare_cloud):
+    """Test that a hanging login holds back only its own account."""
+    registry = vicare_session.async_get_session_registry(hass)
+    other = {**ENTRY_CONFIG, CONF_USERNAME: "other@bar.com"}
+    release = threading.Event()
+    login = vicare_session.vicare_login
+
+    def _slow_login(token_manager):
+        if token_manager.username == ENTRY_CONFIG[CONF_USERNAME]:
+            release.wait(10)
+        return login(token_manager)
+
+    with patch.object(vicare_session, "vicare_login", _slow_login):
+        first = hass.async_create_task(registry.async_get(ENTRY_CONFIG))
+        try:
+            await registry.async_get(other)
+            assert not first.done()
+        finally:
+            release.set()
+        await first
+
+    registry.async_remove(ENTRY_CONFIG)
+    registry.async_remove(other)
+
+
+def _store_snapshot(hass_storage, vicare_cloud, age, outside_temperature):
+    """Store the served features as a snapshot fetched `age` ago."""
+    features = copy.deepcopy(vicare_cloud.devices["0"]["features"])
+    for feature in features:
+        if feature["feature"] == "heating.sensors.temperature.outside":
+            feature["properties"]["value"]["value"] = outside_temperature
+    hass_storage[SNAPSHOT_STORAGE_KEY] = {
+        "version": 1,
+        "key": SNAPSHOT_STORAGE_KEY,
+        "data": {
+            "fetched": (dt_util.utcnow() - age).isoformat(),
+            "features": compact_features(features),
+        },
+    }
+
+
+async def test_stored_snapshot(hass, hass_storage, vicare_cloud):
+    """Test that entities start from a stored snapshot without fetching one."""
+    _store_snapshot(hass_storage, vicare_cloud, timedelta(minutes=10), 4.2)
+    entry = await setup_entry(hass)
+    (coordinator,) = get_coordinators(hass, entry)
+
+    assert vicare_cloud.calls["features"] == 0
+    assert coordinator.restored
+    state = hass.states.get(OUTSIDE_TEMPERATURE)
+    assert state.state == "4.2"
+    assert state.attributes[ATTR_STALE]
+    assert state.attributes[ATTR_DATA_AGE] >= 600
+
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+    assert vicare_cloud.calls["features"] == 1
+    assert not coordinator.restored
+    state = hass.states.get(OUTSIDE_TEMPERATURE)
+    assert state.state == "7.3"
+    assert ATTR_STALE not in state.attributes
+
+
+async def test_expired_snapshot(hass, hass_storage, vicare_cloud):
+    """Test that a snapshot older than the maximum staleness is not restored."""
+    # Home Assistant was down for longer than the default staleness of an hour
+    _store_snapshot(hass_storage, vicare_cloud, timedelta(hours=2), 4.2)
+    entry = await setup_entry(hass)
+    (coordinator,) = get_coordinators(hass, entry)
+
+    assert vicare_cloud.calls["features"] == 1
+    assert not coordinator.restored
+    assert hass.states.get(OUTSIDE_TEMPERATURE).state == "7.3"
+
+
+async def test_old_snapshot_within_staleness(hass, hass_storage, vicare_cloud):
+    """Test that the maximum staleness decides how old a restored snapshot may be."""
+    _store_snapshot(hass_storage, vicare_cloud, timedelta(hours=2), 4.2)
+    entry = await setup_entry(hass, options={CONF_MAX_STALENESS: 3 * 3600})
+    (coordinator,) = get_coordinators(hass, entry)
+
+    assert vicare_cloud.calls["features"] == 0
+    assert coordinator.restored
+    assert hass.states.get(OUTSIDE_TEMPERATURE).state == "4.2"
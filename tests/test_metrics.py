@@ -0,0 +1,44 @@
+"""Test the rolling metrics of ViCare."""
+from unittest.mock import patch
+
+from homeassistant.components.vicare.metrics import (
+    MAX_SAMPLES,
+    RollingCounter,
+    RollingHistogram,
+)
+
+EVENTS = 100000
+
+
+def test_counter_drops_old_events():
+    """Test that recording without reading keeps only the window."""
+    counter = RollingCounter(window=60)
+    with patch("homeassistant.components.vicare.metrics.time.monotonic") as now:
+        for index in range(EVENTS):
+            # Ten events a second
+            now.return_value = index / 10
+            counter.record()
+        assert len(counter._seconds) <= 61
+        assert counter.total == EVENTS
+        assert 600 <= counter.count <= 610
+
+
+def test_histogram_drops_old_samples():
+    """Test that recording without reading keeps only the window."""
+    histogram = RollingHistogram(window=60)
+    with patch("homeassistant.components.vicare.metrics.time.monotonic") as now:
+        for index in range(EVENTS):
+            now.return_value = index / 10
+            histogram.record(index)
+        assert len(histogram._samples) <= 601
+        assert histogram.values()[-1] == EVENTS - 1
+
+
+def test_histogram_caps_samples():
+    """Test that a burst within the window keeps the newest samples."""
+    histogram = RollingHistogram()
+    for index in range(EVENTS):
+        histogram.record(index)
+    values = histogram.values()
+    assert len(values) == MAX_SAMPLES
+    assert values[-1] == EVENTS - 1
@@ -0,0 +1,138 @@
+"""Test the adaptive poll intervals of ViCare."""
+from datetime import timedelta
+from unittest.mock import Mock
+
+import pytest
+
+from homeassistant.components.vicare.capabilities import ViCareCapabilities
+from homeassistant.components.vicare.polling import ViCarePollScheduler
+from homeassistant.components.vicare.quota import QUOTA_RESERVE, ViCareQuotaGovernor
+from homeassistant.components.vicare.topology import ViCareTopology
+
+MIN_INTERVAL = timedelta(minutes=1)
+MAX_INTERVAL = timedelta(minutes=10)
+
+
+class Device:
+    """Device with a single burner and heating circuit."""
+
+    def __init__(self):
+        """Initialize an idle device."""
+        self.burner_active = False
+        self.program = "normal"
+        self.boiler_temperature = 45.0
+        self.supply_temperature = 35.0
+
+    def getBoilerTemperature(self):
+        """Return the boiler temperature."""
+        if self.boiler_temperature is None:
+            raise ValueError("Unable to decode")
+        return self.boiler_temperature
+
+
+class Burner:
+    """Burner of a device."""
+
+    component = "0"
+
+    def __init__(self, device):
+        """Initialize the burner."""
+        self._device = device
+
+    def getActive(self):
+        """Return True while the burner runs."""
+        return self._device.burner_active
+
+
+class Circuit:
+    """Heating circuit of a device."""
+
+    component = "0"
+
+    def __init__(self, device):
+        """Initialize the circuit."""
+        self._device = device
+
+    def getActiveProgram(self):
+        """Return the active program."""
+        return self._device.program
+
+    def getSupplyTemperature(self):
+        """Return the supply temperature."""
+        return self._device.supply_temperature
+
+
+@pytest.fixture
+def device():
+    """Return an idle device."""
+    return Device()
+
+
+@pytest.fixture
+def scheduler():
+    """Return a scheduler polling between one and ten minutes."""
+    return ViCarePollScheduler(MIN_INTERVAL, MAX_INTERVAL)
+
+
+def _update(scheduler, device):
+    topology = ViCareTopology(
+        device, circuits=(Circuit(device),), burners=(Burner(device),)
+    )
+    return scheduler.update(topology, ViCareCapabilities({}, Mock()))
+
+
+def test_backoff(scheduler, device):
+    """Test that the interval doubles while idle, up to the maximum."""
+    assert scheduler.interval == MIN_INTERVAL
+    intervals = [_update(scheduler, device) for _ in range(6)]
+    assert intervals == [timedelta(minutes=minutes) for minutes in (1, 2, 4, 8, 10, 10)]
+    assert scheduler.interval == MAX_INTERVAL
+
+
+@pytest.mark.parametrize(
+    "activity",
+    [
+        {"burner_active": True},
+        {"program": "comfort"},
+        {"boiler_temperature": 45.5},
+        {"supply_temperature": 34.0},
+        {"supply_temperature": None},
+    ],
+)
+def test_recovery(scheduler, device, activity):
+    """Test that any activity drops the interval back to the minimum."""
+    for _ in range(4):
+        _update(scheduler, device)
+    assert scheduler.interval == timedelta(minutes=8)
+
+    for attr, value in activity.items():
+        setattr(device, attr, value)
+    assert _update(scheduler, device) == MIN_INTERVAL
+
+
+def test_small_temperature_change(scheduler, device):
+    """Test that temperatures moving below the threshold count as idle."""
+    _update(scheduler, device)
+    device.boiler_temperature += 0.2
+    device.supply_temperature -= 0.2
+    assert _update(scheduler, device) == timedelta(minutes=2)
+
+
+def test_unreadable_activity(scheduler, device):
+    """Test that the interval is kept when the activity cannot be read."""
+    for _ in range(3):
+        _update(scheduler, device)
+    device.boiler_temperature = None
+    assert _update(scheduler, device) == timedelta(minutes=4)
+
+
+def test_quota_floor(scheduler, device):
+    """Test that the quota stretches intervals below its floor, not above."""
+    governor = ViCareQuotaGovernor(daily_quota=1440)
+    governor.pollers = 2
+    floor = timedelta(days=1) * governor.pollers / (1440 * (1 - QUOTA_RESERVE))
+
+    assert governor.poll_interval(_update(scheduler, device)) == floor
+    for _ in range(3):
+        _update(scheduler, device)
+    assert governor.poll_interval(scheduler.interval) == timedelta(minutes=8)
@@ -0,0 +1,67 @@
+"""Test the profiling service of ViCare."""
+import asyncio
+import glob
+import os
+
+from homeassistant.components.vicare.const import DOMAIN
+
+from . import get_coordinators, setup_entry
+
+
+async def test_capture_profile(hass, vicare_cloud):
+    """Test that the profiling service captures the next refresh cycle."""
+    entry = await setup_entry(hass)
+    capture = hass.async_create_task(
+        hass.services.async_call(
+            DOMAIN, "capture_profile", {"cycles": 1}, blocking=True
+        )
+    )
+    for _ in range(50):
+        if capture.done():
+            break
+        await asyncio.gather(
+            *(
+                coordinator.async_refresh()
+                for coordinator in get_coordinators(hass, entry)
+            )
+        )
+        await asyncio.sleep(0.01)
+    await capture
+
+    paths = glob.glob(hass.config.path("vicare_profile_*"))
+    try:
+        assert len(paths) == 2
+        (text,) = (path for path in paths if path.endswith(".txt"))
+        with open(text, encoding="utf-8") as file:
+            report = file.read()
+    finally:
+        for path in paths:
+            os.remove(path)
+    assert report.startswith("ViCare profile of 1 refresh cycles")
+    assert "Top allocation sites" in report
+
+
+async def test_capture_counts_refreshes_only(hass, vicare_cloud):
+    """Test that notifications without a refresh do not end the capture."""
+    entry = await setup_entry(hass)
+    capture = hass.async_create_task(
+        hass.services.async_call(
+            DOMAIN, "capture_profile", {"cycles": 1}, blocking=True
+        )
+    )
+    await asyncio.sleep(0.01)
+    for coordinator in get_coordinators(hass, entry):
+        # Like a snapshot patched after a command or expiring
+        coordinator.async_update_listeners()
+    await asyncio.sleep(0.01)
+    assert not capture.done()
+
+    await asyncio.gather(
+        *(coordinator.async_refresh() for coordinator in get_coordinators(hass, entry))
+    )
+    await capture
+
+    paths = glob.glob(hass.config.path("vicare_profile_*"))
+    for path in paths:
+        os.remove(path)
+    assert len(paths) == 2
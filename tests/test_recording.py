@@ -0,0 +1,110 @@
+"""Test the recording of ViCare API traffic."""
+import json
+import os
+
+from homeassistant.components.vicare import recording
+from homeassistant.components.vicare.const import CONF_RECORD_TRAFFIC
+from homeassistant.components.vicare.recording import (
+    INSTALLATIONS_URL,
+    load_recording,
+    recording_file_name,
+    redact,
+)
+
+from . import ENTRY_CONFIG, get_coordinators, setup_entry
+from .cloud_server import GATEWAY_SERIAL, INSTALLATION_ID
+
+FEATURES_URL = (
+    f"/equipment/installations/{INSTALLATION_ID}/gateways/{GATEWAY_SERIAL}"
+    "/devices/0/features/"
+)
+
+
+def test_redact():
+    """Test that ids and serials are replaced consistently wherever they appear."""
+    text = json.dumps(
+        {
+            "url": FEATURES_URL,
+            "response": {
+                "data": [
+                    {
+                        "id": INSTALLATION_ID,
+                        "gateways": [
+                            {
+                                "serial": GATEWAY_SERIAL,
+                                "installationId": INSTALLATION_ID,
+                            }
+                        ],
+                    }
+                ]
+            },
+        }
+    )
+
+    redacted = redact(text)
+    assert str(INSTALLATION_ID) not in redacted
+    assert GATEWAY_SERIAL not in redacted
+
+    data = json.loads(redacted)
+    (installation,) = data["response"]["data"]
+    (gateway,) = installation["gateways"]
+    assert isinstance(installation["id"], int)
+    assert len(str(installation["id"])) == len(str(INSTALLATION_ID))
+    assert gateway["installationId"] == installation["id"]
+    assert len(gateway["serial"]) == len(GATEWAY_SERIAL)
+    assert data["url"] == (
+        f"/equipment/installations/{installation['id']}"
+        f"/gateways/{gateway['serial']}/devices/0/features/"
+    )
+
+
+def test_redact_keeps_values():
+    """Test that feature values and short ids are left alone."""
+    text = json.dumps(
+        {
+            "feature": "heating.burners.0.statistics",
+            "deviceId": "0",
+            "properties": {"starts": {"type": "number", "value": 118207}},
+        }
+    )
+    assert redact(text) == text
+
+
+async def test_recording_redacted(hass, vicare_cloud):
+    """Test that a recording holds no installation id or gateway serial."""
+    entry = await setup_entry(hass, options={CONF_RECORD_TRAFFIC: True})
+    for coordinator in get_coordinators(hass, entry):
+        await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    path = hass.config.path(recording_file_name(ENTRY_CONFIG))
+    try:
+        with open(path, encoding="utf-8") as file:
+            recording = file.read()
+    finally:
+        os.remove(path)
+    assert FEATURES_URL not in recording
+    assert str(INSTALLATION_ID) not in recording
+    assert GATEWAY_SERIAL not in recording
+
+
+async def test_recording_size_cap(hass, vicare_cloud, monkeypatch, caplog):
+    """Test that recording stops once the file reaches its maximum size."""
+    monkeypatch.setattr(recording, "RECORDING_MAX_BYTES", 50000)
+    entry = await setup_entry(hass, options={CONF_RECORD_TRAFFIC: True})
+    (coordinator,) = get_coordinators(hass, entry)
+    for _ in range(20):
+        await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    path = hass.config.path(recording_file_name(ENTRY_CONFIG))
+    try:
+        size = os.path.getsize(path)
+        requests = load_recording(path)
+    finally:
+        os.remove(path)
+    assert size <= 50000
+    assert len(requests) < 20
+    # What was recorded can still be replayed
+    assert requests[0]["url"] == INSTALLATIONS_URL
+    assert "Stopped recording ViCare API traffic" in caplog.text
@@ -0,0 +1,143 @@
+"""Test the long-term statistics import of ViCare."""
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from homeassistant.components.vicare.capabilities import ViCareCapabilities
+from homeassistant.components.vicare.statistics import (
+    ViCareStatisticsImporter,
+    day_start,
+)
+import homeassistant.util.dt as dt_util
+
+from . import get_coordinators, setup_entry
+
+STATISTIC_ID = "vicare:1234_gas_consumption_heating"
+
+
+class GasHistory:
+    """Device reporting only the heating gas consumption, today first."""
+
+    def __init__(self, days):
+        """Initialize the device."""
+        self.days = days
+
+    def getGasConsumptionHeatingDays(self):
+        """Return the daily consumption."""
+        return self.days
+
+
+def _importer(hass, days):
+    coordinator = MagicMock()
+    coordinator.last_update_success = True
+    coordinator.tier_due.return_value = True
+    coordinator.capabilities = ViCareCapabilities({}, MagicMock())
+    return ViCareStatisticsImporter(
+        hass, coordinator, GasHistory(days), "1234", "ViCare"
+    )
+
+
+async def _async_import(hass, importer, last=None):
+    """Run an import and return the rows written."""
+    with patch(
+        "homeassistant.components.vicare.statistics.get_last_statistics",
+        return_value=last or {},
+    ), patch(
+        "homeassistant.components.vicare.statistics.async_add_external_statistics"
+    ) as add_statistics:
+        importer.async_schedule_import()
+        await hass.async_block_till_done()
+
+    assert add_statistics.call_count == 1
+    _, metadata, statistics = add_statistics.call_args[0]
+    assert metadata["statistic_id"] == STATISTIC_ID
+    assert metadata["has_sum"]
+    return statistics
+
+
+def _last_row(start, state, total):
+    return {STATISTIC_ID: [{"start": start.isoformat(), "state": state, "sum": total}]}
+
+
+@pytest.mark.parametrize(
+    "time_zone", ["Europe/Berlin", "Asia/Kolkata", "Australia/Adelaide"]
+)
+async def test_first_import(hass, time_zone):
+    """Test that the whole history is imported on the UTC hour, oldest first."""
+    hass.config.set_time_zone(time_zone)
+
+    statistics = await _async_import(hass, _importer(hass, [3.0, 5.0, 7.0]))
+
+    assert [row["state"] for row in statistics] == [7.0, 5.0, 3.0]
+    assert [row["sum"] for row in statistics] == [7.0, 12.0, 15.0]
+    for row in statistics:
+        assert row["start"].utcoffset() == timedelta(0)
+        assert row["start"].minute == row["start"].second == 0
+    assert [
+        statistics[index + 1]["start"] - statistics[index]["start"]
+        for index in range(2)
+    ] == [timedelta(days=1)] * 2
+
+    # Today's row starts within the hour local midnight falls in
+    midnight = dt_util.start_of_local_day()
+    assert timedelta(0) <= midnight - statistics[-1]["start"] < timedelta(hours=1)
+
+
+async def test_continue_sum(hass):
+    """Test that the sum continues from the last row imported."""
+    hass.config.set_time_zone("Asia/Kolkata")
+    today = dt_util.now().date()
+    last = _last_row(day_start(today - timedelta(days=1)), 5.0, 100.0)
+
+    statistics = await _async_import(hass, _importer(hass, [3.0, 5.0, 7.0]), last)
+
+    # The day before yesterday is not imported again
+    assert [row["start"] for row in statistics] == [
+        day_start(today - timedelta(days=1)),
+        day_start(today),
+    ]
+    assert [row["state"] for row in statistics] == [5.0, 3.0]
+    assert [row["sum"] for row in statistics] == [100.0, 103.0]
+
+
+async def test_backfill_beyond_history(hass):
+    """Test that an outage longer than the history continues the sum."""
+    hass.config.set_time_zone("Asia/Kolkata")
+    today = dt_util.now().date()
+    last = _last_row(day_start(today - timedelta(days=10)), 4.0, 100.0)
+
+    statistics = await _async_import(hass, _importer(hass, [3.0, 5.0]), last)
+
+    assert [row["sum"] for row in statistics] == [105.0, 108.0]
+
+
+async def test_rewrite_today(hass):
+    """Test that today's row is rewritten as the day goes on."""
+    hass.config.set_time_zone("Asia/Kolkata")
+    today = dt_util.now().date()
+    last = _last_row(day_start(today), 2.0, 102.0)
+
+    statistics = await _async_import(hass, _importer(hass, [3.0, 5.0, 7.0]), last)
+
+    assert len(statistics) == 1
+    assert statistics[0]["start"] == day_start(today)
+    assert statistics[0]["state"] == 3.0
+    assert statistics[0]["sum"] == 103.0
+
+
+async def test_import_on_refresh_only(hass, vicare_cloud):
+    """Test that imports follow refreshes, not command patches or expiry."""
+    hass.config.components.add("recorder")
+    with patch.object(ViCareStatisticsImporter, "async_schedule_import") as schedule:
+        entry = await setup_entry(hass)
+        (coordinator,) = get_coordinators(hass, entry)
+        schedule.reset_mock()
+
+        # Like the read back after a command and an expiring snapshot
+        coordinator.async_patch_features([])
+        coordinator.async_update_listeners()
+        schedule.assert_not_called()
+
+        await coordinator.async_refresh()
+        schedule.assert_called_once()
@@ -0,0 +1,41 @@
+"""Test the span trace of ViCare."""
+import asyncio
+import json
+import os
+
+from homeassistant.components.vicare.const import CONF_TRACE
+from homeassistant.components.vicare.trace import trace_file_name
+
+from . import ENTRY_CONFIG, get_coordinators, setup_entry
+
+
+async def test_trace(hass, vicare_cloud):
+    """Test that login, refreshes and entity updates are written as spans."""
+    entry = await setup_entry(hass, options={CONF_TRACE: True})
+    await asyncio.gather(
+        *(coordinator.async_refresh() for coordinator in get_coordinators(hass, entry))
+    )
+    await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+
+    path = hass.config.path(trace_file_name(ENTRY_CONFIG))
+    try:
+        with open(path, encoding="utf-8") as file:
+            spans = [json.loads(line) for line in file]
+    finally:
+        os.remove(path)
+
+    names = {span["span"] for span in spans}
+    assert {
+        "login",
+        "token_refresh",
+        "request",
+        "fetch",
+        "parse",
+        "entity_update",
+    } <= names
+    assert all(span["duration_ms"] >= 0 and span["start"] for span in spans)
+    fetches = [span for span in spans if span["span"] == "fetch"]
+    assert len(fetches) == 2
+    assert all(span["serial"] and span["outcome"] == "ok" for span in fetches)
+    assert all(span["bytes"] > 0 for span in spans if span["span"] == "request")